@@ -3,6 +3,28 @@ import os
 # Bot configuration
 BOT_TOKEN = os.getenv("BOT_TOKEN", "your_bot_token_here")
 
+# Update delivery: "polling" for local runs, "webhook" for hosting
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Public base URL Telegram sends updates to (Render sets RENDER_EXTERNAL_URL)
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", os.getenv("RENDER_EXTERNAL_URL", ""))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Telegram echoes it in X-Telegram-Bot-Api-Secret-Token, requests without it are rejected
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEB_SERVER_HOST = os.getenv("WEB_SERVER_HOST", "0.0.0.0")
+WEB_SERVER_PORT = int(os.getenv("PORT", "8080"))
+HEALTH_PATH = "/health"
+METRICS_PATH = "/metrics"
+# Drop updates queued while bot was offline
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "") == "1"
+# Alternative Bot API server, e.g. scripts/fake_telegram.py for local tests
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Handler processes; with more than one, a front process receives updates and
+# routes each user to a fixed worker, so user order and FSM state stay on it
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+# "json" keeps users in users.json, "sqlite" in users.db shared by workers
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite" if BOT_WORKERS > 1 else "json")
+
 # Admin configuration
 ADMIN_IDS = [
     5247307710, 5015834882, 1318179688
@@ -13,6 +35,91 @@ ADMIN_IDS = [
 # Data files
 USERS_DATA_FILE = "data/users.json"
 ACHIEVEMENTS_DATA_FILE = "data/achievements.json"
+POINTS_LEDGER_FILE = "data/points_ledger.jsonl"
+POINTS_TOTALS_FILE = "data/points_totals.json"
+# Points totals are checkpointed every this many ledger entries, the rest is replayed on start
+POINTS_TOTALS_CHECKPOINT_ENTRIES = 200
+BROADCAST_STATE_FILE = "data/broadcasts.json"
+
+# Exports
+EXPORTS_DIR = "exports"
+EXPORTS_KEEP = 5
+EXPORT_WATERMARK_OVERLAP_SECONDS = 5
+RESTORE_BATCH_SIZE = 500
+# Telegram bots can upload documents up to 50 MB
+EXPORT_MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+# Scheduled snapshots (newest SNAPSHOTS_KEEP_RECENT are kept, plus the last
+# snapshot of each of SNAPSHOTS_KEEP_DAILY most recent days)
+SNAPSHOTS_DIR = "data/snapshots"
+SNAPSHOT_INTERVAL_MINUTES = 60
+SNAPSHOTS_KEEP_RECENT = 24
+SNAPSHOTS_KEEP_DAILY = 7
+
+# Columnar analytics snapshot rebuild period
+ANALYTICS_REFRESH_MINUTES = 10
+
+# Weekly signup cohorts shown in retention table
+COHORT_WEEKS = 6
+
+# Admin statistics are recomputed in background and served from cache
+STATS_REFRESH_MINUTES = 5
+
+# Worker processes for CPU-heavy admin jobs (statistics, analytics, cohort reports)
+PROCESS_POOL_WORKERS = 2
+
+# Admin user browser; profiles of the most recently active users are kept in
+# memory so unchanged names are not compared with storage on every update
+USER_BROWSER_PAGE_SIZE = 10
+PROFILE_CACHE_MAX = 10000
+
+# Outgoing Bot API requests (Telegram allows about 30 messages per second in
+# total and about 1 per second in one chat, 20 per minute in groups)
+REQUEST_RATE_PER_SECOND = 30
+REQUEST_CHAT_RATE_PER_SECOND = 1
+REQUEST_CHAT_BURST = 3
+REQUEST_GROUP_RATE_PER_MINUTE = 20
+REQUEST_MAX_RETRIES = 3
+REQUEST_METRICS_WINDOW = 1000
+
+# Conversation (FSM) states: abandoned flows expire, the oldest ones are evicted
+# above the cap; live states are saved to the users storage backend in batches
+FSM_STATE_TTL_SECONDS = 6 * 60 * 60
+FSM_MAX_KEYS = 10000
+FSM_FLUSH_SECONDS = 2
+FSM_PERSIST = os.getenv("FSM_PERSIST", "1") == "1"
+FSM_STATES_FILE = "data/fsm_states.json"
+
+# Update handling under overload: at most UPDATE_CONCURRENCY updates are handled
+# at once and the rest wait by priority, critical flows first. With more than
+# UPDATE_SHED_THRESHOLD waiting, content requests get cached answers; above
+# UPDATE_QUEUE_MAX only critical flows are still queued, the rest is dropped
+UPDATE_CONCURRENCY = 64
+UPDATE_SHED_THRESHOLD = 200
+UPDATE_QUEUE_MAX = 1000
+UPDATE_METRICS_WINDOW = 1000
+
+# Per-user limit of handled updates, taps above it are answered and dropped
+THROTTLE_RATE_PER_SECOND = 2
+THROTTLE_BURST = 5
+# Same button pressed again within this window is collapsed into the first press
+CALLBACK_COALESCE_SECONDS = 1.0
+
+# Parameterized inline keyboards (skill actions, confirmations) kept built per process
+KEYBOARD_CACHE_SIZE = 1024
+
+# Callbacks not answered by handler in time get empty answer, so the button stops spinning
+CALLBACK_ANSWER_DEADLINE_SECONDS = 0.5
+
+# Broadcast settings (Bot API allows about 30 messages per second in bulk,
+# the rest is left for regular replies and progress edits)
+BROADCAST_RATE_PER_SECOND = 25
+BROADCAST_CONCURRENCY = 10
+BROADCAST_MAX_RETRIES = 3
+BROADCAST_CHECKPOINT_SECONDS = 5
+BROADCAST_HISTORY_LIMIT = 20
+BROADCAST_PROGRESS_SECONDS = 5
+BROADCAST_RATE_WINDOW = 6
 
 # Skill categories with emojis
 SKILL_CATEGORIES = {
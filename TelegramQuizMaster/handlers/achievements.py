@@ -1,18 +1,18 @@
-from aiogram import Router, F
 from aiogram.types import CallbackQuery
 
 from keyboards.inline import get_back_to_main
 from utils.data_manager import DataManager
+from utils.callback_router import CallbackRoutes
 from utils.achievements import AchievementManager
 from config import ACHIEVEMENTS_CONFIG, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE
 
-router = Router()
+callbacks = CallbackRoutes("achievements")
 
 # Initialize managers
 data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
 achievement_manager = AchievementManager(data_manager)
 
-@router.callback_query(F.data == "achievements")
+@callbacks.exact("achievements")
 async def show_achievements(callback: CallbackQuery):
     """Show user achievements"""
     user_id = str(callback.from_user.id)
@@ -65,7 +65,7 @@ async def show_achievements(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "achievement_details")
+@callbacks.exact("achievement_details")
 async def show_achievement_details(callback: CallbackQuery):
     """Show detailed achievement information"""
     user_id = str(callback.from_user.id)
@@ -1,26 +1,55 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
-from datetime import datetime, timedelta
-import json
+from aiogram.exceptions import TelegramBadRequest
+from datetime import datetime
+from functools import lru_cache
+import asyncio
+import os
+import time
 
-from keyboards.inline import get_back_to_main
+from keyboards.inline import get_back_to_main, prebuilt, freeze
 from utils.data_manager import DataManager
+from utils.callback_router import CallbackRoutes
 from utils.achievements import AchievementManager
-from config import ADMIN_IDS, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE, MOTIVATIONAL_MESSAGES
+from utils.broadcast import BroadcastManager, get_broadcast_control_keyboard
+from utils.user_index import describe_segment
+from utils.export import ExportManager
+from utils.restore import RestoreManager
+from utils.snapshots import SnapshotManager
+from utils.cohorts import CohortManager, format_cohort_table
+from utils.stats_service import StatsService, STATS_REPORTS, format_computed_at
+from utils.user_search import get_page
+from utils.background import run_in_background
+from utils.analytics import (
+    AnalyticsManager, format_histogram, MINUTES_BINS, SESSIONS_BINS, STREAK_BINS, INACTIVE_DAYS_BINS
+)
+from config import (
+    ADMIN_IDS, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE, MOTIVATIONAL_MESSAGES, SKILL_CATEGORIES,
+    EXPORT_MAX_DOCUMENT_BYTES, EXPORTS_DIR, USER_BROWSER_PAGE_SIZE
+)
 from states.user_states import SkillStates, AdminStates
 
 router = Router()
+callbacks = CallbackRoutes("admin")
 
 # Initialize managers
 data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
 achievement_manager = AchievementManager(data_manager)
+broadcast_manager = BroadcastManager(data_manager)
+export_manager = ExportManager(data_manager)
+restore_manager = RestoreManager(data_manager)
+snapshot_manager = SnapshotManager(data_manager)
+analytics_manager = AnalyticsManager(data_manager)
+cohort_manager = CohortManager(data_manager)
+stats_service = StatsService(data_manager, achievement_manager.points_ledger)
 
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
     return user_id in ADMIN_IDS
 
+@prebuilt
 def get_admin_keyboard():
     """Get admin panel keyboard"""
     from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -38,12 +67,16 @@ def get_admin_keyboard():
             InlineKeyboardButton(text="🗄️ Экспорт данных", callback_data="admin_export"),
             InlineKeyboardButton(text="🔧 Управление", callback_data="admin_manage")
         ],
+        [
+            InlineKeyboardButton(text="📐 Аналитика", callback_data="admin_analytics")
+        ],
         [
             InlineKeyboardButton(text="🔙 Выйти", callback_data="main_menu")
         ]
     ])
     return keyboard
 
+@prebuilt
 def get_user_management_keyboard():
     """Get user management keyboard"""
     from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -57,12 +90,20 @@ def get_user_management_keyboard():
             InlineKeyboardButton(text="📈 Активность", callback_data="admin_activity"),
             InlineKeyboardButton(text="🎯 По навыкам", callback_data="admin_skills_stats")
         ],
+        [
+            InlineKeyboardButton(text="🏅 Топ по очкам", callback_data="admin_points_all"),
+            InlineKeyboardButton(text="📅 Когорты", callback_data="admin_cohorts")
+        ],
+        [
+            InlineKeyboardButton(text="📋 Все пользователи", callback_data="admin_browse")
+        ],
         [
             InlineKeyboardButton(text="🔙 Назад", callback_data="admin_panel")
         ]
     ])
     return keyboard
 
+@prebuilt
 def get_management_keyboard():
     """Get management keyboard"""
     from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -76,6 +117,10 @@ def get_management_keyboard():
             InlineKeyboardButton(text="⚙️ Настройки бота", callback_data="admin_settings"),
             InlineKeyboardButton(text="📊 Системная инфо", callback_data="admin_system_info")
         ],
+        [
+            InlineKeyboardButton(text="📸 Снимки", callback_data="admin_snapshots"),
+            InlineKeyboardButton(text="♻️ Восстановить из экспорта", callback_data="admin_restore")
+        ],
         [
             InlineKeyboardButton(text="🔙 Назад", callback_data="admin_panel")
         ]
@@ -99,7 +144,7 @@ async def admin_panel(message: Message):
     
     await message.answer(text, reply_markup=get_admin_keyboard(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "admin_panel")
+@callbacks.exact("admin_panel")
 async def show_admin_panel(callback: CallbackQuery):
     """Show admin panel"""
     user_id = callback.from_user.id
@@ -115,7 +160,50 @@ async def show_admin_panel(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=get_admin_keyboard(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "admin_stats")
+@lru_cache(maxsize=len(STATS_REPORTS))
+def get_stats_report_keyboard(name: str):
+    """Keyboard of cached report screen with refresh button on top"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    if name in ("top_users", "activity"):
+        base = get_user_management_keyboard()
+    elif name == "system_info":
+        base = get_management_keyboard()
+    else:
+        base = get_back_to_main()
+    
+    refresh = [InlineKeyboardButton(text="🔄 Обновить", callback_data=f"stats_refresh_{name}")]
+    return freeze(InlineKeyboardMarkup(inline_keyboard=[refresh] + base.inline_keyboard))
+
+async def show_stats_report(callback: CallbackQuery, name: str, force: bool = False):
+    """Show report from stats cache"""
+    report = await stats_service.get(name, force)
+    text = f"{report['text']}\n\n{format_computed_at(report)}"
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=get_stats_report_keyboard(name), parse_mode="Markdown")
+    except TelegramBadRequest:
+        # Report did not change since last press
+        await callback.answer()
+
+@callbacks.prefix("stats_refresh_")
+async def refresh_stats_report(callback: CallbackQuery):
+    """Recompute cached report on demand"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    name = callback.data.replace("stats_refresh_", "")
+    if name not in STATS_REPORTS:
+        await callback.answer("❌ Неизвестный отчет")
+        return
+    
+    await callback.answer("⏳ Пересчитываю...")
+    await show_stats_report(callback, name, force=True)
+
+@callbacks.exact("admin_stats")
 async def show_bot_statistics(callback: CallbackQuery):
     """Show bot statistics"""
     user_id = callback.from_user.id
@@ -124,109 +212,259 @@ async def show_bot_statistics(callback: CallbackQuery):
         await callback.answer("❌ Нет доступа")
         return
     
-    # Load all users data
-    users_data = data_manager.load_users_data()
+    await show_stats_report(callback, "stats")
+
+@callbacks.exact("admin_users")
+async def show_user_management(callback: CallbackQuery):
+    """Show user management options"""
+    user_id = callback.from_user.id
     
-    total_users = len(users_data)
-    total_skills = sum(len(user["skills"]) for user in users_data.values())
-    total_sessions = sum(user["statistics"]["total_sessions"] for user in users_data.values())
-    total_minutes = sum(user["statistics"]["total_time_minutes"] for user in users_data.values())
-    total_hours = total_minutes // 60
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
     
-    # Active users (with activity in last 7 days)
-    week_ago = datetime.now() - timedelta(days=7)
-    active_users = 0
+    text = (
+        "👥 **Управление пользователями**\n\n"
+        "Выберите действие:"
+    )
     
-    for user in users_data.values():
-        if user.get("last_active"):
-            last_active = datetime.fromisoformat(user["last_active"])
-            if last_active > week_ago:
-                active_users += 1
+    await callback.message.edit_text(text, reply_markup=get_user_management_keyboard(), parse_mode="Markdown")
+
+@callbacks.exact("admin_top_users")
+async def show_top_users(callback: CallbackQuery):
+    """Show top users by activity"""
+    user_id = callback.from_user.id
     
-    # Popular skills
-    skill_counts = {}
-    for user in users_data.values():
-        for skill_key, skill_data in user["skills"].items():
-            category = skill_data.get("category", "Другое")
-            skill_counts[category] = skill_counts.get(category, 0) + 1
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
     
-    popular_categories = sorted(skill_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    await show_stats_report(callback, "top_users")
+
+def get_user_page_keyboard(page: list, prefix: str, has_prev: bool, has_next: bool):
+    """Get user list page keyboard with cursor navigation"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
     
-    text = (
-        f"📊 **Статистика бота**\n\n"
-        f"👥 Всего пользователей: {total_users}\n"
-        f"🟢 Активных за неделю: {active_users}\n"
-        f"🎯 Всего навыков: {total_skills}\n"
-        f"📈 Всего сессий: {total_sessions}\n"
-        f"⏰ Общее время: {total_hours}ч {total_minutes % 60}м\n\n"
-        f"🏆 **Популярные категории:**\n"
+    search_index = data_manager.get_search_index()
+    keyboard = [
+        [InlineKeyboardButton(text=f"👤 {search_index.names.get(user_id, user_id)}", callback_data=f"uv_{user_id}")]
+        for user_id in page
+    ]
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"{prefix}_p_{page[0]}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"{prefix}_n_{page[-1]}"))
+    if navigation:
+        keyboard.append(navigation)
+    
+    keyboard.append([
+        InlineKeyboardButton(text="🔍 Поиск", callback_data="admin_find_user"),
+        InlineKeyboardButton(text="🔙 Назад", callback_data="admin_users")
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def parse_page_cursor(data: str, prefix: str):
+    """Get (after, before) cursor from navigation button data"""
+    if data.startswith(f"{prefix}_n_"):
+        return data.replace(f"{prefix}_n_", "", 1), None
+    if data.startswith(f"{prefix}_p_"):
+        return None, data.replace(f"{prefix}_p_", "", 1)
+    return None, None
+
+async def show_user_page(callback: CallbackQuery, title: str, prefix: str, ids: list, start: int, end: int):
+    """Show one page of user IDs from sorted index range"""
+    after, before = parse_page_cursor(callback.data, prefix)
+    page, has_prev, has_next = get_page(ids, start, end, USER_BROWSER_PAGE_SIZE, after, before)
+    
+    text = f"{title}\n\n👥 Найдено: {end - start}"
+    if not page:
+        text += "\n\nНикого не найдено."
+    
+    await callback.message.edit_text(
+        text,
+        reply_markup=get_user_page_keyboard(page, prefix, has_prev, has_next),
+        parse_mode="Markdown"
     )
+
+@callbacks.exact("admin_browse")
+@callbacks.prefix("ub_n_", "ub_p_")
+async def browse_users(callback: CallbackQuery):
+    """Paginated list of all users"""
+    user_id = callback.from_user.id
     
-    for category, count in popular_categories:
-        text += f"• {category}: {count}\n"
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
     
-    if total_users > 0:
-        avg_skills = total_skills / total_users
-        avg_sessions = total_sessions / total_users
-        text += f"\n📊 **Среднее на пользователя:**\n"
-        text += f"• Навыков: {avg_skills:.1f}\n"
-        text += f"• Сессий: {avg_sessions:.1f}"
+    search_index = data_manager.get_search_index()
+    await show_user_page(callback, "📋 **Пользователи**", "ub", search_index.ids, 0, len(search_index.ids))
+
+@callbacks.exact("admin_find_user")
+async def find_user_prompt(callback: CallbackQuery, state: FSMContext):
+    """Ask admin for search query"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    await state.set_state(AdminStates.waiting_for_user_search)
+    
+    text = (
+        "🔍 **Поиск пользователя**\n\n"
+        "Отправьте ID (или его начало), @username, имя или часть имени."
+    )
     
     await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "admin_users")
-async def show_user_management(callback: CallbackQuery):
-    """Show user management options"""
+@router.message(AdminStates.waiting_for_user_search)
+async def process_user_search(message: Message, state: FSMContext):
+    """Search users by ID prefix or name"""
+    user_id = message.from_user.id
+    
+    if not is_admin(user_id):
+        await message.answer("❌ Нет доступа")
+        await state.clear()
+        return
+    
+    query = (message.text or "").strip()
+    if not query:
+        await message.answer("❌ Запрос не может быть пустым. Попробуйте еще раз.")
+        return
+    
+    await state.update_data(user_search_query=query)
+    await state.set_state(None)
+    
+    ids, start, end = data_manager.get_search_index().search(query)
+    page, has_prev, has_next = get_page(ids, start, end, USER_BROWSER_PAGE_SIZE)
+    
+    text = f"🔍 Результаты по запросу «{query}»\n\n👥 Найдено: {end - start}"
+    if not page:
+        text += "\n\nНикого не найдено."
+    
+    # Query is raw user input, sent without markup parsing
+    await message.answer(text, reply_markup=get_user_page_keyboard(page, "us", has_prev, has_next), parse_mode=None)
+
+@callbacks.prefix("us_n_", "us_p_")
+async def browse_search_results(callback: CallbackQuery, state: FSMContext):
+    """Paginated search results"""
     user_id = callback.from_user.id
     
     if not is_admin(user_id):
         await callback.answer("❌ Нет доступа")
         return
     
+    query = (await state.get_data()).get("user_search_query")
+    if not query:
+        await callback.answer("❌ Поиск устарел, повторите запрос")
+        return
+    
+    ids, start, end = data_manager.get_search_index().search(query)
+    
+    after, before = parse_page_cursor(callback.data, "us")
+    page, has_prev, has_next = get_page(ids, start, end, USER_BROWSER_PAGE_SIZE, after, before)
+    
+    text = f"🔍 Результаты по запросу «{query}»\n\n👥 Найдено: {end - start}"
+    await callback.message.edit_text(
+        text,
+        reply_markup=get_user_page_keyboard(page, "us", has_prev, has_next),
+        parse_mode=None
+    )
+
+@prebuilt
+def get_user_card_keyboard():
+    """Get user card keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 К списку", callback_data="admin_browse")]
+    ])
+
+@callbacks.prefix("uv_")
+async def show_user_card(callback: CallbackQuery):
+    """Show single user details"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    target_id = callback.data.replace("uv_", "", 1)
+    user = data_manager.load_users_data().get(target_id)
+    
+    if not user:
+        await callback.answer("❌ Пользователь не найден")
+        return
+    
+    statistics = user.get("statistics", {})
+    total_minutes = statistics.get("total_time_minutes", 0)
+    
     text = (
-        "👥 **Управление пользователями**\n\n"
-        "Выберите действие:"
+        f"👤 {data_manager.get_search_index().names.get(target_id, target_id)}\n\n"
+        f"🆔 ID: {target_id}\n"
+        f"📅 Регистрация: {user.get('created_at', '—')[:10]}\n"
+        f"🕒 Последняя активность: {(user.get('last_active') or '—')[:16].replace('T', ' ')}\n"
+        f"🎯 Навыков: {len(user.get('skills', {}))}\n"
+        f"📊 Сессий: {statistics.get('total_sessions', 0)}\n"
+        f"⏰ Время: {total_minutes // 60}ч {total_minutes % 60}м\n"
+        f"💎 Очков: {achievement_manager.points_ledger.get_user_total(target_id)}\n"
+        f"🏆 Достижений: {len(user.get('achievements', []))}"
     )
+    if user.get("blocked"):
+        text += "\n\n🚫 Заблокировал бота"
     
-    await callback.message.edit_text(text, reply_markup=get_user_management_keyboard(), parse_mode="Markdown")
+    # Names come from Telegram profiles, sent without markup parsing
+    await callback.message.edit_text(text, reply_markup=get_user_card_keyboard(), parse_mode=None)
 
-@router.callback_query(F.data == "admin_top_users")
-async def show_top_users(callback: CallbackQuery):
-    """Show top users by activity"""
+@prebuilt
+def get_points_leaderboard_keyboard():
+    """Get points leaderboard period keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="📅 Неделя", callback_data="admin_points_week"),
+            InlineKeyboardButton(text="🗓️ Месяц", callback_data="admin_points_month"),
+            InlineKeyboardButton(text="♾️ Всё время", callback_data="admin_points_all")
+        ],
+        [
+            InlineKeyboardButton(text="🔙 Назад", callback_data="admin_users")
+        ]
+    ])
+    return keyboard
+
+@callbacks.exact("admin_points_week", "admin_points_month", "admin_points_all")
+async def show_points_leaderboard(callback: CallbackQuery):
+    """Show top users by points from the points ledger"""
     user_id = callback.from_user.id
     
     if not is_admin(user_id):
         await callback.answer("❌ Нет доступа")
         return
     
-    users_data = data_manager.load_users_data()
+    period = callback.data.replace("admin_points_", "")
+    granularity = None if period == "all" else period
+    period_titles = {"week": "за неделю", "month": "за месяц", "all": "за всё время"}
     
-    # Sort users by total time
-    sorted_users = sorted(
-        users_data.items(),
-        key=lambda x: x[1]["statistics"]["total_time_minutes"],
-        reverse=True
-    )[:10]
+    leaderboard = achievement_manager.points_ledger.get_leaderboard(limit=10, granularity=granularity)
     
-    text = "🏆 **Топ-10 пользователей по времени:**\n\n"
+    text = f"🏅 **Топ-10 по очкам {period_titles[period]}:**\n\n"
     
-    for i, (user_id_str, user_data) in enumerate(sorted_users, 1):
-        total_minutes = user_data["statistics"]["total_time_minutes"]
-        hours = total_minutes // 60
-        mins = total_minutes % 60
-        skills_count = len(user_data["skills"])
-        
-        time_text = f"{hours}ч {mins}м" if hours > 0 else f"{mins}м"
-        text += f"{i}. ID {user_id_str}\n"
-        text += f"   ⏰ {time_text} • 🎯 {skills_count} навыков\n"
-        text += f"   📊 {user_data['statistics']['total_sessions']} сессий\n\n"
+    for i, (user_id_str, points) in enumerate(leaderboard, 1):
+        text += f"{i}. ID {user_id_str} — 💎 {points}\n"
     
-    if not sorted_users:
-        text += "Пока нет активных пользователей."
+    if not leaderboard:
+        text += "За этот период очков ещё никто не заработал."
     
-    await callback.message.edit_text(text, reply_markup=get_user_management_keyboard(), parse_mode="Markdown")
+    try:
+        await callback.message.edit_text(text, reply_markup=get_points_leaderboard_keyboard(), parse_mode="Markdown")
+    except TelegramBadRequest:
+        # Same period pressed twice, message is not modified
+        await callback.answer()
 
-@router.callback_query(F.data == "admin_activity")
+@callbacks.exact("admin_activity")
 async def show_activity_stats(callback: CallbackQuery):
     """Show activity statistics"""
     user_id = callback.from_user.id
@@ -235,66 +473,45 @@ async def show_activity_stats(callback: CallbackQuery):
         await callback.answer("❌ Нет доступа")
         return
     
-    users_data = data_manager.load_users_data()
-    
-    # Activity by periods
-    now = datetime.now()
-    day_ago = now - timedelta(days=1)
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-    
-    active_today = 0
-    active_week = 0
-    active_month = 0
+    await show_stats_report(callback, "activity")
+
+@prebuilt
+def get_cohorts_keyboard():
+    """Get cohort retention keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
     
-    for user in users_data.values():
-        if user.get("last_active"):
-            last_active = datetime.fromisoformat(user["last_active"])
-            
-            if last_active > day_ago:
-                active_today += 1
-            if last_active > week_ago:
-                active_week += 1
-            if last_active > month_ago:
-                active_month += 1
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Пересчитать", callback_data="admin_cohorts_refresh")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_users")]
+    ])
+
+@callbacks.exact("admin_cohorts", "admin_cohorts_refresh")
+async def show_cohort_retention(callback: CallbackQuery):
+    """Show weekly signup cohorts retention table"""
+    user_id = callback.from_user.id
     
-    # Sessions by period
-    sessions_today = 0
-    sessions_week = 0
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
     
-    for user in users_data.values():
-        for skill in user["skills"].values():
-            if skill.get("last_session"):
-                last_session = datetime.fromisoformat(skill["last_session"])
-                
-                if last_session > day_ago:
-                    sessions_today += 1
-                if last_session > week_ago:
-                    sessions_week += 1
+    force = callback.data == "admin_cohorts_refresh"
+    if force:
+        await callback.answer("⏳ Пересчитываю...")
+    report = await cohort_manager.get_report(force)
     
     text = (
-        f"📈 **Активность пользователей**\n\n"
-        f"🟢 **Активные пользователи:**\n"
-        f"• Сегодня: {active_today}\n"
-        f"• За неделю: {active_week}\n"
-        f"• За месяц: {active_month}\n\n"
-        f"📊 **Сессии практики:**\n"
-        f"• Сегодня: {sessions_today}\n"
-        f"• За неделю: {sessions_week}\n"
+        f"📅 **Удержание по когортам**\n\n"
+        f"Когорта - неделя регистрации, W1..W{report['weeks'] - 1} - доля активных через N недель.\n\n"
+        f"```\n{format_cohort_table(report)}\n```\n"
+        f"🕒 Рассчитано: {report['computed_at'].strftime('%d.%m.%Y %H:%M')}"
     )
-    
-    total_users = len(users_data)
-    if total_users > 0:
-        retention_week = (active_week / total_users) * 100
-        retention_month = (active_month / total_users) * 100
-        
-        text += f"\n📊 **Удержание:**\n"
-        text += f"• Неделя: {retention_week:.1f}%\n"
-        text += f"• Месяц: {retention_month:.1f}%"
-    
-    await callback.message.edit_text(text, reply_markup=get_user_management_keyboard(), parse_mode="Markdown")
+    try:
+        await callback.message.edit_text(text, reply_markup=get_cohorts_keyboard(), parse_mode="Markdown")
+    except TelegramBadRequest:
+        # Report did not change since last press
+        await callback.answer()
 
-@router.callback_query(F.data == "admin_achievements")
+@callbacks.exact("admin_achievements")
 async def show_achievement_stats(callback: CallbackQuery):
     """Show achievement statistics"""
     user_id = callback.from_user.id
@@ -303,39 +520,156 @@ async def show_achievement_stats(callback: CallbackQuery):
         await callback.answer("❌ Нет доступа")
         return
     
-    users_data = data_manager.load_users_data()
+    await show_stats_report(callback, "achievements")
+
+@prebuilt
+def get_analytics_keyboard():
+    """Get analytics reports keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
     
-    from config import ACHIEVEMENTS_CONFIG
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="🗂️ По категориям", callback_data="an_categories"),
+            InlineKeyboardButton(text="⏰ Время практики", callback_data="an_minutes")
+        ],
+        [
+            InlineKeyboardButton(text="🔥 Серии", callback_data="an_streaks"),
+            InlineKeyboardButton(text="💤 Неактивность", callback_data="an_inactive")
+        ],
+        [
+            InlineKeyboardButton(text="🔄 Пересчитать", callback_data="an_refresh"),
+            InlineKeyboardButton(text="🔙 Назад", callback_data="admin_panel")
+        ]
+    ])
+    return keyboard
+
+def build_analytics_report(report: str, snapshot) -> str:
+    """Build text of analytics report from columnar snapshot"""
+    if report == "categories":
+        text = "🗂️ **Категории**\n\n"
+        for group in snapshot.group_by_category():
+            text += (
+                f"**{group['category']}**\n"
+                f"• Пользователей: {group['users']}, навыков: {group['skills']}\n"
+                f"• Время: {group['minutes'] // 60}ч, сессий: {group['sessions']}\n\n"
+            )
+        return text
+    
+    if report == "minutes":
+        minutes = snapshot.distribution(snapshot.user_minutes)
+        sessions = snapshot.distribution(snapshot.user_sessions)
+        return (
+            f"⏰ **Время практики на пользователя (мин.)**\n\n"
+            f"Среднее: {minutes['mean']:.0f} • медиана: {minutes['p50']:.0f}\n"
+            f"p75: {minutes['p75']:.0f} • p90: {minutes['p90']:.0f} • p99: {minutes['p99']:.0f} • макс: {minutes['max']:.0f}\n\n"
+            f"{format_histogram(snapshot.histogram(snapshot.user_minutes, MINUTES_BINS))}\n\n"
+            f"📈 **Сессий на пользователя**\n\n"
+            f"Среднее: {sessions['mean']:.1f} • медиана: {sessions['p50']:.0f} • p90: {sessions['p90']:.0f}\n\n"
+            f"{format_histogram(snapshot.histogram(snapshot.user_sessions, SESSIONS_BINS))}"
+        )
     
-    # Count achievements
-    achievement_counts = {}
-    total_points = 0
+    if report == "streaks":
+        streaks = snapshot.distribution(snapshot.skill_streak)
+        return (
+            f"🔥 **Текущие серии навыков (дн.)**\n\n"
+            f"Среднее: {streaks['mean']:.1f} • медиана: {streaks['p50']:.0f} • p90: {streaks['p90']:.0f} • макс: {streaks['max']:.0f}\n\n"
+            f"{format_histogram(snapshot.histogram(snapshot.skill_streak, STREAK_BINS))}\n\n"
+            f"🏆 **Лучшая серия пользователя сейчас**\n\n"
+            f"{format_histogram(snapshot.histogram(snapshot.user_max_streak, STREAK_BINS))}"
+        )
     
-    for user in users_data.values():
-        user_achievements = user.get("achievements", [])
-        total_points += user.get("total_points", 0)
-        
-        for ach_id in user_achievements:
-            achievement_counts[ach_id] = achievement_counts.get(ach_id, 0) + 1
+    if report == "inactive":
+        inactive_days = snapshot.inactive_days()
+        inactive = snapshot.distribution(inactive_days)
+        return (
+            f"💤 **Дней с последней активности**\n\n"
+            f"Медиана: {inactive['p50']:.1f} • p90: {inactive['p90']:.1f}\n\n"
+            f"{format_histogram(snapshot.histogram(inactive_days, INACTIVE_DAYS_BINS))}"
+        )
     
-    text = f"🏆 **Статистика достижений**\n\n"
-    text += f"💎 Всего очков: {total_points}\n\n"
+    return (
+        f"📐 **Аналитика**\n\n"
+        f"👥 Пользователей: {snapshot.user_count}\n"
+        f"🎯 Навыков: {snapshot.skill_count}\n"
+        f"🟢 Активных за 7 дн.: {snapshot.active_users(7)}\n"
+        f"🟡 Активных за 30 дн.: {snapshot.active_users(30)}\n\n"
+        f"Выберите отчет:"
+    )
+
+@callbacks.exact("admin_analytics", "an_categories", "an_minutes", "an_streaks", "an_inactive", "an_refresh")
+async def show_analytics(callback: CallbackQuery):
+    """Show vectorized analytics reports"""
+    user_id = callback.from_user.id
     
-    # Sort achievements by popularity
-    sorted_achievements = sorted(achievement_counts.items(), key=lambda x: x[1], reverse=True)
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
     
-    for ach_id, count in sorted_achievements:
-        if ach_id in ACHIEVEMENTS_CONFIG:
-            ach = ACHIEVEMENTS_CONFIG[ach_id]
-            percentage = (count / len(users_data)) * 100 if users_data else 0
-            text += f"🏆 {ach['name']}: {count} ({percentage:.1f}%)\n"
+    if callback.data == "an_refresh":
+        await callback.answer("⏳ Пересчитываю...")
+        snapshot = await analytics_manager.refresh()
+    else:
+        snapshot = await analytics_manager.get_snapshot()
     
-    if not achievement_counts:
-        text += "Пока никто не получил достижения."
+    report = callback.data.replace("an_", "")
+    started = time.perf_counter()
+    text = build_analytics_report(report, snapshot)
+    elapsed_ms = (time.perf_counter() - started) * 1000
     
-    await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
+    text += (
+        f"\n\n🕒 Данные на {snapshot.built_at.strftime('%d.%m.%Y %H:%M')} "
+        f"(сборка {snapshot.build_seconds:.1f} с, отчет {elapsed_ms:.0f} мс)"
+    )
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=get_analytics_keyboard(), parse_mode="Markdown")
+    except TelegramBadRequest:
+        # Same report pressed twice, message is not modified
+        await callback.answer()
+
+@prebuilt
+def get_export_keyboard():
+    """Get export mode keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="📦 Полный экспорт", callback_data="admin_export_full"),
+            InlineKeyboardButton(text="🧩 Изменения", callback_data="admin_export_delta")
+        ],
+        [
+            InlineKeyboardButton(text="📑 Таблицы NDJSON", callback_data="admin_export_ndjson"),
+            InlineKeyboardButton(text="📑 Таблицы CSV", callback_data="admin_export_csv")
+        ],
+        [
+            InlineKeyboardButton(text="🔙 Назад", callback_data="admin_panel")
+        ]
+    ])
+    return keyboard
+
+@callbacks.exact("admin_export")
+async def export_menu(callback: CallbackQuery):
+    """Show export modes"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    last_watermark = export_manager.get_last_watermark()
+    last_text = datetime.fromisoformat(last_watermark).strftime('%d.%m.%Y %H:%M') if last_watermark else "нет"
+    
+    text = (
+        f"🗄️ **Экспорт данных**\n\n"
+        f"📦 Полный экспорт — все пользователи\n"
+        f"🧩 Изменения — только пользователи, измененные после прошлого экспорта\n"
+        f"📑 Таблицы — отдельные файлы пользователей, навыков, заметок и достижений для анализа\n\n"
+        f"📅 Последний экспорт: {last_text}"
+    )
+    
+    await callback.message.edit_text(text, reply_markup=get_export_keyboard(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "admin_export")
+@callbacks.exact("admin_export_full", "admin_export_delta")
 async def export_data(callback: CallbackQuery):
     """Export bot data"""
     user_id = callback.from_user.id
@@ -344,41 +678,147 @@ async def export_data(callback: CallbackQuery):
         await callback.answer("❌ Нет доступа")
         return
     
+    await callback.answer("⏳ Готовлю экспорт...")
+    
+    # Export takes a while, admin's next clicks are not held up by it
+    is_delta = callback.data == "admin_export_delta"
+    run_in_background(send_export(callback.message, is_delta), f"export_{callback.data}")
+
+async def send_export(message: Message, is_delta: bool):
+    """Run full or delta export and send result"""
     try:
-        # Create export data
-        users_data = data_manager.load_users_data()
-        achievements_data = data_manager.load_achievements_data()
-        
-        export_data = {
-            "export_date": datetime.now().isoformat(),
-            "total_users": len(users_data),
-            "users": users_data,
-            "achievements": achievements_data
-        }
-        
-        # Save to file
-        export_filename = f"bot_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(export_filename, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
+        # Encoding and compression run in worker thread over store snapshot, event loop stays free
+        result = await export_manager.run_export("delta" if is_delta else "full")
+        size_mb = result["size"] / (1024 * 1024)
         
         text = (
             f"📤 **Экспорт данных**\n\n"
-            f"✅ Данные экспортированы в файл:\n"
-            f"📁 {export_filename}\n\n"
+            f"✅ {'Экспорт изменений' if is_delta else 'Полный экспорт'} готов:\n"
+            f"📁 `{os.path.basename(result['path'])}`\n\n"
             f"📊 Экспортировано:\n"
-            f"• Пользователей: {len(users_data)}\n"
+            f"• Пользователей: {result['users']}\n"
+            f"• Размер: {size_mb:.2f} МБ\n"
             f"• Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
         )
         
-        await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
+        if is_delta:
+            since = datetime.fromisoformat(result["since"]).strftime('%d.%m.%Y %H:%M')
+            text += f"\n• Удалено пользователей: {result['removed']}\n• Изменения с: {since}"
+        
+        if result["size"] <= EXPORT_MAX_DOCUMENT_BYTES:
+            await message.answer_document(FSInputFile(result["path"]), caption=f"📦 {result['users']} пользователей")
+        else:
+            text += "\n\n⚠️ Файл слишком большой для отправки в Telegram, он сохранен на сервере."
+        
+        await message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
         
     except Exception as e:
-        await callback.message.edit_text(
+        await message.edit_text(
             f"❌ Ошибка при экспорте данных: {str(e)}",
             reply_markup=get_back_to_main()
         )
 
-@router.callback_query(F.data == "admin_broadcast")
+@callbacks.exact("admin_export_ndjson", "admin_export_csv")
+async def export_tables(callback: CallbackQuery):
+    """Export data as separate tables"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    await callback.answer("⏳ Готовлю таблицы...")
+    
+    table_format = callback.data.replace("admin_export_", "")
+    run_in_background(send_table_export(callback.message, table_format), f"export_{table_format}")
+
+async def send_table_export(message: Message, table_format: str):
+    """Run table export and send archive"""
+    try:
+        result = await export_manager.run_export("tables", table_format)
+        size_mb = result["size"] / (1024 * 1024)
+        rows = result["rows"]
+        
+        text = (
+            f"📑 **Табличный экспорт ({table_format.upper()})**\n\n"
+            f"📁 `{os.path.basename(result['path'])}`\n\n"
+            f"📊 Строк:\n"
+            f"• Пользователи: {rows['users']}\n"
+            f"• Навыки: {rows['skills']}\n"
+            f"• Заметки: {rows['notes']}\n"
+            f"• Достижения: {rows['achievements']}\n"
+            f"• Размер: {size_mb:.2f} МБ"
+        )
+        
+        if result["size"] <= EXPORT_MAX_DOCUMENT_BYTES:
+            await message.answer_document(FSInputFile(result["path"]), caption=f"📑 {table_format.upper()}")
+        else:
+            text += "\n\n⚠️ Файл слишком большой для отправки в Telegram, он сохранен на сервере."
+        
+        await message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
+        
+    except Exception as e:
+        await message.edit_text(
+            f"❌ Ошибка при экспорте данных: {str(e)}",
+            reply_markup=get_back_to_main()
+        )
+
+@prebuilt
+def get_broadcast_segments_keyboard():
+    """Get broadcast audience keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="👥 Все пользователи", callback_data="bseg_all")
+        ],
+        [
+            InlineKeyboardButton(text="🟢 Активные 7 дн.", callback_data="bseg_active_7"),
+            InlineKeyboardButton(text="🟢 Активные 30 дн.", callback_data="bseg_active_30")
+        ],
+        [
+            InlineKeyboardButton(text="🔥 Серия больше 3 дн.", callback_data="bseg_streak_3"),
+            InlineKeyboardButton(text="💤 Без сессий", callback_data="bseg_nosessions")
+        ],
+        [
+            InlineKeyboardButton(text="📚 По категории навыков", callback_data="bseg_categories")
+        ],
+        [
+            InlineKeyboardButton(text="🔙 Назад", callback_data="admin_panel")
+        ]
+    ])
+    return keyboard
+
+@prebuilt
+def get_broadcast_categories_keyboard():
+    """Get broadcast category segment keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    # Category position keeps callback data short
+    keyboard = [
+        [InlineKeyboardButton(text=category, callback_data=f"bsegcat_{i}")]
+        for i, category in enumerate(SKILL_CATEGORIES.keys())
+    ]
+    keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_broadcast")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def parse_broadcast_segment(data: str):
+    """Get segment from audience button data"""
+    if data == "bseg_all":
+        return {"type": "all"}
+    if data == "bseg_nosessions":
+        return {"type": "no_sessions"}
+    if data.startswith("bseg_active_"):
+        return {"type": "active", "days": int(data.replace("bseg_active_", ""))}
+    if data.startswith("bseg_streak_"):
+        return {"type": "streak", "above": int(data.replace("bseg_streak_", ""))}
+    if data.startswith("bsegcat_"):
+        categories = list(SKILL_CATEGORIES.keys())
+        return {"type": "category", "category": categories[int(data.replace("bsegcat_", ""))]}
+    return None
+
+@callbacks.exact("admin_broadcast")
 async def broadcast_menu(callback: CallbackQuery, state: FSMContext):
     """Show broadcast menu"""
     user_id = callback.from_user.id
@@ -387,17 +827,57 @@ async def broadcast_menu(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Нет доступа")
         return
     
-    users_data = data_manager.load_users_data()
-    total_users = len(users_data)
+    await state.clear()
     
     text = (
         f"📢 **Рассылка сообщений**\n\n"
-        f"👥 Всего пользователей: {total_users}\n\n"
-        f"⚠️ Напишите сообщение для рассылки всем пользователям.\n"
-        f"Будьте осторожны - отменить рассылку будет невозможно!"
+        f"👥 Всего получателей: {broadcast_manager.count_recipients()}\n\n"
+        f"Выберите, кому отправить сообщение:"
     )
     
+    await callback.message.edit_text(text, reply_markup=get_broadcast_segments_keyboard(), parse_mode="Markdown")
+
+@callbacks.exact("bseg_categories")
+async def broadcast_categories_menu(callback: CallbackQuery):
+    """Show category segments for broadcast"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    text = (
+        "📢 **Рассылка по категории**\n\n"
+        "Сообщение получат пользователи с навыком из выбранной категории:"
+    )
+    
+    await callback.message.edit_text(text, reply_markup=get_broadcast_categories_keyboard(), parse_mode="Markdown")
+
+@callbacks.prefix("bseg_", "bsegcat_")
+async def select_broadcast_segment(callback: CallbackQuery, state: FSMContext):
+    """Select broadcast audience and ask for message"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    segment = parse_broadcast_segment(callback.data)
+    if segment is None:
+        await callback.answer("❌ Неизвестный сегмент")
+        return
+    
+    await state.update_data(broadcast_segment=segment)
     await state.set_state(AdminStates.waiting_for_broadcast_message)
+    
+    text = (
+        f"📢 **Рассылка сообщений**\n\n"
+        f"🎯 Получатели: {describe_segment(segment)}\n"
+        f"👥 Количество: {broadcast_manager.count_recipients(segment)}\n\n"
+        f"⚠️ Напишите сообщение для рассылки.\n"
+        f"Ход рассылки можно будет приостановить или отменить."
+    )
+    
     await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
 @router.message(AdminStates.waiting_for_broadcast_message)
@@ -416,38 +896,57 @@ async def process_broadcast_message(message: Message, state: FSMContext):
         await message.answer("❌ Сообщение не может быть пустым. Попробуйте еще раз.")
         return
     
-    # Get all users
-    users_data = data_manager.load_users_data()
-    
-    sent_count = 0
-    failed_count = 0
+    # Markdown errors are caught once here, not by every recipient's send
+    try:
+        await broadcast_manager.preview(message.bot, message.chat.id, broadcast_text)
+    except TelegramBadRequest as e:
+        await message.answer(
+            f"❌ Telegram не смог разобрать разметку сообщения: {e.message}\n\n"
+            "Проверьте парные символы * _ ` [ и отправьте текст еще раз."
+        )
+        return
     
-    await message.answer(f"📤 Начинаю рассылку для {len(users_data)} пользователей...")
+    # Run broadcast in background so admin is free right away
+    data = await state.get_data()
+    job = broadcast_manager.create_job(broadcast_text, message.chat.id, data.get("broadcast_segment"))
+    await state.clear()
     
-    for user_id_str in users_data.keys():
-        try:
-            await message.bot.send_message(
-                chat_id=int(user_id_str),
-                text=f"📢 **Сообщение от администрации:**\n\n{broadcast_text}",
-                parse_mode="Markdown"
-            )
-            sent_count += 1
-        except Exception as e:
-            failed_count += 1
-            # User blocked bot or chat doesn't exist
-            pass
-    
-    result_text = (
-        f"✅ **Рассылка завершена!**\n\n"
-        f"📤 Отправлено: {sent_count}\n"
-        f"❌ Не удалось отправить: {failed_count}\n"
-        f"👥 Всего пользователей: {len(users_data)}"
+    status_message = await message.answer(
+        broadcast_manager.format_status(job),
+        reply_markup=get_broadcast_control_keyboard(job)
     )
+    job.state["status_message_id"] = status_message.message_id
+    broadcast_manager.start(message.bot, job)
+
+@callbacks.prefix("bc_pause_", "bc_resume_", "bc_cancel_")
+async def control_broadcast(callback: CallbackQuery):
+    """Pause, resume or cancel running broadcast"""
+    user_id = callback.from_user.id
     
-    await message.answer(result_text, parse_mode="Markdown")
-    await state.clear()
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    action, job_id = callback.data.replace("bc_", "").split("_", 1)
+    job = broadcast_manager.get_job(job_id)
+    
+    if not job:
+        await callback.answer("❌ Рассылка не найдена")
+        return
+    
+    if action == "pause":
+        broadcast_manager.pause_job(job)
+        await callback.answer("⏸️ Рассылка приостановлена")
+    elif action == "resume":
+        broadcast_manager.resume_job(callback.bot, job)
+        await callback.answer("▶️ Рассылка продолжена")
+    elif action == "cancel":
+        broadcast_manager.cancel_job(job)
+        await callback.answer("🛑 Рассылка отменена")
+    
+    await broadcast_manager.update_status_message(callback.bot, job)
 
-@router.callback_query(F.data == "admin_manage")
+@callbacks.exact("admin_manage")
 async def show_admin_management(callback: CallbackQuery):
     """Show admin management options"""
     user_id = callback.from_user.id
@@ -463,7 +962,7 @@ async def show_admin_management(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=get_management_keyboard(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "admin_system_info")
+@callbacks.exact("admin_system_info")
 async def show_system_info(callback: CallbackQuery):
     """Show system information"""
     user_id = callback.from_user.id
@@ -472,29 +971,9 @@ async def show_system_info(callback: CallbackQuery):
         await callback.answer("❌ Нет доступа")
         return
     
-    import sys
-    import platform
-    from datetime import datetime
-    
-    users_data = data_manager.load_users_data()
-    
-    text = (
-        f"📊 **Системная информация**\n\n"
-        f"🤖 **Бот:**\n"
-        f"• Версия Python: {sys.version.split()[0]}\n"
-        f"• Платформа: {platform.system()} {platform.release()}\n"
-        f"• Время работы: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n\n"
-        f"📈 **Данные:**\n"
-        f"• Пользователей: {len(users_data)}\n"
-        f"• Размер данных: {len(str(users_data))} символов\n\n"
-        f"💾 **Файлы:**\n"
-        f"• users.json: ✅ Существует\n"
-        f"• achievements.json: ✅ Существует"
-    )
-    
-    await callback.message.edit_text(text, reply_markup=get_management_keyboard(), parse_mode="Markdown")
+    await show_stats_report(callback, "system_info")
 
-@router.callback_query(F.data == "admin_settings")
+@callbacks.exact("admin_settings")
 async def show_bot_settings(callback: CallbackQuery):
     """Show bot settings"""
     user_id = callback.from_user.id
@@ -516,7 +995,7 @@ async def show_bot_settings(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=get_management_keyboard(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "admin_reload_data")
+@callbacks.exact("admin_reload_data")
 async def reload_bot_data(callback: CallbackQuery):
     """Reload bot data"""
     user_id = callback.from_user.id
@@ -527,7 +1006,7 @@ async def reload_bot_data(callback: CallbackQuery):
     
     try:
         # Reload data managers
-        data_manager.load_users_data()
+        data_manager.reload_users_data()
         data_manager.load_achievements_data()
         
         text = (
@@ -547,7 +1026,7 @@ async def reload_bot_data(callback: CallbackQuery):
             parse_mode="Markdown"
         )
 
-@router.callback_query(F.data == "admin_clear_logs")
+@callbacks.exact("admin_clear_logs")
 async def clear_bot_logs(callback: CallbackQuery):
     """Clear bot logs (placeholder)"""
     user_id = callback.from_user.id
@@ -564,4 +1043,257 @@ async def clear_bot_logs(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(text, reply_markup=get_management_keyboard(), parse_mode="Markdown")
-    await callback.answer("✅ Логи успешно очищены!")
\ No newline at end of file
+    await callback.answer("✅ Логи успешно очищены!")
+
+@prebuilt
+def get_restore_mode_keyboard():
+    """Get restore mode keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="🔍 Проверка (merge)", callback_data="admin_restore_dry_merge"),
+            InlineKeyboardButton(text="🔍 Проверка (replace)", callback_data="admin_restore_dry_replace")
+        ],
+        [
+            InlineKeyboardButton(text="🔀 Объединить", callback_data="admin_restore_merge"),
+            InlineKeyboardButton(text="♻️ Заменить все", callback_data="admin_restore_replace")
+        ],
+        [
+            InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage")
+        ]
+    ])
+    return keyboard
+
+@callbacks.exact("admin_restore")
+async def restore_menu(callback: CallbackQuery, state: FSMContext):
+    """Ask admin for export file to restore from"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    await state.set_state(AdminStates.waiting_for_restore_file)
+    
+    text = (
+        "♻️ **Восстановление из экспорта**\n\n"
+        "Отправьте файл экспорта (.json или .json.gz) документом.\n\n"
+        "• **Объединить** - добавить новых пользователей и обновить тех, у кого в файле более свежие данные\n"
+        "• **Заменить все** - после восстановления останутся только пользователи из файла\n"
+        "• **Проверка** - только отчет, данные не меняются"
+    )
+    
+    await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
+
+@router.message(AdminStates.waiting_for_restore_file)
+async def process_restore_file(message: Message, state: FSMContext):
+    """Save uploaded export file and offer restore modes"""
+    user_id = message.from_user.id
+    
+    if not is_admin(user_id):
+        await message.answer("❌ Нет доступа")
+        await state.clear()
+        return
+    
+    document = message.document
+    if not document or not document.file_name or not document.file_name.endswith((".json", ".json.gz")):
+        await message.answer("❌ Отправьте файл экспорта .json или .json.gz документом.")
+        return
+    
+    extension = ".json.gz" if document.file_name.endswith(".gz") else ".json"
+    path = os.path.join(EXPORTS_DIR, f"restore_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}")
+    os.makedirs(EXPORTS_DIR, exist_ok=True)
+    await message.bot.download(document, destination=path)
+    
+    await state.update_data(restore_path=path)
+    await state.set_state(None)
+    
+    # File name is shown as sent, without Markdown its _ and ` can't break the reply
+    await message.answer(
+        f"📥 Файл «{document.file_name}» загружен.\n\nВыберите режим восстановления:",
+        reply_markup=get_restore_mode_keyboard()
+    )
+
+@callbacks.prefix("admin_restore_")
+async def run_restore(callback: CallbackQuery, state: FSMContext):
+    """Restore users from uploaded export file"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    path = (await state.get_data()).get("restore_path")
+    if not path or not os.path.exists(path):
+        await callback.answer("❌ Сначала загрузите файл экспорта")
+        return
+    
+    action = callback.data.replace("admin_restore_", "")
+    dry_run = action.startswith("dry_")
+    mode = action.replace("dry_", "")
+    
+    await callback.answer("⏳ Восстанавливаю данные..." if not dry_run else "⏳ Проверяю файл...")
+    
+    try:
+        report = await asyncio.to_thread(restore_manager.restore, path, mode, dry_run)
+    except Exception as e:
+        await callback.message.edit_text(
+            f"❌ Ошибка при восстановлении: {str(e)}",
+            reply_markup=get_restore_mode_keyboard()
+        )
+        return
+    
+    if not dry_run:
+        await state.clear()
+        os.remove(path)
+    
+    text = (
+        f"♻️ **{'Проверка восстановления' if dry_run else 'Восстановление завершено'}** ({mode})\n\n"
+        f"📖 Прочитано: {report['read']}\n"
+        f"➕ Добавлено: {report['added']}\n"
+        f"🔄 Обновлено: {report['updated']}\n"
+        f"⏭️ Пропущено: {report['skipped']}\n"
+        f"🗑️ Удалено: {report['removed']}\n"
+        f"📦 Пакетов записи: {report['batches']}\n"
+        f"⏱️ Время: {report['seconds']:.2f} с ({report['rate']:.0f} польз./с)"
+    )
+    
+    reply_markup = get_restore_mode_keyboard() if dry_run else get_management_keyboard()
+    await callback.message.edit_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+
+def get_snapshots_keyboard(snapshots: list):
+    """Get snapshots list keyboard"""
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    buttons = [
+        [InlineKeyboardButton(
+            text=f"♻️ {snapshot['created_at'].strftime('%d.%m.%Y %H:%M')}",
+            callback_data=f"snap_{snapshot['stamp']}"
+        )]
+        for snapshot in snapshots[:10]
+    ]
+    buttons.append([InlineKeyboardButton(text="📸 Сделать снимок", callback_data="admin_snapshot_now")])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+@callbacks.exact("admin_snapshots")
+async def show_snapshots(callback: CallbackQuery):
+    """Show scheduled snapshots"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    snapshots = snapshot_manager.list_snapshots()
+    text = (
+        f"📸 **Снимки данных**\n\n"
+        f"⏱️ Каждые {snapshot_manager.interval // 60} мин., хранятся последние {snapshot_manager.keep_recent} "
+        f"и по одному за {snapshot_manager.keep_daily} дн.\n\n"
+    )
+    
+    if snapshots:
+        total_mb = sum(snapshot["size"] for snapshot in snapshots) / (1024 * 1024)
+        text += f"📦 Снимков: {len(snapshots)} ({total_mb:.2f} МБ)\n\n"
+        for snapshot in snapshots[:10]:
+            text += f"• {snapshot['created_at'].strftime('%d.%m.%Y %H:%M')} - {snapshot['size'] / 1024:.0f} КБ\n"
+        text += "\nВыберите снимок для восстановления."
+    else:
+        text += "Снимков пока нет."
+    
+    await callback.message.edit_text(text, reply_markup=get_snapshots_keyboard(snapshots), parse_mode="Markdown")
+
+@callbacks.exact("admin_snapshot_now")
+async def create_snapshot_now(callback: CallbackQuery):
+    """Take snapshot right away"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    await callback.answer("⏳ Создаю снимок...")
+    run_in_background(send_snapshot_result(callback.message), "snapshot_now")
+
+async def send_snapshot_result(message: Message):
+    """Take snapshot and show result"""
+    try:
+        result = await snapshot_manager.take_snapshot()
+    except Exception as e:
+        await message.edit_text(f"❌ Ошибка при создании снимка: {str(e)}", reply_markup=get_management_keyboard())
+        return
+    
+    text = (
+        f"✅ **Снимок создан**\n\n"
+        f"👥 Пользователей: {result['users']}\n"
+        f"💾 Размер: {result['size'] / 1024:.0f} КБ\n"
+        f"⏱️ Время: {result['seconds']:.2f} с"
+    )
+    
+    await message.edit_text(
+        text,
+        reply_markup=get_snapshots_keyboard(snapshot_manager.list_snapshots()),
+        parse_mode="Markdown"
+    )
+
+@callbacks.prefix("snap_")
+async def confirm_snapshot_restore(callback: CallbackQuery):
+    """Ask to confirm restore from snapshot"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    stamp = callback.data.replace("snap_", "")
+    snapshot = snapshot_manager.get_snapshot(stamp)
+    
+    if not snapshot:
+        await callback.answer("❌ Снимок не найден")
+        return
+    
+    text = (
+        f"♻️ **Восстановление из снимка**\n\n"
+        f"📅 {snapshot['created_at'].strftime('%d.%m.%Y %H:%M:%S')}\n\n"
+        f"⚠️ Все данные пользователей будут заменены содержимым снимка. "
+        f"Перед восстановлением текущие данные сохраняются в новый снимок."
+    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Восстановить", callback_data=f"snapr_{stamp}")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_snapshots")]
+    ])
+    
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
+
+@callbacks.prefix("snapr_")
+async def restore_snapshot(callback: CallbackQuery):
+    """Restore users from snapshot"""
+    user_id = callback.from_user.id
+    
+    if not is_admin(user_id):
+        await callback.answer("❌ Нет доступа")
+        return
+    
+    await callback.answer("⏳ Восстанавливаю данные...")
+    
+    stamp = callback.data.replace("snapr_", "")
+    
+    try:
+        report = await asyncio.to_thread(snapshot_manager.restore_snapshot, stamp)
+    except Exception as e:
+        await callback.message.edit_text(f"❌ Ошибка при восстановлении: {str(e)}", reply_markup=get_management_keyboard())
+        return
+    
+    text = (
+        f"✅ **Данные восстановлены из снимка**\n\n"
+        f"👥 Пользователей: {report['read']}\n"
+        f"➕ Добавлено: {report['added']}\n"
+        f"🔄 Обновлено: {report['updated']}\n"
+        f"🗑️ Удалено: {report['removed']}\n"
+        f"⏱️ Время: {report['seconds']:.2f} с"
+    )
+    
+    await callback.message.edit_text(text, reply_markup=get_management_keyboard(), parse_mode="Markdown")
@@ -1,4 +1,4 @@
-from aiogram import Router, F
+from aiogram import Router, flags
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 import random
@@ -9,23 +9,40 @@ from keyboards.inline import (
     get_back_to_main, get_skill_actions
 )
 from states.user_states import ProgressStates
-from utils.data_manager import DataManager
+from keyboards.callbacks import SkillAction, SkillCallback
+from middlewares.load_shedding import CRITICAL, CONTENT
+from utils.data_manager import DataManager, find_skill_key
+from utils.callback_router import CallbackRoutes
 from utils.achievements import AchievementManager
 from config import MOTIVATIONAL_MESSAGES, LEARNING_TIPS, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE
 
 router = Router()
+callbacks = CallbackRoutes("progress")
 
 # Initialize managers
 data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
 achievement_manager = AchievementManager(data_manager)
 
-@router.callback_query(F.data.startswith("add_session_"))
-async def add_session_start(callback: CallbackQuery, state: FSMContext):
+# Rendered once; also served without storage access when the bot sheds load
+CACHED_TIP_TEXTS = [f"💡 **Совет для обучения**\n\n{tip}" for tip in LEARNING_TIPS["default"]]
+CACHED_MOTIVATION_TEXTS = [f"💪 **Мотивация**\n\n{motivation}" for motivation in MOTIVATIONAL_MESSAGES]
+
+async def send_cached_tip(callback: CallbackQuery):
+    """General tip without statistics and achievements, used under overload"""
+    await callback.message.edit_text(random.choice(CACHED_TIP_TEXTS), reply_markup=get_back_to_main(), parse_mode="Markdown")
+
+async def send_cached_motivation(callback: CallbackQuery):
+    """Motivation without statistics, used under overload"""
+    await callback.message.edit_text(random.choice(CACHED_MOTIVATION_TEXTS), reply_markup=get_back_to_main(), parse_mode="Markdown")
+
+@callbacks.data(SkillCallback, action=SkillAction.ADD_SESSION)
+@flags.load_shedding(priority=CRITICAL)
+async def add_session_start(callback: CallbackQuery, callback_data: SkillCallback, state: FSMContext):
     """Start adding practice session"""
-    skill_key = callback.data.replace("add_session_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.answer("❌ Навык не найден")
@@ -46,7 +63,8 @@ async def add_session_start(callback: CallbackQuery, state: FSMContext):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("time_"))
+@callbacks.prefix("time_")
+@flags.load_shedding(priority=CRITICAL)
 async def select_session_time(callback: CallbackQuery, state: FSMContext):
     """Select session time"""
     minutes = int(callback.data.replace("time_", ""))
@@ -60,7 +78,8 @@ async def select_session_time(callback: CallbackQuery, state: FSMContext):
     
     await add_session_with_time(callback, state, skill_key, minutes)
 
-@router.callback_query(F.data == "custom_time")
+@callbacks.exact("custom_time")
+@flags.load_shedding(priority=CRITICAL)
 async def custom_session_time(callback: CallbackQuery, state: FSMContext):
     """Request custom session time"""
     await state.set_state(ProgressStates.adding_progress)
@@ -137,7 +156,7 @@ async def add_session_with_time(event, state: FSMContext, skill_key: str, minute
         progress = min(100, (skill["total_time_minutes"] / skill["goal_minutes"]) * 100)
         text += f"\n🎯 Прогресс к цели: {progress:.1f}%"
     
-    keyboard = get_skill_actions(skill_key)
+    keyboard = get_skill_actions(skill["id"])
     
     if is_message:
         await event.answer(text, reply_markup=keyboard, parse_mode="Markdown")
@@ -157,7 +176,7 @@ async def add_session_with_time(event, state: FSMContext, skill_key: str, minute
     
     await state.clear()
 
-@router.callback_query(F.data == "progress")
+@callbacks.exact("progress")
 async def show_progress(callback: CallbackQuery):
     """Show overall progress"""
     user_id = str(callback.from_user.id)
@@ -205,13 +224,13 @@ async def show_progress(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("skill_stats_"))
-async def show_skill_stats(callback: CallbackQuery):
+@callbacks.data(SkillCallback, action=SkillAction.STATS)
+async def show_skill_stats(callback: CallbackQuery, callback_data: SkillCallback):
     """Show detailed skill statistics"""
-    skill_key = callback.data.replace("skill_stats_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.answer("❌ Навык не найден")
@@ -271,17 +290,18 @@ async def show_skill_stats(callback: CallbackQuery):
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_skill_actions(skill_key),
+        reply_markup=get_skill_actions(skill["id"]),
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("set_goal_"))
-async def set_goal_start(callback: CallbackQuery, state: FSMContext):
+@callbacks.data(SkillCallback, action=SkillAction.SET_GOAL)
+@flags.load_shedding(priority=CRITICAL)
+async def set_goal_start(callback: CallbackQuery, callback_data: SkillCallback, state: FSMContext):
     """Start setting goal for skill"""
-    skill_key = callback.data.replace("set_goal_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.answer("❌ Навык не найден")
@@ -359,7 +379,7 @@ async def process_goal(message: Message, state: FSMContext):
                 f"Удачи в достижении цели!"
             )
             
-            await message.answer(text, reply_markup=get_skill_actions(skill_key), parse_mode="Markdown")
+            await message.answer(text, reply_markup=get_skill_actions(user["skills"][skill_key]["id"]), parse_mode="Markdown")
         else:
             await message.answer("❌ Навык не найден", reply_markup=get_main_menu())
         
@@ -368,7 +388,8 @@ async def process_goal(message: Message, state: FSMContext):
     except ValueError:
         await message.answer("⚠️ Неверный формат. Используйте число часов (например: 10) или минут (например: 600м):")
 
-@router.callback_query(F.data == "get_tip")
+@callbacks.exact("get_tip")
+@flags.load_shedding(priority=CONTENT, fallback=send_cached_tip)
 async def get_general_tip(callback: CallbackQuery):
     """Get general learning tip"""
     user_id = str(callback.from_user.id)
@@ -376,14 +397,10 @@ async def get_general_tip(callback: CallbackQuery):
     # Update statistics
     data_manager.update_statistics(user_id, "tips_received")
     
-    # Get random tip
-    tips = LEARNING_TIPS["default"]
-    tip = random.choice(tips)
-    
     # Check for achievements
     new_achievements = achievement_manager.check_achievements(user_id)
     
-    text = f"💡 **Совет для обучения**\n\n{tip}"
+    text = random.choice(CACHED_TIP_TEXTS)
     
     await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
     
@@ -395,7 +412,8 @@ async def get_general_tip(callback: CallbackQuery):
         
         await callback.message.answer(achievement_text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "get_motivation")
+@callbacks.exact("get_motivation")
+@flags.load_shedding(priority=CONTENT, fallback=send_cached_motivation)
 async def get_motivation(callback: CallbackQuery):
     """Get motivational message"""
     user_id = str(callback.from_user.id)
@@ -403,14 +421,11 @@ async def get_motivation(callback: CallbackQuery):
     # Update statistics
     data_manager.update_statistics(user_id, "motivations_received")
     
-    # Get random motivation
-    motivation = random.choice(MOTIVATIONAL_MESSAGES)
-    
-    text = f"💪 **Мотивация**\n\n{motivation}"
+    text = random.choice(CACHED_MOTIVATION_TEXTS)
     
     await callback.message.edit_text(text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "statistics")
+@callbacks.exact("statistics")
 async def show_statistics(callback: CallbackQuery):
     """Show detailed user statistics"""
     user_id = str(callback.from_user.id)
@@ -1,24 +1,36 @@
-from aiogram import Router, F
+from aiogram import Router, flags
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 import random
+from typing import Optional
 
 from keyboards.inline import (
     get_skill_categories, get_skills_in_category, get_user_skills,
     get_skill_actions, get_main_menu, get_back_to_main, get_confirmation
 )
+from keyboards.callbacks import SkillAction, SkillCallback, CategoryCallback, CatalogSkillCallback
+from middlewares.load_shedding import CONTENT
 from states.user_states import SkillStates
-from utils.data_manager import DataManager
+from utils.data_manager import DataManager, find_skill_key
+from utils.callback_router import CallbackRoutes
 from utils.achievements import AchievementManager
 from config import SKILL_CATEGORIES, LEARNING_TIPS, STUDY_MATERIALS, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE
 
 router = Router()
+callbacks = CallbackRoutes("skills")
 
 # Initialize managers
 data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
 achievement_manager = AchievementManager(data_manager)
 
-@router.callback_query(F.data == "my_skills")
+# Catalog buttons refer to categories and skills by position
+CATEGORY_NAMES = list(SKILL_CATEGORIES)
+
+def get_catalog_category(index: int) -> Optional[str]:
+    """Category at position from button, None if config no longer has it"""
+    return CATEGORY_NAMES[index] if 0 <= index < len(CATEGORY_NAMES) else None
+
+@callbacks.exact("my_skills")
 async def show_my_skills(callback: CallbackQuery):
     """Show user's skills"""
     user_id = str(callback.from_user.id)
@@ -44,7 +56,7 @@ async def show_my_skills(callback: CallbackQuery):
         parse_mode="HTML"
     )
 
-@router.callback_query(F.data == "add_skill")
+@callbacks.exact("add_skill")
 async def add_skill_start(callback: CallbackQuery):
     """Start adding a new skill"""
     text = (
@@ -58,10 +70,13 @@ async def add_skill_start(callback: CallbackQuery):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("category_"))
-async def select_category(callback: CallbackQuery, state: FSMContext):
+@callbacks.data(CategoryCallback)
+async def select_category(callback: CallbackQuery, callback_data: CategoryCallback, state: FSMContext):
     """Select skill category"""
-    category = callback.data.replace("category_", "")
+    category = get_catalog_category(callback_data.category)
+    if category is None:
+        await callback.answer("❌ Категория не найдена")
+        return
     
     await state.update_data(selected_category=category)
     
@@ -76,19 +91,21 @@ async def select_category(callback: CallbackQuery, state: FSMContext):
         text = f"📚 **{category}**\n\nВыберите навык:"
         await callback.message.edit_text(
             text,
-            reply_markup=get_skills_in_category(category),
+            reply_markup=get_skills_in_category(callback_data.category),
             parse_mode="Markdown"
         )
 
-@router.callback_query(F.data.startswith("skill_"))
-async def select_skill(callback: CallbackQuery, state: FSMContext):
+@callbacks.data(CatalogSkillCallback)
+async def select_skill(callback: CallbackQuery, callback_data: CatalogSkillCallback, state: FSMContext):
     """Select specific skill"""
-    skill_name = callback.data.replace("skill_", "")
-    user_id = str(callback.from_user.id)
+    category = get_catalog_category(callback_data.category)
+    catalog = SKILL_CATEGORIES[category] if category else []
+    if not 0 <= callback_data.skill < len(catalog):
+        await callback.answer("❌ Навык не найден")
+        return
     
-    # Get category from state
-    data = await state.get_data()
-    category = data.get("selected_category", "Другое")
+    skill_name = catalog[callback_data.skill]
+    user_id = str(callback.from_user.id)
     
     # Add skill
     success = data_manager.add_skill(user_id, skill_name, category)
@@ -114,7 +131,7 @@ async def select_skill(callback: CallbackQuery, state: FSMContext):
     
     await state.clear()
 
-@router.callback_query(F.data == "custom_skill")
+@callbacks.exact("custom_skill")
 async def custom_skill_input(callback: CallbackQuery, state: FSMContext):
     """Handle custom skill input"""
     await state.set_state(SkillStates.waiting_for_custom_skill)
@@ -168,13 +185,13 @@ async def process_custom_skill(message: Message, state: FSMContext):
     
     await state.clear()
 
-@router.callback_query(F.data.startswith("view_skill_"))
-async def view_skill(callback: CallbackQuery, state: FSMContext):
+@callbacks.data(SkillCallback, action=SkillAction.VIEW)
+async def view_skill(callback: CallbackQuery, callback_data: SkillCallback, state: FSMContext):
     """View skill details"""
-    skill_key = callback.data.replace("view_skill_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.message.edit_text(
@@ -216,17 +233,18 @@ async def view_skill(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_skill_actions(skill_key),
+        reply_markup=get_skill_actions(skill["id"]),
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("skill_tip_"))
-async def get_skill_tip(callback: CallbackQuery):
+@callbacks.data(SkillCallback, action=SkillAction.TIP)
+@flags.load_shedding(priority=CONTENT)
+async def get_skill_tip(callback: CallbackQuery, callback_data: SkillCallback):
     """Get tip for specific skill"""
-    skill_key = callback.data.replace("skill_tip_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.answer("❌ Навык не найден")
@@ -257,13 +275,13 @@ async def get_skill_tip(callback: CallbackQuery):
         
         await callback.message.answer(achievement_text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("delete_skill_"))
-async def confirm_delete_skill(callback: CallbackQuery):
+@callbacks.data(SkillCallback, action=SkillAction.DELETE)
+async def confirm_delete_skill(callback: CallbackQuery, callback_data: SkillCallback):
     """Confirm skill deletion"""
-    skill_key = callback.data.replace("delete_skill_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.answer("❌ Навык не найден")
@@ -275,17 +293,19 @@ async def confirm_delete_skill(callback: CallbackQuery):
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_confirmation("delete_skill", skill_key),
+        reply_markup=get_confirmation(
+            SkillCallback(action=SkillAction.CONFIRM_DELETE, skill_id=callback_data.skill_id).pack()
+        ),
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("confirm_delete_skill_"))
-async def delete_skill(callback: CallbackQuery):
+@callbacks.data(SkillCallback, action=SkillAction.CONFIRM_DELETE)
+async def delete_skill(callback: CallbackQuery, callback_data: SkillCallback):
     """Delete skill"""
-    skill_key = callback.data.replace("confirm_delete_skill_", "")
     user_id = str(callback.from_user.id)
     
     user = data_manager.get_user(user_id)
+    skill_key = find_skill_key(user["skills"], callback_data.skill_id)
     
     if skill_key in user["skills"]:
         skill_name = user["skills"][skill_key]["name"]
@@ -298,13 +318,14 @@ async def delete_skill(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=get_main_menu(), parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("materials_"))
-async def show_study_materials(callback: CallbackQuery):
+@callbacks.data(SkillCallback, action=SkillAction.MATERIALS)
+@flags.load_shedding(priority=CONTENT)
+async def show_study_materials(callback: CallbackQuery, callback_data: SkillCallback):
     """Show study materials for specific skill"""
-    skill_key = callback.data.replace("materials_", "")
     user_id = str(callback.from_user.id)
     
     skills = data_manager.get_user_skills(user_id)
+    skill_key = find_skill_key(skills, callback_data.skill_id)
     
     if skill_key not in skills:
         await callback.answer("❌ Навык не найден")
@@ -339,4 +360,4 @@ async def show_study_materials(callback: CallbackQuery):
     
     text += "💡 _Начните с одного ресурса и изучайте последовательно!_"
     
-    await callback.message.edit_text(text, reply_markup=get_skill_actions(skill_key), parse_mode="Markdown")
+    await callback.message.edit_text(text, reply_markup=get_skill_actions(skill["id"]), parse_mode="Markdown")
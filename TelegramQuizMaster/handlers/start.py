@@ -1,14 +1,16 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from keyboards.inline import get_main_menu, get_back_to_main
 from utils.data_manager import DataManager
+from utils.callback_router import CallbackRoutes
 from utils.achievements import AchievementManager
 from config import USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE
 
 router = Router()
+callbacks = CallbackRoutes("start")
 
 # Initialize data manager
 data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
@@ -22,6 +24,11 @@ async def cmd_start(message: Message, state: FSMContext):
     user_id = str(message.from_user.id)
     user = data_manager.get_user(user_id)
     
+    # User is reachable again after restarting the bot
+    if user.get("blocked"):
+        user.pop("blocked")
+        data_manager.update_user(user_id, user)
+    
     # Check for new achievements
     new_achievements = achievement_manager.check_achievements(user_id)
     
@@ -73,7 +80,7 @@ async def cmd_help(message: Message):
     
     await message.answer(help_text, reply_markup=get_main_menu(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "main_menu")
+@callbacks.exact("main_menu")
 async def show_main_menu(callback: CallbackQuery, state: FSMContext):
     """Show main menu"""
     await state.clear()
@@ -85,7 +92,7 @@ async def show_main_menu(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.edit_text(text, reply_markup=get_main_menu(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "help")
+@callbacks.exact("help")
 async def show_help(callback: CallbackQuery):
     """Show help via callback"""
     help_text = (
@@ -105,7 +112,7 @@ async def show_help(callback: CallbackQuery):
     
     await callback.message.edit_text(help_text, reply_markup=get_back_to_main(), parse_mode="Markdown")
 
-@router.callback_query(F.data == "cancel")
+@callbacks.exact("cancel")
 async def cancel_action(callback: CallbackQuery, state: FSMContext):
     """Cancel current action"""
     await state.clear()
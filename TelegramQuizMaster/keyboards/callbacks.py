@@ -0,0 +1,28 @@
+from enum import Enum
+
+from aiogram.filters.callback_data import CallbackData
+
+class SkillAction(str, Enum):
+    """Buttons under a user's skill"""
+    VIEW = "view"
+    ADD_SESSION = "session"
+    TIP = "tip"
+    MATERIALS = "materials"
+    STATS = "stats"
+    SET_GOAL = "goal"
+    DELETE = "delete"
+    CONFIRM_DELETE = "delete_ok"
+
+class SkillCallback(CallbackData, prefix="sk"):
+    """Action on user's skill by its ID, e.g. sk:tip:3"""
+    action: SkillAction
+    skill_id: int
+
+class CategoryCallback(CallbackData, prefix="cat"):
+    """Skill category by position in SKILL_CATEGORIES"""
+    category: int
+
+class CatalogSkillCallback(CallbackData, prefix="cs"):
+    """Skill from category list by positions in SKILL_CATEGORIES"""
+    category: int
+    skill: int
@@ -1,6 +1,61 @@
+from functools import lru_cache, wraps
+from typing import Callable, Tuple
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from config import SKILL_CATEGORIES
+from pydantic import ConfigDict
+from config import SKILL_CATEGORIES, KEYBOARD_CACHE_SIZE
+from keyboards.callbacks import SkillAction, SkillCallback, CategoryCallback, CatalogSkillCallback
+
+class ReadOnlyRows(list):
+    """List refusing in-place changes, rows of keyboards shared by all replies
+    
+    Still a list, so aiogram serializes it like any other keyboard.
+    """
+    
+    def read_only(self, *args, **kwargs):
+        raise TypeError("Shared keyboard is read-only, copy its rows into a new markup")
+    
+    append = extend = insert = pop = remove = clear = sort = reverse = read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = read_only
+    
+    def __reduce_ex__(self, protocol):
+        # Copies are built from a plain list instead of appending items
+        return ReadOnlyRows, (list(self),)
+
+class FrozenButton(InlineKeyboardButton):
+    """Button of a shared keyboard, its fields can't be reassigned"""
+    model_config = ConfigDict(frozen=True)
+
+class FrozenKeyboard(InlineKeyboardMarkup):
+    """Markup shared by all replies, its rows can't be replaced"""
+    model_config = ConfigDict(frozen=True)
+
+def freeze(keyboard: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    """Read-only copy of markup, safe to share between replies
+    
+    aiogram markups are mutable pydantic models with list rows; freezing
+    rows, buttons and the markup keeps a handler that edits a shared
+    keyboard from changing it for everyone.
+    """
+    return FrozenKeyboard.model_construct(inline_keyboard=ReadOnlyRows(
+        ReadOnlyRows(FrozenButton(**button.model_dump(exclude_unset=True)) for button in row)
+        for row in keyboard.inline_keyboard
+    ))
 
+def prebuilt(build: Callable[[], InlineKeyboardMarkup]) -> Callable[[], InlineKeyboardMarkup]:
+    """Build static keyboard once at import, the getter returns that markup
+    
+    The markup is frozen, so one instance is shared by all replies.
+    The builder stays available as __wrapped__.
+    """
+    keyboard = freeze(build())
+    
+    @wraps(build)
+    def get() -> InlineKeyboardMarkup:
+        return keyboard
+    return get
+
+@prebuilt
 def get_main_menu() -> InlineKeyboardMarkup:
     """Main menu keyboard"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -23,28 +78,30 @@ def get_main_menu() -> InlineKeyboardMarkup:
     ])
     return keyboard
 
+@prebuilt
 def get_skill_categories() -> InlineKeyboardMarkup:
     """Skill categories keyboard"""
     keyboard = []
     
-    for category in SKILL_CATEGORIES.keys():
-        keyboard.append([InlineKeyboardButton(text=category, callback_data=f"category_{category}")])
+    for index, category in enumerate(SKILL_CATEGORIES.keys()):
+        callback_data = CategoryCallback(category=index).pack()
+        keyboard.append([InlineKeyboardButton(text=category, callback_data=callback_data)])
     
     keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_main")])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_skills_in_category(category: str) -> InlineKeyboardMarkup:
+def build_skills_in_category(category_index: int) -> InlineKeyboardMarkup:
     """Skills in category keyboard"""
-    skills = SKILL_CATEGORIES.get(category, [])
+    skills = list(SKILL_CATEGORIES.values())[category_index]
     keyboard = []
     
     # Add skills in rows of 2
     for i in range(0, len(skills), 2):
         row = []
         for j in range(i, min(i + 2, len(skills))):
-            skill = skills[j]
-            row.append(InlineKeyboardButton(text=skill, callback_data=f"skill_{skill}"))
+            callback_data = CatalogSkillCallback(category=category_index, skill=j).pack()
+            row.append(InlineKeyboardButton(text=skills[j], callback_data=callback_data))
         keyboard.append(row)
     
     # Add custom skill option
@@ -53,15 +110,25 @@ def get_skills_in_category(category: str) -> InlineKeyboardMarkup:
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+# Catalog is fixed in config, one keyboard per category
+SKILLS_IN_CATEGORY: Tuple[InlineKeyboardMarkup, ...] = tuple(
+    freeze(build_skills_in_category(index)) for index in range(len(SKILL_CATEGORIES))
+)
+
+def get_skills_in_category(category_index: int) -> InlineKeyboardMarkup:
+    """Skills in category keyboard"""
+    return SKILLS_IN_CATEGORY[category_index]
+
 def get_user_skills(skills: dict) -> InlineKeyboardMarkup:
     """User skills keyboard"""
     keyboard = []
     
-    for skill_key, skill_data in skills.items():
+    for skill_data in skills.values():
         skill_name = skill_data["name"]
         streak_emoji = "🔥" if skill_data["streak"] > 0 else "💤"
         button_text = f"{streak_emoji} {skill_name}"
-        keyboard.append([InlineKeyboardButton(text=button_text, callback_data=f"view_skill_{skill_key}")])
+        callback_data = SkillCallback(action=SkillAction.VIEW, skill_id=skill_data["id"]).pack()
+        keyboard.append([InlineKeyboardButton(text=button_text, callback_data=callback_data)])
     
     if not skills:
         keyboard.append([InlineKeyboardButton(text="➕ Добавить первый навык", callback_data="add_skill")])
@@ -70,27 +137,32 @@ def get_user_skills(skills: dict) -> InlineKeyboardMarkup:
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_skill_actions(skill_key: str) -> InlineKeyboardMarkup:
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_skill_actions(skill_id: int) -> InlineKeyboardMarkup:
     """Skill actions keyboard"""
+    def action(skill_action: SkillAction) -> str:
+        return SkillCallback(action=skill_action, skill_id=skill_id).pack()
+    
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="⏱️ Добавить сессию", callback_data=f"add_session_{skill_key}"),
-            InlineKeyboardButton(text="💡 Совет", callback_data=f"skill_tip_{skill_key}")
+            InlineKeyboardButton(text="⏱️ Добавить сессию", callback_data=action(SkillAction.ADD_SESSION)),
+            InlineKeyboardButton(text="💡 Совет", callback_data=action(SkillAction.TIP))
         ],
         [
-            InlineKeyboardButton(text="📚 Материалы", callback_data=f"materials_{skill_key}"),
-            InlineKeyboardButton(text="📊 Статистика", callback_data=f"skill_stats_{skill_key}")
+            InlineKeyboardButton(text="📚 Материалы", callback_data=action(SkillAction.MATERIALS)),
+            InlineKeyboardButton(text="📊 Статистика", callback_data=action(SkillAction.STATS))
         ],
         [
-            InlineKeyboardButton(text="🎯 Цель", callback_data=f"set_goal_{skill_key}"),
-            InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_skill_{skill_key}")
+            InlineKeyboardButton(text="🎯 Цель", callback_data=action(SkillAction.SET_GOAL)),
+            InlineKeyboardButton(text="🗑️ Удалить", callback_data=action(SkillAction.DELETE))
         ],
         [
             InlineKeyboardButton(text="🔙 Назад", callback_data="my_skills")
         ]
     ])
-    return keyboard
+    return freeze(keyboard)
 
+@prebuilt
 def get_session_time() -> InlineKeyboardMarkup:
     """Session time keyboard"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -111,17 +183,19 @@ def get_session_time() -> InlineKeyboardMarkup:
     ])
     return keyboard
 
+@prebuilt
 def get_back_to_main() -> InlineKeyboardMarkup:
     """Back to main menu keyboard"""
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔙 Главное меню", callback_data="main_menu")]
     ])
 
-def get_confirmation(action: str, data: str) -> InlineKeyboardMarkup:
-    """Confirmation keyboard"""
-    return InlineKeyboardMarkup(inline_keyboard=[
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_confirmation(confirm_data: str) -> InlineKeyboardMarkup:
+    """Confirmation keyboard, confirm_data is callback data of yes button"""
+    return freeze(InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="✅ Да", callback_data=f"confirm_{action}_{data}"),
+            InlineKeyboardButton(text="✅ Да", callback_data=confirm_data),
             InlineKeyboardButton(text="❌ Нет", callback_data="cancel")
         ]
-    ])
+    ]))
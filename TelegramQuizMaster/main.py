@@ -1,11 +1,28 @@
 import asyncio
 import logging
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
-from config import BOT_TOKEN
-from handlers import start, skills, progress, achievements, admin
+from config import (
+    BOT_TOKEN, BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEB_SERVER_HOST,
+    WEB_SERVER_PORT, HEALTH_PATH, METRICS_PATH, DROP_PENDING_UPDATES, TELEGRAM_API_URL, BOT_WORKERS,
+    REQUEST_RATE_PER_SECOND
+)
+from utils.cluster import Cluster
+from utils.workers import start_process_pool, shutdown_process_pool
+from middlewares.profile import ProfileMiddleware
+from middlewares.request_scheduler import RequestScheduler
+from middlewares.callback_answer import CallbackAnswerMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.load_shedding import LoadSheddingMiddleware
+from utils.callback_router import CallbackDispatcher
+from utils.background import cancel_background_tasks
+from utils.fsm_storage import ExpiringStorage, create_fsm_storage
 
 # Configure logging
 logging.basicConfig(
@@ -14,25 +31,163 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def main():
-    """Main function to run the bot"""
+# Telegram limits are per bot, cluster workers switch to one bucket shared by all of them
+request_scheduler = RequestScheduler(rate=REQUEST_RATE_PER_SECOND)
+callback_answers = CallbackAnswerMiddleware()
+throttling = ThrottlingMiddleware()
+
+async def on_startup(bot: Bot, primary: bool = True):
+    """Resume background jobs interrupted by restart, in primary worker only"""
+    from handlers import admin
+    from utils.achievements import backfill_points_ledger
+    
+    if not primary:
+        return
+    # No-op once done, with several workers front process already ran them
+    admin.data_manager.remove_misrouted_skills()
+    backfill_points_ledger(admin.data_manager)
+    start_process_pool()
+    admin.broadcast_manager.resume(bot)
+    admin.snapshot_manager.start()
+    admin.analytics_manager.start()
+    admin.stats_service.start()
+
+async def on_shutdown(primary: bool = True):
+    """Save progress of background jobs"""
+    from handlers import admin
+    
+    await cancel_background_tasks()
+    if not primary:
+        return
+    await admin.broadcast_manager.shutdown()
+    await admin.snapshot_manager.shutdown()
+    await admin.analytics_manager.shutdown()
+    await admin.stats_service.shutdown()
+    shutdown_process_pool()
+
+async def on_webhook_startup(bot: Bot, dispatcher: Dispatcher):
+    """Point Telegram at our webhook"""
+    if not WEBHOOK_BASE_URL:
+        logger.warning("WEBHOOK_BASE_URL is not set, webhook is not registered with Telegram")
+        return
+    
+    # Updates queued during restart are kept unless explicitly dropped
+    await bot.set_webhook(
+        url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=get_allowed_updates(dispatcher),
+        drop_pending_updates=DROP_PENDING_UPDATES
+    )
+    logger.info(f"Webhook set to {WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+def get_allowed_updates(dispatcher: Dispatcher):
+    """Update types handlers use, front dispatcher of workers lists them itself"""
+    return dispatcher.get("allowed_updates") or dispatcher.resolve_used_update_types()
+
+async def health(request: web.Request) -> web.Response:
+    """Liveness probe for hosting"""
+    return web.json_response({"status": "ok", "mode": BOT_MODE})
+
+async def metrics(request: web.Request) -> web.Response:
+    """Outgoing request queue, update queue and FSM metrics for Prometheus"""
+    text = request_scheduler.format_metrics() + throttling.format_metrics()
+    # Front process of workers handles no updates itself, workers log these
+    dp = request.app["dispatcher"]
+    if "load_shedding" in dp.workflow_data:
+        text += dp["load_shedding"].format_metrics()
+    if isinstance(dp.fsm.storage, ExpiringStorage):
+        text += dp.fsm.storage.format_metrics()
+    return web.Response(text=text, content_type="text/plain")
+
+def create_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """aiohttp application serving webhook and health routes"""
+    app = web.Application()
+    app["dispatcher"] = dp
+    app.router.add_get(HEALTH_PATH, health)
+    app.router.add_get(METRICS_PATH, metrics)
+    
+    # Requests without matching secret token header get 401
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET or None
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Serve updates by webhook until cancelled"""
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set, webhook accepts updates from anyone")
+    dp.startup.register(on_webhook_startup)
     
-    # Initialize bot with default properties
+    runner = web.AppRunner(create_app(dp, bot))
+    await runner.setup()
+    site = web.TCPSite(runner, WEB_SERVER_HOST, WEB_SERVER_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEB_SERVER_HOST}:{WEB_SERVER_PORT}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    """Long-poll updates, used for local runs"""
+    # getUpdates does not work while a webhook is set
+    await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
+    await dp.start_polling(bot, allowed_updates=get_allowed_updates(dp))
+
+def create_bot() -> Bot:
+    """Bot with default properties"""
+    # Local Bot API server or fake Telegram for tests
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
     bot = Bot(
         token=BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    # Initialize dispatcher
-    dp = Dispatcher()
+    # Callback answers are tracked before they can wait in scheduler queue
+    bot.session.middleware(callback_answers.track_request)
+    # Every outgoing request goes through global and per-chat limits
+    bot.session.middleware(request_scheduler)
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """Dispatcher running all handlers"""
+    # Imported here so front process of workers does not load handlers and user data
+    from handlers import start, skills, progress, achievements, admin
+    
+    # Abandoned flows expire, states survive restarts
+    dp = Dispatcher(storage=create_fsm_storage())
+    
+    # Buttons of all modules are routed by one compiled table, conflicts fail here
+    callback_dispatcher = CallbackDispatcher(
+        start.callbacks, skills.callbacks, progress.callbacks, achievements.callbacks, admin.callbacks
+    )
+    
+    # Button mashing and floods stop here, before they queue for a slot or touch storage
+    dp.update.outer_middleware(throttling)
+    # No button keeps spinning, whatever handler does or however long it waits for a slot
+    dp.update.outer_middleware(callback_answers)
+    # Under overload critical flows go first and content requests are shed
+    dp["load_shedding"] = LoadSheddingMiddleware(callback_dispatcher)
+    dp.update.outer_middleware(dp["load_shedding"])
+    # Capture user profiles for admin search
+    dp.update.outer_middleware(ProfileMiddleware())
+    
+    dp.include_router(callback_dispatcher.create_router())
     
     # Include routers
     dp.include_router(start.router)
     dp.include_router(skills.router)
     dp.include_router(progress.router)
-    dp.include_router(achievements.router)
     dp.include_router(admin.router)
     
+    # Background jobs lifecycle
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    
     # Error handler
     @dp.error()
     async def error_handler(update, exception):
@@ -49,14 +204,29 @@ async def main():
         
         return True  # Mark as handled
     
-    # Start polling
-    logger.info("Starting bot...")
+    return dp
+
+async def main():
+    """Main function to run the bot"""
+    # With several workers this process only receives and routes updates
+    if BOT_WORKERS > 1:
+        dp = Cluster(BOT_WORKERS).create_dispatcher()
+    else:
+        dp = create_dispatcher()
+    
+    bot = create_bot()
+    
+    # Start receiving updates
+    logger.info(f"Starting bot in {BOT_MODE} mode with {BOT_WORKERS} worker(s)...")
     try:
-        await dp.start_polling(bot, skip_updates=True)
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Error during polling: {e}")
+        logger.error(f"Error while receiving updates: {e}")
     finally:
         await bot.session.close()
 
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+from aiogram.methods import AnswerCallbackQuery, Response, TelegramMethod
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from config import CALLBACK_ANSWER_DEADLINE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class CallbackAnswerMiddleware(BaseMiddleware):
+    """Answer every callback query, so buttons never spin until Telegram gives up
+    
+    Handlers that answer within the deadline keep their own toast text; for
+    the rest an empty answer is sent at the deadline or when the handler ends,
+    whichever comes first. Late answers from handlers are then dropped.
+    Register as outer update middleware ahead of load shedding, so the
+    deadline also covers time spent waiting for a handler slot, and
+    track_request as Bot session middleware, it sees answers sent by handlers.
+    """
+    
+    def __init__(self, deadline: float = CALLBACK_ANSWER_DEADLINE_SECONDS):
+        self.deadline = deadline
+        # Callback ID -> answered flag of callbacks being handled
+        self.pending: Dict[str, bool] = {}
+    
+    async def answer(self, callback: CallbackQuery):
+        """Send empty answer unless handler already answered"""
+        if self.pending.get(callback.id) is False:
+            try:
+                await callback.answer()
+            except Exception as e:
+                logger.debug(f"Could not answer callback {callback.id}: {e}")
+    
+    async def answer_at_deadline(self, callback: CallbackQuery):
+        """Answer slow handlers' callbacks after deadline"""
+        await asyncio.sleep(self.deadline)
+        await self.answer(callback)
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update: Update = event
+        callback: Optional[CallbackQuery] = update.callback_query
+        if callback is None:
+            return await handler(event, data)
+        
+        self.pending[callback.id] = False
+        timer = asyncio.create_task(self.answer_at_deadline(callback))
+        try:
+            return await handler(event, data)
+        finally:
+            timer.cancel()
+            await self.answer(callback)
+            self.pending.pop(callback.id, None)
+    
+    async def track_request(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Response:
+        """Mark callbacks as answered, drop answers that came too late"""
+        if isinstance(method, AnswerCallbackQuery) and method.callback_query_id in self.pending:
+            if self.pending[method.callback_query_id]:
+                logger.debug(f"Dropped late answer to callback {method.callback_query_id}: {method.text}")
+                return Response[bool](ok=True, result=True)
+            # Set before sending, so concurrent answers see it right away
+            self.pending[method.callback_query_id] = True
+        return await make_request(bot, method)
@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from config import (
+    ADMIN_IDS, UPDATE_CONCURRENCY, UPDATE_SHED_THRESHOLD, UPDATE_QUEUE_MAX, UPDATE_METRICS_WINDOW
+)
+from utils.callback_router import CallbackDispatcher
+
+logger = logging.getLogger(__name__)
+
+# Update priority classes, lower value is handled first. Handlers choose theirs with
+# @flags.load_shedding(priority=..., fallback=...), fallback answers a shed callback
+CRITICAL = 0
+NORMAL = 1
+CONTENT = 2
+PRIORITY_NAMES = {CRITICAL: "critical", NORMAL: "normal", CONTENT: "content"}
+
+BUSY_TEXT = "⏳ Бот перегружен, попробуйте чуть позже"
+
+class LoadSheddingMiddleware(BaseMiddleware):
+    """Bounded, prioritised admission of updates to handlers
+    
+    Updates of admins, FSM inputs and handlers flagged critical (session
+    logging) overtake the rest when all slots are busy. Content requests
+    are shed first: above the threshold they get the handler's cached
+    fallback (or a busy toast) instead of a slot, and once the queue is
+    full only critical updates are still queued; shed messages get a busy
+    reply. Register as outer update middleware, after aiogram's FSM
+    middleware has set raw_state and after callback answering.
+    """
+    
+    def __init__(self, callbacks: CallbackDispatcher, concurrency: int = UPDATE_CONCURRENCY,
+                 shed_threshold: int = UPDATE_SHED_THRESHOLD, queue_max: int = UPDATE_QUEUE_MAX):
+        self.callbacks = callbacks
+        self.concurrency = concurrency
+        self.shed_threshold = shed_threshold
+        self.queue_max = queue_max
+        
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        
+        self.handled = {priority: 0 for priority in PRIORITY_NAMES}
+        self.delayed = {priority: 0 for priority in PRIORITY_NAMES}
+        self.shed = {priority: 0 for priority in PRIORITY_NAMES}
+        self.fallbacks = 0
+        self.waits: Dict[int, Deque[float]] = {
+            priority: deque(maxlen=UPDATE_METRICS_WINDOW) for priority in PRIORITY_NAMES
+        }
+    
+    def get_flag(self, update: Update) -> Dict[str, Any]:
+        """load_shedding flag of handler the callback is routed to"""
+        callback = update.callback_query
+        if callback is None or callback.data is None:
+            return {}
+        route = self.callbacks.match(callback.data)
+        if route is None:
+            return {}
+        return route.handler.flags.get("load_shedding", {})
+    
+    def get_priority(self, update: Update, data: Dict[str, Any], flag: Dict[str, Any]) -> int:
+        """Priority class of update"""
+        user = data.get("event_from_user")
+        if user is not None and user.id in ADMIN_IDS:
+            return CRITICAL
+        # User is in the middle of a flow, e.g. typing session minutes
+        if data.get("raw_state") is not None:
+            return CRITICAL
+        return flag.get("priority", NORMAL)
+    
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a handler slot, granted in priority order; True if update had to wait"""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return False
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Slot may have been granted right before cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        return True
+    
+    def release(self):
+        """Hand slot to next waiting update"""
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+    
+    async def shed_update(self, update: Update, priority: int, flag: Dict[str, Any]):
+        """Answer update without handler, callbacks are never left spinning"""
+        self.shed[priority] += 1
+        callback: Optional[CallbackQuery] = update.callback_query
+        if callback is None:
+            message: Optional[Message] = update.message
+            if message is not None:
+                try:
+                    await message.answer(BUSY_TEXT)
+                except Exception as e:
+                    logger.debug(f"Could not answer shed message of chat {message.chat.id}: {e}")
+            return
+        
+        fallback = flag.get("fallback")
+        try:
+            if fallback is not None:
+                await fallback(callback)
+                self.fallbacks += 1
+                await callback.answer()
+            else:
+                await callback.answer(BUSY_TEXT)
+        except Exception as e:
+            logger.debug(f"Could not answer shed callback {callback.id}: {e}")
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        flag = self.get_flag(event)
+        priority = self.get_priority(event, data, flag)
+        depth = len(self.waiters)
+        
+        if priority != CRITICAL and self.active >= self.concurrency:
+            if (priority == CONTENT and depth >= self.shed_threshold) or depth >= self.queue_max:
+                await self.shed_update(event, priority, flag)
+                return None
+        
+        started = time.monotonic()
+        if await self.acquire(priority):
+            self.delayed[priority] += 1
+        self.waits[priority].append(time.monotonic() - started)
+        self.handled[priority] += 1
+        
+        try:
+            return await handler(event, data)
+        finally:
+            self.release()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and handled, delayed and shed updates by priority"""
+        metrics = {
+            "queue_depth": len(self.waiters),
+            "active": self.active,
+            "fallbacks": self.fallbacks,
+            "priorities": {}
+        }
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self.waits[priority])
+            metrics["priorities"][name] = {
+                "handled": self.handled[priority],
+                "delayed": self.delayed[priority],
+                "shed": self.shed[priority],
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0
+            }
+        return metrics
+    
+    def format_metrics(self) -> str:
+        """Metrics in Prometheus text format"""
+        metrics = self.get_metrics()
+        lines = [
+            "# TYPE bot_update_queue_depth gauge",
+            f"bot_update_queue_depth {metrics['queue_depth']}",
+            "# TYPE bot_updates_active gauge",
+            f"bot_updates_active {metrics['active']}",
+            "# TYPE bot_update_fallbacks_total counter",
+            f"bot_update_fallbacks_total {metrics['fallbacks']}"
+        ]
+        for field, name, metric_type in (
+            ("handled", "bot_updates_handled_total", "counter"),
+            ("delayed", "bot_updates_delayed_total", "counter"),
+            ("shed", "bot_updates_shed_total", "counter"),
+            ("wait_avg", "bot_update_wait_avg_seconds", "gauge"),
+            ("wait_max", "bot_update_wait_max_seconds", "gauge")
+        ):
+            lines.append(f"# TYPE {name} {metric_type}")
+            for priority, values in metrics["priorities"].items():
+                lines.append(f'{name}{{priority="{priority}"}} {values[field]:.6g}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from utils.data_manager import DataManager
+from config import USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE, PROFILE_CACHE_MAX
+
+data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
+
+class ProfileMiddleware(BaseMiddleware):
+    """Store username and names of users so admins can search them"""
+    
+    def __init__(self, max_users: int = PROFILE_CACHE_MAX):
+        # Last stored profile of recently active users, storage is only touched
+        # when it changes; users forgotten above the cap are compared with storage again
+        self.seen: "OrderedDict[int, Tuple]" = OrderedDict()
+        self.max_users = max_users
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        result = await handler(event, data)
+        
+        # After handler, so /start has already created the user record
+        user: User = data.get("event_from_user")
+        if user and not user.is_bot:
+            profile = (user.username, user.first_name, user.last_name)
+            if self.seen.get(user.id) == profile:
+                self.seen.move_to_end(user.id)
+            elif data_manager.update_profile(str(user.id), {
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name
+            }):
+                self.seen[user.id] = profile
+                self.seen.move_to_end(user.id)
+                if len(self.seen) > self.max_users:
+                    self.seen.popitem(last=False)
+        
+        return result
@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+
+from config import (
+    REQUEST_RATE_PER_SECOND, REQUEST_CHAT_RATE_PER_SECOND, REQUEST_CHAT_BURST,
+    REQUEST_GROUP_RATE_PER_MINUTE, REQUEST_MAX_RETRIES, REQUEST_METRICS_WINDOW
+)
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Lower value is sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background", PRIORITY_BULK: "bulk"}
+
+# Priority of requests made from current task, replies to users by default
+_request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+# Methods that post or change messages count against Telegram limits
+LIMITED_METHOD_PREFIXES = ("send", "edit", "copy", "forward")
+CHAT_BUCKETS_MAX = 10000
+
+def set_request_priority(priority: int):
+    """Use priority for all further requests of current task"""
+    _request_priority.set(priority)
+
+class RequestScheduler(BaseRequestMiddleware):
+    """Bot session middleware keeping outgoing requests within Telegram limits
+    
+    Each message request first waits for its chat bucket, then for a slot of
+    the global bucket; global slots go to waiting requests by priority, so
+    replies overtake broadcasts. Flood control answers are retried after
+    retry_after instead of failing.
+    """
+    
+    def __init__(self, rate: float = REQUEST_RATE_PER_SECOND, chat_rate: float = REQUEST_CHAT_RATE_PER_SECOND,
+                 chat_burst: float = REQUEST_CHAT_BURST, group_rate: float = REQUEST_GROUP_RATE_PER_MINUTE / 60,
+                 max_retries: int = REQUEST_MAX_RETRIES):
+        self.bucket = TokenBucket(rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.chat_buckets: Dict[Any, TokenBucket] = {}
+        
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.pump_task: Optional[asyncio.Task] = None
+        
+        self.requests = {priority: 0 for priority in PRIORITY_NAMES}
+        self.waits: Dict[int, Deque[float]] = {
+            priority: deque(maxlen=REQUEST_METRICS_WINDOW) for priority in PRIORITY_NAMES
+        }
+        self.retries = 0
+    
+    def use_bucket(self, bucket: TokenBucket):
+        """Take global slots from given bucket, e.g. one shared by worker processes"""
+        self.bucket = bucket
+    
+    def get_chat_bucket(self, chat_id: Any) -> TokenBucket:
+        """Bucket of chat, groups get the slower group limit"""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= CHAT_BUCKETS_MAX:
+                # Full buckets belong to idle chats and are recreated on demand
+                self.chat_buckets = {
+                    key: value for key, value in self.chat_buckets.items()
+                    if value.wait_time(value.capacity) > 0
+                }
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+    
+    async def acquire(self, priority: int):
+        """Wait for global slot, granted in priority order"""
+        if not self.waiters and self.bucket.try_acquire():
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        if self.pump_task is None or self.pump_task.done():
+            self.pump_task = asyncio.create_task(self.pump())
+        await future
+    
+    async def pump(self):
+        """Hand out global slots to waiting requests while there are any"""
+        while self.waiters:
+            _, _, future = self.waiters[0]
+            # Cancelled requests do not use up a slot
+            if future.done():
+                heapq.heappop(self.waiters)
+                continue
+            
+            # Waiter stays queued until it gets its slot, another process
+            # sharing the bucket may take the token that wait_time promised
+            if not self.bucket.try_acquire():
+                await asyncio.sleep(self.bucket.wait_time())
+                continue
+            
+            heapq.heappop(self.waiters)
+            future.set_result(None)
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ) -> Response:
+        limited = method.__api_method__.startswith(LIMITED_METHOD_PREFIXES)
+        chat_id = getattr(method, "chat_id", None)
+        priority = _request_priority.get()
+        
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                started = time.monotonic()
+                if chat_id is not None:
+                    await self.get_chat_bucket(chat_id).acquire()
+                await self.acquire(priority)
+                self.requests[priority] += 1
+                self.waits[priority].append(time.monotonic() - started)
+            
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                # Chat floods only hold back that chat, the rest keeps going
+                self.retries += 1
+                bucket = self.get_chat_bucket(chat_id) if chat_id is not None else self.bucket
+                bucket.block_for(e.retry_after)
+                logger.warning(f"{method.__api_method__} hit flood control, retrying in {e.retry_after}s")
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, request counts and wait times by priority"""
+        metrics = {
+            "queue_depth": len(self.waiters),
+            "chats": len(self.chat_buckets),
+            "retries": self.retries,
+            "priorities": {}
+        }
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self.waits[priority])
+            metrics["priorities"][name] = {
+                "queued": sum(1 for waiter in self.waiters if waiter[0] == priority),
+                "requests": self.requests[priority],
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0
+            }
+        return metrics
+    
+    def format_metrics(self) -> str:
+        """Metrics in Prometheus text format"""
+        metrics = self.get_metrics()
+        lines = [
+            "# TYPE bot_request_queue_depth gauge",
+            f"bot_request_queue_depth {metrics['queue_depth']}",
+            "# TYPE bot_request_retries_total counter",
+            f"bot_request_retries_total {metrics['retries']}",
+            "# TYPE bot_request_chat_buckets gauge",
+            f"bot_request_chat_buckets {metrics['chats']}"
+        ]
+        for field, metric_type in (("queued", "gauge"), ("requests", "counter"), ("wait_avg", "gauge"),
+                                   ("wait_p95", "gauge"), ("wait_max", "gauge")):
+            name = "bot_requests_total" if field == "requests" else f"bot_request_{field}"
+            if field.startswith("wait"):
+                name += "_seconds"
+            lines.append(f"# TYPE {name} {metric_type}")
+            for priority, values in metrics["priorities"].items():
+                lines.append(f'{name}{{priority="{priority}"}} {values[field]:.6g}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,133 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update, User
+
+from config import THROTTLE_RATE_PER_SECOND, THROTTLE_BURST, CALLBACK_COALESCE_SECONDS
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+USER_BUCKETS_MAX = 10000
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Limit how often one user's updates reach handlers
+    
+    A callback with the same data as one the user sent within the coalesce
+    window is a repeated tap: it is answered right away and skipped, the
+    first tap's handler does the work once. Beyond that each user has a
+    token bucket; callbacks over the limit get a short toast, messages are
+    dropped with one notice until the user is let through again. Messages
+    answering a conversation step (active FSM state) are never dropped.
+    Register as outer update middleware after FSM context and ahead of
+    load shedding, so skipped updates never take a place in its queue.
+    """
+    
+    def __init__(self, rate: float = THROTTLE_RATE_PER_SECOND, burst: float = THROTTLE_BURST,
+                 coalesce_seconds: float = CALLBACK_COALESCE_SECONDS):
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_seconds = coalesce_seconds
+        self.buckets: Dict[int, TokenBucket] = {}
+        # (user ID, callback data) -> time of first tap, oldest first
+        self.recent_callbacks: "OrderedDict[Tuple[int, str], float]" = OrderedDict()
+        # Users told about dropped messages since their last handled update
+        self.notified: Set[int] = set()
+        
+        self.throttled = 0
+        self.coalesced = 0
+    
+    def get_bucket(self, user_id: int) -> TokenBucket:
+        """Bucket of user, buckets of idle users are dropped when there are many"""
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            if len(self.buckets) >= USER_BUCKETS_MAX:
+                # Full buckets belong to idle users and are recreated on demand
+                self.buckets = {
+                    key: value for key, value in self.buckets.items()
+                    if value.wait_time(value.capacity) > 0
+                }
+                self.notified &= self.buckets.keys()
+            bucket = self.buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+    
+    def is_repeated_tap(self, user_id: int, data: str) -> bool:
+        """True if user pressed same button within coalesce window, else remember this tap"""
+        now = time.monotonic()
+        while self.recent_callbacks:
+            key, tapped_at = next(iter(self.recent_callbacks.items()))
+            if now - tapped_at <= self.coalesce_seconds:
+                break
+            del self.recent_callbacks[key]
+        
+        key = (user_id, data)
+        if key in self.recent_callbacks:
+            return True
+        self.recent_callbacks[key] = now
+        return False
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update: Update = event
+        user: User = data.get("event_from_user")
+        # Only messages and button taps are limited
+        if user is None or (update.message is None and update.callback_query is None):
+            return await handler(event, data)
+        callback = update.callback_query
+        
+        if callback is not None and callback.data is not None and self.is_repeated_tap(user.id, callback.data):
+            self.coalesced += 1
+            await self.answer(callback)
+            return None
+        
+        # Text typed into a conversation step (minutes, skill name) is never lost
+        if callback is None and data.get("raw_state") is not None:
+            return await handler(event, data)
+        
+        if not self.get_bucket(user.id).try_acquire():
+            self.throttled += 1
+            logger.debug(f"Throttled update of user {user.id}")
+            if callback is not None:
+                await self.answer(callback, "⏳ Слишком часто, подождите секунду")
+            elif user.id not in self.notified:
+                self.notified.add(user.id)
+                await self.notify(update.message)
+            return None
+        
+        self.notified.discard(user.id)
+        return await handler(event, data)
+    
+    async def answer(self, callback: CallbackQuery, text: Optional[str] = None):
+        """Stop button spinner of skipped callback"""
+        try:
+            await callback.answer(text)
+        except Exception as e:
+            logger.debug(f"Could not answer callback {callback.id}: {e}")
+    
+    async def notify(self, message: Message):
+        """Tell user their messages are being dropped"""
+        try:
+            await message.answer("⏳ Слишком много сообщений, подождите пару секунд и повторите")
+        except Exception as e:
+            logger.debug(f"Could not notify user {message.chat.id}: {e}")
+    
+    def get_metrics(self) -> Dict[str, int]:
+        """Skipped update counters"""
+        return {"throttled": self.throttled, "coalesced": self.coalesced, "users": len(self.buckets)}
+    
+    def format_metrics(self) -> str:
+        """Metrics in Prometheus text format"""
+        metrics = self.get_metrics()
+        return (
+            "# TYPE bot_throttled_updates_total counter\n"
+            f"bot_throttled_updates_total {metrics['throttled']}\n"
+            "# TYPE bot_coalesced_callbacks_total counter\n"
+            f"bot_coalesced_callbacks_total {metrics['coalesced']}\n"
+        )
@@ -0,0 +1,46 @@
+"""Micro-benchmark of inline keyboard rendering
+
+Compares building a keyboard (button and markup validation, callback data
+packing) with getting the prebuilt or cached one handlers use:
+    
+    python scripts/bench_keyboards.py --number 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyboards.inline import (
+    get_main_menu, get_skill_categories, get_session_time, get_back_to_main,
+    build_skills_in_category, get_skills_in_category, get_skill_actions
+)
+
+def get_cases() -> List[Tuple[str, Callable, Callable]]:
+    """Name, building call and call used by handlers"""
+    cases = [
+        (getter.__name__, getter.__wrapped__, getter)
+        for getter in (get_main_menu, get_skill_categories, get_session_time, get_back_to_main)
+    ]
+    cases.append(("get_skills_in_category", lambda: build_skills_in_category(0), lambda: get_skills_in_category(0)))
+    # Cached after first render of the skill, like a user going back and forth
+    get_skill_actions(42)
+    cases.append(("get_skill_actions", lambda: get_skill_actions.__wrapped__(42), lambda: get_skill_actions(42)))
+    return cases
+
+def run(number: int, repeat: int):
+    """Print best time per render of each keyboard"""
+    print(f"{'keyboard':<24} {'build, us':>10} {'cached, us':>11} {'speedup':>8}")
+    for name, build, cached in get_cases():
+        build_time = min(timeit.repeat(build, number=number, repeat=repeat)) / number
+        cached_time = min(timeit.repeat(cached, number=number, repeat=repeat)) / number
+        print(f"{name:<24} {build_time * 1e6:>10.2f} {cached_time * 1e6:>11.3f} {build_time / cached_time:>7.0f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="renders per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements, best one is printed")
+    args = parser.parse_args()
+    run(args.number, args.repeat)
@@ -0,0 +1,168 @@
+"""Fake Telegram for local webhook tests
+
+Serves a minimal Bot API that records every call the bot makes, waits for the
+bot's health route, then posts sample updates to its webhook:
+    
+    python scripts/fake_telegram.py --secret test
+    BOT_TOKEN=123:TEST BOT_MODE=webhook WEBHOOK_SECRET=test \\
+        TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from aiohttp import ClientSession, ClientError, web
+
+# Buttons every user presses, the last one adds first skill of first catalog category
+BUTTONS = ("progress", "statistics", "cs:0:0")
+
+class FakeTelegram:
+    """Bot API stub answering bot requests and producing updates"""
+    
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self.update_id = 0
+        self.message_id = 0
+    
+    def make_message(self, chat_id: int, text: str = "") -> Dict[str, Any]:
+        """Message object as returned by send/edit methods"""
+        self.message_id += 1
+        return {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text
+        }
+    
+    def make_user(self, user_id: int) -> Dict[str, Any]:
+        """Telegram user object"""
+        return {"id": user_id, "is_bot": False, "first_name": f"Tester{user_id}"}
+    
+    def make_command_update(self, user_id: int, command: str) -> Dict[str, Any]:
+        """Update with command message from private chat"""
+        self.update_id += 1
+        message = self.make_message(user_id, command)
+        message["chat"].update(self.make_user(user_id))
+        message["chat"].pop("is_bot")
+        message["from"] = self.make_user(user_id)
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"update_id": self.update_id, "message": message}
+    
+    def make_callback_update(self, user_id: int, data: str) -> Dict[str, Any]:
+        """Update with button press under bot message"""
+        self.update_id += 1
+        message = self.make_message(user_id, "menu")
+        message["from"] = {"id": 1, "is_bot": True, "first_name": "FakeBot"}
+        callback = {
+            "id": str(self.update_id),
+            "from": self.make_user(user_id),
+            "chat_instance": str(user_id),
+            "message": message,
+            "data": data
+        }
+        return {"update_id": self.update_id, "callback_query": callback}
+    
+    async def handle_api(self, request: web.Request) -> web.Response:
+        """Record Bot API call and answer with plausible result"""
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls.append({"method": method, "params": params})
+        
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        elif method.startswith(("send", "edit")):
+            result = self.make_message(int(params.get("chat_id", 0)), params.get("text", ""))
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+async def wait_healthy(session: ClientSession, url: str, timeout: float) -> bool:
+    """Poll bot health route until it answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return True
+        except ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+async def run(args: argparse.Namespace) -> int:
+    """Start fake API, send updates, report what bot did"""
+    fake = FakeTelegram()
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", fake.handle_api)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Fake Bot API on http://{args.host}:{args.port}")
+    
+    failures = 0
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    try:
+        async with ClientSession() as session:
+            if not await wait_healthy(session, f"{args.bot}{args.health_path}", args.wait):
+                print("Bot health route did not answer")
+                return 1
+            print("Bot is healthy")
+            
+            started = time.monotonic()
+            for user_id in range(1000, 1000 + args.users):
+                updates = [fake.make_command_update(user_id, command) for command in ("/start", "/help")]
+                updates += [fake.make_callback_update(user_id, data) for data in BUTTONS]
+                for update in updates:
+                    async with session.post(f"{args.bot}{args.webhook_path}", json=update, headers=headers) as response:
+                        if response.status != 200:
+                            print(f"Update {update['update_id']} rejected: HTTP {response.status}")
+                            failures += 1
+            print(f"Posted {fake.update_id} updates in {time.monotonic() - started:.2f}s")
+            
+            if args.secret:
+                update = fake.make_command_update(999, "/start")
+                bad_headers = {"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+                async with session.post(f"{args.bot}{args.webhook_path}", json=update, headers=bad_headers) as response:
+                    if response.status == 401:
+                        print("Wrong secret token rejected")
+                    else:
+                        print(f"Wrong secret token accepted: HTTP {response.status}")
+                        failures += 1
+            
+            # Webhook answers before handlers finish, give them time to reply
+            await asyncio.sleep(args.settle)
+    finally:
+        await runner.cleanup()
+    
+    methods = Counter(call["method"] for call in fake.calls)
+    print("Bot API calls: " + json.dumps(methods, ensure_ascii=False))
+    replied = {call["params"].get("chat_id") for call in fake.calls if call["method"] == "sendMessage"}
+    if len(replied) < args.users:
+        print(f"Only {len(replied)} of {args.users} users got a reply")
+        failures += 1
+    answered = {call["params"].get("callback_query_id") for call in fake.calls if call["method"] == "answerCallbackQuery"}
+    if len(answered) < args.users * len(BUTTONS):
+        print(f"Only {len(answered)} of {args.users * len(BUTTONS)} button presses were answered")
+        failures += 1
+    return 1 if failures else 0
+
+def main(argv: Optional[list] = None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Fake Telegram posting updates to bot webhook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081, help="port of fake Bot API")
+    parser.add_argument("--bot", default="http://127.0.0.1:8080", help="base URL of bot web server")
+    parser.add_argument("--webhook-path", default="/webhook")
+    parser.add_argument("--health-path", default="/health")
+    parser.add_argument("--secret", default="", help="WEBHOOK_SECRET the bot runs with")
+    parser.add_argument("--users", type=int, default=5, help="simulated users, each sends /start, /help and presses buttons")
+    parser.add_argument("--wait", type=float, default=30, help="seconds to wait for bot to start")
+    parser.add_argument("--settle", type=float, default=2, help="seconds to wait for replies")
+    args = parser.parse_args(argv)
+    raise SystemExit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
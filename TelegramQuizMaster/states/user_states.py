@@ -11,3 +11,5 @@ class ProgressStates(StatesGroup):
 
 class AdminStates(StatesGroup):
     waiting_for_broadcast_message = State()
+    waiting_for_restore_file = State()
+    waiting_for_user_search = State()
@@ -0,0 +1,93 @@
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run every test in its own directory, managers create data/ in cwd"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+class FakeClock:
+    """Clock that only moves when test moves it"""
+    
+    def __init__(self):
+        # Small start keeps sub-second steps precise, at epoch-sized values
+        # 0.1s of refill comes out just short of a token
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """Freeze both monotonic and wall time, rate limits use one and FSM expiry the other"""
+    clock = FakeClock()
+    # Modules call time.monotonic() and time.time() through the time module,
+    # so patching it reaches all of them; asyncio reads the clock at call time
+    monkeypatch.setattr(time, "monotonic", clock)
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+class RecordingSession(BaseSession):
+    """Bot API session answering every request with True and keeping them"""
+    
+    def __init__(self):
+        super().__init__()
+        self.calls: List[TelegramMethod] = []
+    
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls.append(method)
+        return True
+    
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+    
+    async def close(self):
+        pass
+    
+    def sent(self, method_type: type) -> List[TelegramMethod]:
+        """Requests of given method type, in order"""
+        return [call for call in self.calls if isinstance(call, method_type)]
+
+class UpdateFactory:
+    """Message and callback updates of private chats, bound to test bot"""
+    
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.update_id = 0
+    
+    def make(self, user_id: int, **event: Any) -> Update:
+        self.update_id += 1
+        return Update.model_validate({"update_id": self.update_id, **event}, context={"bot": self.bot})
+    
+    def message(self, user_id: int, text: str = "hi") -> Update:
+        return self.make(user_id, message={
+            "message_id": self.update_id + 1, "date": 0, "text": text,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"}
+        })
+    
+    def callback(self, user_id: int, data: str) -> Update:
+        return self.make(user_id, callback_query={
+            "id": f"cb{self.update_id + 1}", "chat_instance": "1", "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"}
+        })
+    
+    @staticmethod
+    def context(update: Update, **data: Any) -> Dict[str, Any]:
+        """Middleware data aiogram's own middlewares would have set"""
+        return {"event_from_user": update.event.from_user, "raw_state": None, **data}
+
+@pytest.fixture
+def bot() -> Bot:
+    return Bot("42:TEST", session=RecordingSession())
+
+@pytest.fixture
+def updates(bot) -> UpdateFactory:
+    return UpdateFactory(bot)
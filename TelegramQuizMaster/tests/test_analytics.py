@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils import analytics
+from utils.analytics import AnalyticsManager, ColumnarSnapshot, parse_timestamps
+
+def days_ago(days: float) -> str:
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+def skill(category: str, minutes: int, sessions: int, streak: int = 0) -> dict:
+    return {"category": category, "total_time_minutes": minutes, "sessions": sessions, "streak": streak,
+            "best_streak": streak, "last_session": days_ago(1)}
+
+@pytest.fixture
+def users_data() -> dict:
+    return {
+        "1": {"created_at": days_ago(40), "last_active": days_ago(2), "skills": {
+            "python": skill("💻 Программирование", 120, 4, streak=3),
+            "sql": skill("💻 Программирование", 30, 1, streak=1),
+            "guitar": skill("🎵 Музыка", 45, 3)
+        }},
+        "2": {"created_at": days_ago(10), "last_active": days_ago(9), "skills": {
+            "python": skill("💻 Программирование", 600, 20, streak=7)
+        }},
+        # Never active and no skills, inactive since signup
+        "3": {"created_at": days_ago(100), "skills": {}}
+    }
+
+def test_timestamps_parse_to_seconds_and_missing_to_nan():
+    seconds = parse_timestamps(["2025-01-01T00:00:00", None, "2025-01-01T00:01:30.500000", ""])
+    assert seconds[2] - seconds[0] == 90
+    assert np.isnan(seconds[1]) and np.isnan(seconds[3])
+
+def test_columns_match_nested_users(users_data):
+    snapshot = ColumnarSnapshot(users_data)
+    assert (snapshot.user_count, snapshot.skill_count) == (3, 4)
+    assert snapshot.user_skills.tolist() == [3, 1, 0]
+    assert snapshot.user_minutes.tolist() == [195, 600, 0]
+    assert snapshot.user_sessions.tolist() == [8, 20, 0]
+    assert snapshot.user_max_streak.tolist() == [3, 7, 0]
+
+def test_categories_are_grouped_by_distinct_users(users_data):
+    groups = ColumnarSnapshot(users_data).group_by_category()
+    assert groups == [
+        {"category": "💻 Программирование", "skills": 3, "users": 2, "minutes": 750, "sessions": 25},
+        {"category": "🎵 Музыка", "skills": 1, "users": 1, "minutes": 45, "sessions": 3}
+    ]
+
+def test_histogram_and_distribution(users_data):
+    snapshot = ColumnarSnapshot(users_data)
+    rows = snapshot.histogram(snapshot.user_minutes, analytics.MINUTES_BINS)
+    assert rows[0] == ("0", 1)
+    assert dict(rows)["180-599"] == 1 and dict(rows)["600-1799"] == 1
+    assert rows[-1] == ("6000+", 0)
+    assert sum(count for _, count in rows) == snapshot.user_count
+    
+    distribution = snapshot.distribution(snapshot.user_minutes)
+    assert distribution["count"] == 3 and distribution["max"] == 600 and distribution["p50"] == 195
+    assert snapshot.distribution(np.array([np.nan]))["count"] == 0
+
+def test_activity_falls_back_to_signup_date(users_data):
+    snapshot = ColumnarSnapshot(users_data)
+    assert snapshot.inactive_days().round().tolist() == [2, 9, 100]
+    assert snapshot.active_users(7) == 1
+    assert snapshot.active_users(30) == 2
+
+def test_empty_store_builds_empty_columns():
+    snapshot = ColumnarSnapshot({})
+    assert snapshot.user_count == snapshot.skill_count == 0
+    assert snapshot.group_by_category() == []
+    assert snapshot.active_users(7) == 0
+
+class StubDataManager:
+    def __init__(self, users_data):
+        self.users_data = users_data
+    
+    def load_users_data(self):
+        return self.users_data
+
+def test_snapshot_is_rebuilt_once_stale(monkeypatch, users_data):
+    async def run_here(func, *args):
+        return func(*args)
+    monkeypatch.setattr(analytics, "run_in_process", run_here)
+    manager = AnalyticsManager(StubDataManager(users_data), refresh_minutes=1)
+    
+    async def main():
+        first = await manager.get_snapshot()
+        assert await manager.get_snapshot() is first
+        
+        first.built_at -= timedelta(minutes=2)
+        second = await manager.get_snapshot()
+        assert second is not first and second.user_count == 3
+    
+    asyncio.run(main())
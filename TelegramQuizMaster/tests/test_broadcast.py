@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.methods import EditMessageText, SendMessage
+
+from config import BROADCAST_RATE_PER_SECOND
+from tests.conftest import RecordingSession
+from utils.broadcast import BroadcastManager
+from utils.data_manager import DataManager
+
+ADMIN_CHAT = 999
+
+class TelegramSession(RecordingSession):
+    """Session rejecting users who blocked the bot and Markdown with unpaired underscores"""
+    
+    def __init__(self, blocked=()):
+        super().__init__()
+        self.blocked = set(blocked)
+        self.sent_at = []
+    
+    async def make_request(self, bot, method, timeout=None):
+        await super().make_request(bot, method, timeout)
+        if isinstance(method, SendMessage):
+            if method.chat_id in self.blocked:
+                raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+            if method.text.count("_") % 2:
+                raise TelegramBadRequest(method=method, message="Bad Request: can't parse entities")
+            self.sent_at.append(asyncio.get_running_loop().time())
+        return True
+    
+    def recipients(self):
+        return [call.chat_id for call in self.sent(SendMessage) if call.chat_id != ADMIN_CHAT]
+
+@pytest.fixture
+def data_manager(workdir) -> DataManager:
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    for user_id in range(1, 31):
+        data_manager.get_user(str(user_id))
+    return data_manager
+
+def make_manager(workdir, data_manager) -> BroadcastManager:
+    return BroadcastManager(data_manager, str(workdir / "data" / "broadcasts.json"))
+
+def create_job(manager: BroadcastManager):
+    job = manager.create_job("Новая неделя, новые цели!", ADMIN_CHAT)
+    # Status message is edited in place, as once the admin handler posted it
+    job.state["status_message_id"] = 1
+    return job
+
+def test_restarted_bot_resumes_from_checkpoint_cursor(workdir, data_manager):
+    manager = make_manager(workdir, data_manager)
+    job = create_job(manager)
+    # Checkpoint of a run stopped after users below 11 got the message
+    job.state.update(done_below=11, sent=10)
+    manager.save_state()
+    
+    restarted = make_manager(workdir, data_manager)
+    session = TelegramSession()
+    
+    async def main():
+        restarted.resume(Bot("42:TEST", session=session))
+        await restarted.get_job(job.job_id).task
+    
+    asyncio.run(main())
+    assert sorted(session.recipients()) == list(range(11, 31))
+    state = make_manager(workdir, data_manager).get_job(job.job_id).state
+    assert state["status"] == "done" and state["sent"] == 30 and state["done_below"] == 31
+    assert session.sent(EditMessageText)[-1].text.startswith("✅ Рассылка завершена!")
+
+def test_users_who_blocked_bot_are_marked_and_skipped_next_time(workdir, data_manager):
+    manager = make_manager(workdir, data_manager)
+    job = create_job(manager)
+    session = TelegramSession(blocked={3, 5})
+    
+    asyncio.run(manager.run(Bot("42:TEST", session=session), job))
+    assert (job.state["sent"], job.state["blocked"], job.state["failed"]) == (28, 2, 0)
+    users = data_manager.read_users_file()
+    assert users["3"]["blocked"] and users["5"]["blocked"] and not users["4"].get("blocked")
+    assert create_job(manager).state["total"] == 28
+
+def test_sends_stay_within_broadcast_rate(workdir, data_manager):
+    for user_id in range(31, 41):
+        data_manager.get_user(str(user_id))
+    manager = make_manager(workdir, data_manager)
+    session = TelegramSession()
+    
+    asyncio.run(manager.run(Bot("42:TEST", session=session), create_job(manager)))
+    assert len(session.recipients()) == 40
+    # Burst of one second worth of messages, then one every 1/rate seconds
+    elapsed = session.sent_at[-1] - session.sent_at[0]
+    assert elapsed == pytest.approx((40 - BROADCAST_RATE_PER_SECOND) / BROADCAST_RATE_PER_SECOND, abs=0.15)
+
+def test_text_telegram_cannot_parse_is_rejected_before_job(workdir, data_manager):
+    manager = make_manager(workdir, data_manager)
+    session = TelegramSession()
+    bot = Bot("42:TEST", session=session)
+    
+    async def main():
+        await manager.preview(bot, ADMIN_CHAT, "Марафон *до пятницы*")
+        with pytest.raises(TelegramBadRequest):
+            await manager.preview(bot, ADMIN_CHAT, "Пишите в чат snake_case")
+    
+    asyncio.run(main())
+    previews = session.sent(SendMessage)
+    assert [preview.chat_id for preview in previews] == [ADMIN_CHAT, ADMIN_CHAT]
+    assert previews[0].text == manager.format_message("Марафон *до пятницы*")
+    assert previews[0].parse_mode == "Markdown"
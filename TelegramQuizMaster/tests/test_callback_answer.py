@@ -0,0 +1,54 @@
+import asyncio
+
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+
+from middlewares.callback_answer import CallbackAnswerMiddleware
+from utils.background import run_in_background, cancel_background_tasks
+
+def make_middleware(bot, deadline: float = 0.5) -> CallbackAnswerMiddleware:
+    answers = CallbackAnswerMiddleware(deadline=deadline)
+    bot.session.middleware(answers.track_request)
+    return answers
+
+def test_handler_toast_is_kept_and_not_answered_twice(bot, updates):
+    answers = make_middleware(bot)
+    update = updates.callback(1, "achievements")
+    
+    async def handler(event, data):
+        await event.callback_query.answer("🏆 Нет новых достижений")
+    
+    asyncio.run(answers(handler, update, updates.context(update)))
+    assert [answer.text for answer in bot.session.sent(AnswerCallbackQuery)] == ["🏆 Нет новых достижений"]
+    assert answers.pending == {}
+
+def test_callback_is_answered_before_deferred_work_ends(bot, updates):
+    answers = make_middleware(bot)
+    update = updates.callback(1, "admin_export_full")
+    
+    async def main():
+        done = asyncio.Event()
+        
+        async def slow_export(chat_id: int):
+            await done.wait()
+            await bot.send_message(chat_id, "📤 Экспорт готов")
+        
+        async def handler(event, data):
+            run_in_background(slow_export(event.callback_query.from_user.id), "export_test")
+        
+        await asyncio.wait_for(answers(handler, update, updates.context(update)), 0.1)
+        # Handler returned and the spinner stopped while the export still runs
+        assert [type(call) for call in bot.session.calls] == [AnswerCallbackQuery]
+        
+        done.set()
+        await asyncio.sleep(0.01)
+        assert [type(call) for call in bot.session.calls] == [AnswerCallbackQuery, SendMessage]
+    
+    asyncio.run(main())
+
+def test_background_tasks_are_cancelled_on_shutdown():
+    async def main():
+        task = run_in_background(asyncio.sleep(60), "stuck_export")
+        await cancel_background_tasks()
+        return task
+    
+    assert asyncio.run(main()).cancelled()
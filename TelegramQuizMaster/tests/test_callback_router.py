@@ -0,0 +1,97 @@
+import pytest
+
+from keyboards.callbacks import SkillAction, SkillCallback
+from utils.callback_router import CallbackDispatcher, CallbackRoutes
+from utils.data_manager import DataManager
+
+async def select_skill(callback):
+    pass
+
+async def skill_tip(callback):
+    pass
+
+async def skill_stats(callback):
+    pass
+
+async def my_skills(callback):
+    pass
+
+def handler_of(dispatcher: CallbackDispatcher, data: str):
+    route = dispatcher.match(data)
+    return route.handler.callback if route else None
+
+@pytest.mark.parametrize("tip_first", [False, True])
+def test_longest_prefix_wins_whatever_registration_order(tip_first):
+    skills = CallbackRoutes("skills")
+    progress = CallbackRoutes("progress")
+    skills.prefix("skill_")(select_skill)
+    progress.prefix("skill_tip_")(skill_tip)
+    progress.prefix("skill_stats_")(skill_stats)
+    modules = (progress, skills) if tip_first else (skills, progress)
+    
+    dispatcher = CallbackDispatcher(*modules)
+    assert handler_of(dispatcher, "skill_tip_python") is skill_tip
+    assert handler_of(dispatcher, "skill_stats_python") is skill_stats
+    assert handler_of(dispatcher, "skill_python") is select_skill
+    # Shorter than the longer prefix, still the plain skill_ route
+    assert handler_of(dispatcher, "skill_ti") is select_skill
+    assert handler_of(dispatcher, "progress") is None
+
+def test_exact_data_wins_over_prefix():
+    routes = CallbackRoutes("skills")
+    routes.prefix("my_")(select_skill)
+    routes.exact("my_skills")(my_skills)
+    
+    dispatcher = CallbackDispatcher(routes)
+    assert handler_of(dispatcher, "my_skills") is my_skills
+    assert handler_of(dispatcher, "my_skills_2") is select_skill
+
+@pytest.mark.parametrize("register", [
+    lambda routes, handler: routes.exact("my_skills")(handler),
+    lambda routes, handler: routes.prefix("skill_")(handler)
+])
+def test_same_data_in_two_modules_fails_at_startup(register):
+    first, second = CallbackRoutes("skills"), CallbackRoutes("progress")
+    register(first, select_skill)
+    register(second, skill_tip)
+    
+    with pytest.raises(ValueError, match="skills.select_skill.*progress.skill_tip"):
+        CallbackDispatcher(first, second)
+
+def test_empty_prefix_is_rejected():
+    with pytest.raises(ValueError):
+        CallbackRoutes("skills").prefix("")(select_skill)
+
+@pytest.fixture
+def bot_dispatcher(workdir) -> CallbackDispatcher:
+    """Routes of the bot's handler modules, imported in test directory as they create data files"""
+    from handlers import start, skills, progress, achievements, admin
+    return CallbackDispatcher(start.callbacks, skills.callbacks, progress.callbacks, achievements.callbacks,
+                              admin.callbacks)
+
+def test_bot_routes_tip_and_stats_buttons_to_their_handlers(bot_dispatcher):
+    tip = bot_dispatcher.match(SkillCallback(action=SkillAction.TIP, skill_id=3).pack())
+    stats = bot_dispatcher.match(SkillCallback(action=SkillAction.STATS, skill_id=3).pack())
+    assert tip.handler.callback.__name__ == "get_skill_tip"
+    assert stats.handler.callback.__name__ == "show_skill_stats"
+    # Admin's stats_ buttons share no prefix with skill stats any more
+    assert bot_dispatcher.match("stats_refresh_week").handler.callback.__name__ == "refresh_stats_report"
+    # Buttons of the old key-based layout no longer create skills
+    assert bot_dispatcher.match("skill_tip_python") is None
+
+def test_misrouted_skills_are_removed_once(workdir):
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    data_manager.add_skill("1", "Python", "💻 Программирование")
+    data_manager.add_skill("1", "tip_python", "Другое")
+    data_manager.add_skill("1", "stats_python", "Другое")
+    # Typed by the user or practised since, not a misrouted button
+    data_manager.add_skill("1", "tip_of_the_day", "✨ Другое")
+    data_manager.add_skill("2", "stats_курс", "Другое")
+    data_manager.add_session("2", "stats_курс", 30)
+    
+    assert data_manager.remove_misrouted_skills() == 2
+    assert set(data_manager.get_user_skills("1")) == {"python", "tip_of_the_day"}
+    assert set(data_manager.get_user_skills("2")) == {"stats_курс"}
+    assert set(data_manager.read_users_file()["1"]["skills"]) == {"python", "tip_of_the_day"}
+    
+    assert data_manager.remove_misrouted_skills() == 0
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date, timedelta
+
+from utils import cohorts
+from utils.cohorts import CohortManager, build_cohorts, format_cohort_table, get_week_key, get_week_start
+
+TODAY = date(2025, 6, 18)
+
+def test_week_key_round_trips_to_monday():
+    assert get_week_key(TODAY) == "2025-W25"
+    assert get_week_start("2025-W25") == date(2025, 6, 16)
+    # ISO week 1 of 2025 starts in 2024
+    assert get_week_start(get_week_key(date(2024, 12, 31))) == date(2024, 12, 30)
+
+def test_users_are_bucketed_by_signup_week():
+    users_data = {
+        # Week 0 cohort, back in week 2
+        "1": {"created_at": "2025-05-27T10:00:00", "last_active": "2025-06-10T09:00:00"},
+        "2": {"created_at": "2025-06-01T23:59:00"},
+        # Week 1 cohort, recorded week and practice recovered from skill history
+        "3": {"created_at": "2025-06-02T08:00:00", "activity_weeks": ["2025-W24"],
+              "skills": {"python": {"last_session": "2025-06-18T12:00:00", "notes": []}}},
+        # Current week
+        "4": {"created_at": "2025-06-17T08:00:00", "last_active": "2025-06-18T08:00:00"},
+        # Older than the report and broken dates are left out
+        "5": {"created_at": "2025-05-25T23:00:00", "last_active": "2025-06-17T08:00:00"},
+        "6": {"created_at": "вчера"},
+        "7": {}
+    }
+    
+    report = build_cohorts(users_data, weeks=4, today=TODAY)
+    rows = report["cohorts"]
+    assert [row["week"] for row in rows] == ["2025-W22", "2025-W23", "2025-W24", "2025-W25"]
+    assert [row["size"] for row in rows] == [2, 1, 0, 1]
+    assert rows[0]["active"] == [2, 0, 1, 0]
+    assert rows[0]["retention"] == [100.0, 0.0, 50.0, 0.0]
+    assert rows[1]["active"] == [1, 1, 1]
+    # Later cohorts have fewer weeks behind them
+    assert rows[2]["retention"] == [0.0, 0.0]
+    assert rows[3]["active"] == [1]
+
+def test_table_skips_cells_of_empty_cohorts():
+    report = build_cohorts({"1": {"created_at": "2025-06-16T08:00:00"}}, weeks=2, today=TODAY)
+    header, empty, current = format_cohort_table(report).split("\n")
+    assert header.split() == ["Неделя", "Кол.", "W0", "W1"]
+    assert empty.split() == ["09.06", "0"]
+    assert current.split() == ["16.06", "1", "100%"]
+
+class StubDataManager:
+    def __init__(self):
+        self.loads = 0
+    
+    def load_users_data(self):
+        self.loads += 1
+        return {}
+
+def test_report_is_cached_until_next_day(monkeypatch):
+    async def run_here(func, *args):
+        return func(*args)
+    monkeypatch.setattr(cohorts, "run_in_process", run_here)
+    data_manager = StubDataManager()
+    manager = CohortManager(data_manager, weeks=2)
+    
+    async def main():
+        first = await manager.get_report()
+        assert await manager.get_report() is first
+        assert data_manager.loads == 1
+        
+        assert await manager.get_report(force=True) is not first
+        manager.report["day"] -= timedelta(days=1)
+        await manager.get_report()
+        assert data_manager.loads == 3
+    
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from utils.fsm_storage import ExpiringStorage, JsonStatePersistence
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+def test_state_expires_after_ttl(clock):
+    async def main():
+        storage = ExpiringStorage(ttl=60, max_keys=10)
+        await storage.set_state(key(1), "Form:minutes")
+        await storage.set_data(key(1), {"skill": "Python"})
+        
+        clock.now += 59
+        assert await storage.get_state(key(1)) == "Form:minutes"
+        assert await storage.get_data(key(1)) == {"skill": "Python"}
+        
+        clock.now += 61
+        assert await storage.get_state(key(1)) is None
+        assert await storage.get_data(key(1)) == {}
+        return storage.get_metrics()
+    
+    metrics = asyncio.run(main())
+    assert metrics["keys"] == 0 and metrics["expired"] == 1
+
+def test_writes_extend_ttl(clock):
+    async def main():
+        storage = ExpiringStorage(ttl=60, max_keys=10)
+        await storage.set_state(key(1), "Form:minutes")
+        clock.now += 50
+        await storage.set_data(key(1), {"skill": "Python"})
+        clock.now += 50
+        return await storage.get_state(key(1))
+    
+    assert asyncio.run(main()) == "Form:minutes"
+
+def test_oldest_written_keys_are_evicted(clock):
+    async def main():
+        storage = ExpiringStorage(ttl=60, max_keys=3)
+        for user_id in range(1, 5):
+            await storage.set_state(key(user_id), "Form:minutes")
+            clock.now += 1
+        # Rewriting moves key to the end of eviction order
+        await storage.set_state(key(2), "Form:note")
+        await storage.set_state(key(5), "Form:minutes")
+        return [await storage.get_state(key(user_id)) for user_id in range(1, 6)], storage.get_metrics()
+    
+    states, metrics = asyncio.run(main())
+    assert states == [None, "Form:note", None, "Form:minutes", "Form:minutes"]
+    assert metrics["evicted"] == 2
+
+def test_clearing_state_and_data_removes_key():
+    async def main():
+        storage = ExpiringStorage(ttl=60, max_keys=10)
+        await storage.set_state(key(1), "Form:minutes")
+        await storage.set_state(key(1), None)
+        return storage.get_metrics()["keys"]
+    
+    assert asyncio.run(main()) == 0
+
+def test_states_survive_restart_until_they_expire(clock, workdir):
+    path = str(workdir / "fsm_states.json")
+    
+    async def first_run():
+        storage = ExpiringStorage(ttl=60, max_keys=10, persistence=JsonStatePersistence(path), flush_seconds=60)
+        await storage.set_state(key(1), "Form:minutes")
+        await storage.set_data(key(1), {"skill": "Python"})
+        clock.now += 30
+        await storage.set_state(key(2), "Form:note")
+        await storage.set_state(key(3), "Form:note")
+        await storage.set_state(key(3), None)
+        # Pending changes are written on shutdown, not only by the timer
+        await storage.close()
+    
+    async def second_run():
+        storage = ExpiringStorage(ttl=60, max_keys=10, persistence=JsonStatePersistence(path))
+        states = [await storage.get_state(key(user_id)) for user_id in (1, 2, 3)]
+        return states, await storage.get_data(key(1))
+    
+    asyncio.run(first_run())
+    assert asyncio.run(second_run()) == (["Form:minutes", "Form:note", None], {"skill": "Python"})
+    
+    # Key 1 was written 30 s before key 2, so only key 2 is still alive
+    clock.now += 40
+    states, data = asyncio.run(second_run())
+    assert states == [None, "Form:note", None] and data == {}
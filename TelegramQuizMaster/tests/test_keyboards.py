@@ -0,0 +1,82 @@
+import copy
+
+import pytest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import ValidationError
+
+from keyboards.callbacks import SkillAction, SkillCallback
+from keyboards.inline import ReadOnlyRows, freeze, get_main_menu, get_skill_actions, get_confirmation
+
+@pytest.mark.parametrize("change", [
+    lambda rows: rows.append([]),
+    lambda rows: rows.extend([[]]),
+    lambda rows: rows.insert(0, []),
+    lambda rows: rows.pop(),
+    lambda rows: rows.remove(rows[0]),
+    lambda rows: rows.clear(),
+    lambda rows: rows.sort(),
+    lambda rows: rows.reverse(),
+    lambda rows: rows.__setitem__(0, []),
+    lambda rows: rows.__delitem__(0),
+    lambda rows: rows.__iadd__([[]]),
+    lambda rows: rows.__imul__(2)
+])
+def test_read_only_rows_refuse_changes(change):
+    rows = ReadOnlyRows([["a"], ["b"]])
+    with pytest.raises(TypeError):
+        change(rows)
+    assert rows == [["a"], ["b"]]
+
+def test_prebuilt_keyboard_is_one_instance():
+    assert get_main_menu() is get_main_menu()
+    assert get_main_menu.__wrapped__() is not get_main_menu()
+
+@pytest.mark.parametrize("get_keyboard", [
+    lambda: get_skill_actions(7),
+    lambda: get_confirmation("delete_skill_7"),
+    get_main_menu
+])
+def test_cached_keyboard_cannot_be_changed(get_keyboard):
+    keyboard = get_keyboard()
+    assert get_keyboard() is keyboard
+    snapshot = keyboard.model_dump()
+    
+    with pytest.raises(TypeError):
+        keyboard.inline_keyboard.append([InlineKeyboardButton(text="x", callback_data="x")])
+    with pytest.raises(TypeError):
+        keyboard.inline_keyboard[0].pop()
+    with pytest.raises(ValidationError):
+        keyboard.inline_keyboard[0][0].text = "changed"
+    with pytest.raises(ValidationError):
+        keyboard.inline_keyboard = []
+    assert get_keyboard().model_dump() == snapshot
+
+def test_skill_actions_keep_packed_skill_id():
+    buttons = [button for row in get_skill_actions(7).inline_keyboard for button in row]
+    callbacks = [SkillCallback.unpack(button.callback_data) for button in buttons
+                 if button.callback_data.startswith(SkillCallback.__prefix__)]
+    assert callbacks and {callback.skill_id for callback in callbacks} == {7}
+    assert SkillAction.TIP in {callback.action for callback in callbacks}
+
+def test_copied_rows_build_new_markup_without_touching_shared_one():
+    shared = get_skill_actions(7)
+    rows = [list(row) for row in shared.inline_keyboard]
+    rows.append([InlineKeyboardButton(text="🔙 Назад", callback_data="my_skills")])
+    
+    extended = InlineKeyboardMarkup(inline_keyboard=rows)
+    assert len(extended.inline_keyboard) == len(shared.inline_keyboard) + 1
+    assert get_skill_actions(7) is shared and len(shared.inline_keyboard) == len(rows) - 1
+
+def test_frozen_keyboard_copies_and_serializes_like_plain_one(bot):
+    plain = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="a", callback_data="x"), InlineKeyboardButton(text="b", url="https://t.me")]
+    ])
+    frozen = freeze(plain)
+    
+    copied = copy.deepcopy(frozen)
+    assert copied.model_dump() == plain.model_dump()
+    assert isinstance(copied.inline_keyboard, ReadOnlyRows)
+    # Unset fields stay out of the request instead of going as nulls
+    prepared = bot.session.prepare_value(frozen, bot=bot, files={})
+    assert prepared == bot.session.prepare_value(plain, bot=bot, files={})
+    assert "null" not in prepared
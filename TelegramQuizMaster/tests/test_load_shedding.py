@@ -0,0 +1,130 @@
+import asyncio
+
+from aiogram import flags
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import CallbackQuery
+
+from middlewares.callback_answer import CallbackAnswerMiddleware
+from middlewares.load_shedding import LoadSheddingMiddleware, CRITICAL, CONTENT, BUSY_TEXT
+from utils.callback_router import CallbackDispatcher, CallbackRoutes
+
+routes = CallbackRoutes("test")
+fallbacks = []
+
+async def cached_report(callback: CallbackQuery):
+    fallbacks.append(callback.id)
+
+@routes.exact("log")
+@flags.load_shedding(priority=CRITICAL)
+async def log_session(callback: CallbackQuery):
+    pass
+
+@routes.exact("report")
+@flags.load_shedding(priority=CONTENT, fallback=cached_report)
+async def show_report(callback: CallbackQuery):
+    pass
+
+@routes.exact("menu")
+async def show_menu(callback: CallbackQuery):
+    pass
+
+class Handler:
+    """Handler that holds its slot until released and records handled updates"""
+    
+    def __init__(self):
+        self.handled = []
+        self.gate = asyncio.Event()
+    
+    async def __call__(self, event, data):
+        self.handled.append(event)
+        await self.gate.wait()
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_critical_updates_overtake_queued_ones(updates):
+    async def main():
+        shedding = LoadSheddingMiddleware(CallbackDispatcher(routes), concurrency=1, shed_threshold=10, queue_max=10)
+        handler = Handler()
+        events = [updates.callback(1, "menu"), updates.callback(2, "menu"),
+                  updates.callback(3, "log"), updates.message(4)]
+        tasks = []
+        for event in events:
+            tasks.append(asyncio.create_task(shedding(handler, event, updates.context(event))))
+            await settle()
+        
+        assert handler.handled == events[:1]
+        assert shedding.get_metrics()["queue_depth"] == 3
+        handler.gate.set()
+        await asyncio.gather(*tasks)
+        return handler.handled, events, shedding.get_metrics()
+    
+    handled, events, metrics = asyncio.run(main())
+    assert handled == [events[0], events[2], events[1], events[3]]
+    assert metrics["priorities"]["critical"]["delayed"] == 1
+    assert metrics["active"] == 0
+
+def test_overload_sheds_content_then_everything_but_critical(bot, updates):
+    fallbacks.clear()
+    
+    async def main():
+        shedding = LoadSheddingMiddleware(CallbackDispatcher(routes), concurrency=1, shed_threshold=1, queue_max=2)
+        handler = Handler()
+        busy, queued = updates.callback(1, "menu"), updates.callback(2, "menu")
+        report, message = updates.callback(3, "report"), updates.message(4)
+        queued_too, critical = updates.callback(5, "menu"), updates.callback(6, "log")
+        
+        tasks = []
+        for event in (busy, queued, report, queued_too, message, critical):
+            tasks.append(asyncio.create_task(shedding(handler, event, updates.context(event))))
+            await settle()
+        handler.gate.set()
+        await asyncio.gather(*tasks)
+        return handler.handled, (busy, queued, report, queued_too, message, critical), shedding.get_metrics()
+    
+    handled, (busy, queued, report, queued_too, message, critical), metrics = asyncio.run(main())
+    assert handled == [busy, critical, queued, queued_too]
+    # Content request got its cached answer, dropped message a busy reply
+    assert fallbacks == [report.callback_query.id]
+    assert [answer.callback_query_id for answer in bot.session.sent(AnswerCallbackQuery)] == [report.callback_query.id]
+    replies = bot.session.sent(SendMessage)
+    assert [(reply.chat_id, reply.text) for reply in replies] == [(4, BUSY_TEXT)]
+    assert metrics["fallbacks"] == 1
+    assert metrics["priorities"]["content"]["shed"] == 1
+    assert metrics["priorities"]["normal"]["shed"] == 1
+
+def test_queued_callback_is_answered_at_deadline(bot, updates):
+    answers = CallbackAnswerMiddleware(deadline=0.05)
+    bot.session.middleware(answers.track_request)
+    handler = Handler()
+    
+    async def handle(event, data):
+        # Handler's own answer comes after the deadline and is dropped
+        await handler(event, data)
+        await event.callback_query.answer("готово")
+    
+    async def main():
+        shedding = LoadSheddingMiddleware(CallbackDispatcher(routes), concurrency=1, shed_threshold=10, queue_max=10)
+        
+        async def chain(event):
+            return await answers(lambda event, data: shedding(handle, event, data), event, updates.context(event))
+        
+        first, waiting = updates.callback(1, "menu"), updates.callback(2, "menu")
+        tasks = [asyncio.create_task(chain(first))]
+        await settle()
+        tasks.append(asyncio.create_task(chain(waiting)))
+        await asyncio.sleep(0.1)
+        
+        # Both spinners stopped although the second update still waits for a slot
+        answered = [answer.callback_query_id for answer in bot.session.sent(AnswerCallbackQuery)]
+        assert sorted(answered) == sorted([first.callback_query.id, waiting.callback_query.id])
+        assert handler.handled == [first]
+        
+        handler.gate.set()
+        await asyncio.gather(*tasks)
+        assert handler.handled == [first, waiting]
+        assert answers.pending == {}
+    
+    asyncio.run(main())
+    assert all(answer.text is None for answer in bot.session.sent(AnswerCallbackQuery))
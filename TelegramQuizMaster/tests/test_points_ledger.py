@@ -0,0 +1,82 @@
+import json
+from datetime import datetime
+
+from utils.points_ledger import PointsLedger, BACKFILL_SOURCE
+
+def make_ledger(checkpoint_entries: int = 200) -> PointsLedger:
+    return PointsLedger("data/ledger.jsonl", "data/totals.json", checkpoint_entries=checkpoint_entries)
+
+def test_totals_follow_appends():
+    ledger = make_ledger()
+    ledger.add_entries([("1", "session", 10), ("2", "session", 5)], datetime(2025, 5, 20, 12))
+    ledger.add_entry("1", "achievement", 7, datetime(2025, 6, 2, 9))
+    
+    assert ledger.get_user_total("1") == 17
+    assert ledger.get_user_total("2") == 5
+    assert ledger.get_period_totals("day", "2025-05-20") == {"1": 10, "2": 5}
+    assert ledger.get_period_totals("month", "2025-06") == {"1": 7}
+    assert ledger.get_points_over_time("1", "month") == [("2025-05", 10), ("2025-06", 7)]
+    assert ledger.get_leaderboard(1) == [("1", 17)]
+
+def test_entry_ids_are_sequential():
+    ledger = make_ledger()
+    entries = ledger.add_entries([("1", "session", 1), ("1", "session", 2)])
+    entries += ledger.add_entries([("2", "session", 3)])
+    assert [entry["id"] for entry in entries] == [1, 2, 3]
+
+def test_tail_after_checkpoint_is_replayed_on_start():
+    ledger = make_ledger(checkpoint_entries=2)
+    ledger.add_entries([("1", "session", 10), ("2", "session", 5)])
+    # Checkpoint is not due yet, as if the process died right after appending
+    ledger.add_entry("1", "session", 3)
+    with open("data/totals.json", encoding="utf-8") as f:
+        assert json.load(f)["users"] == {"1": 10, "2": 5}
+    
+    restarted = make_ledger(checkpoint_entries=2)
+    assert restarted.get_user_total("1") == 13
+    assert restarted.offset == ledger.offset
+
+def test_appends_of_other_process_are_picked_up():
+    ledger = make_ledger()
+    other = make_ledger()
+    other.add_entry("1", "session", 4)
+    assert ledger.get_user_total("1") == 4
+    assert ledger.add_entry("1", "session", 1)["id"] == 2
+
+def test_old_checkpoint_without_offset_is_rebuilt():
+    ledger = make_ledger()
+    ledger.add_entry("1", "session", 4)
+    with open("data/totals.json", "w", encoding="utf-8") as f:
+        json.dump({"entries": 1, "users": {"1": 100}, "periods": {}}, f)
+    
+    assert make_ledger().get_user_total("1") == 4
+
+def test_truncated_ledger_rebuilds_totals():
+    ledger = make_ledger()
+    ledger.add_entries([("1", "session", 4), ("1", "session", 6)])
+    with open("data/ledger.jsonl", encoding="utf-8") as f:
+        first_line = f.readline()
+    with open("data/ledger.jsonl", "w", encoding="utf-8") as f:
+        f.write(first_line)
+    
+    assert ledger.get_user_total("1") == 4
+
+def test_backfill_runs_once_and_stays_out_of_periods():
+    ledger = make_ledger()
+    ledger.add_entry("1", "session", 10, datetime(2025, 6, 1))
+    users = {
+        "1": {"total_points": 25, "created_at": "2025-01-15T10:00:00"},
+        "2": {"total_points": 0}
+    }
+    
+    assert ledger.backfill_from_users(users) == 1
+    assert ledger.get_user_total("1") == 25
+    assert ledger.get_period_totals("month", "2025-01") == {}
+    assert ledger.get_period_totals("month", "2025-06") == {"1": 10}
+    backfilled = [entry for entry in ledger.iter_entries("1") if entry["source"] == BACKFILL_SOURCE]
+    assert [(entry["amount"], entry["timestamp"]) for entry in backfilled] == [(15, "2025-01-15T10:00:00")]
+    
+    # Later runs, also from other processes, add nothing
+    assert ledger.backfill_from_users({"1": {"total_points": 50}}) == 0
+    assert make_ledger().backfill_from_users({"1": {"total_points": 50}}) == 0
+    assert make_ledger().get_user_total("1") == 25
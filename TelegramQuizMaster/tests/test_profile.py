@@ -0,0 +1,23 @@
+import asyncio
+
+from middlewares import profile
+from middlewares.profile import ProfileMiddleware
+from utils.data_manager import DataManager
+
+def test_profiles_of_least_recently_seen_users_are_forgotten(workdir, updates, monkeypatch):
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    monkeypatch.setattr(profile, "data_manager", data_manager)
+    middleware = ProfileMiddleware(max_users=2)
+    
+    async def handler(event, data):
+        data_manager.get_user(str(event.event.from_user.id))
+    
+    async def main():
+        for user_id in (1, 2, 1, 3):
+            update = updates.message(user_id)
+            await middleware(handler, update, updates.context(update))
+    
+    asyncio.run(main())
+    # User 1 was seen again before 3 came, so 2 is the one forgotten
+    assert list(middleware.seen) == [1, 3]
+    assert data_manager.get_user("2")["first_name"] == "User"
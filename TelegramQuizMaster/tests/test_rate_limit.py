@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+import pytest
+from aiogram.methods import GetMe, SendMessage
+
+from middlewares.request_scheduler import (
+    RequestScheduler, set_request_priority, PRIORITY_INTERACTIVE, PRIORITY_BULK
+)
+from utils.rate_limit import TokenBucket, SharedTokenBucket
+
+@pytest.mark.parametrize("bucket_class", [TokenBucket, SharedTokenBucket])
+def test_burst_then_refill(clock, bucket_class):
+    bucket = bucket_class(rate=2, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() == pytest.approx(0.5)
+    
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    
+    # Idle time does not add tokens above capacity
+    clock.now += 60
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+@pytest.mark.parametrize("bucket_class", [TokenBucket, SharedTokenBucket])
+def test_block_for_stops_tokens(clock, bucket_class):
+    bucket = bucket_class(rate=10)
+    bucket.block_for(5)
+    assert not bucket.try_acquire()
+    assert bucket.wait_time() == pytest.approx(5)
+    
+    clock.now += 5
+    assert bucket.wait_time() == pytest.approx(0.1)
+    clock.now += 0.1
+    assert bucket.try_acquire()
+
+def test_acquire_waits_for_token():
+    async def main():
+        bucket = TokenBucket(rate=20, capacity=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        return loop.time() - started
+    
+    assert asyncio.run(main()) == pytest.approx(0.1, abs=0.05)
+
+def test_replies_overtake_queued_bulk_requests():
+    # Every message goes to its own chat, only the global bucket limits them
+    order = []
+    
+    async def make_request(bot, method):
+        order.append(method.text)
+        return True
+    
+    async def send(scheduler, text, chat_id, priority):
+        set_request_priority(priority)
+        await scheduler(make_request, None, SendMessage(chat_id=chat_id, text=text))
+    
+    async def main():
+        scheduler = RequestScheduler(rate=20)
+        # Use up the burst, later requests queue for tokens
+        await asyncio.gather(*(send(scheduler, "warmup", chat_id, PRIORITY_BULK) for chat_id in range(20)))
+        bulk = [asyncio.create_task(send(scheduler, "bulk", 100 + i, PRIORITY_BULK)) for i in range(3)]
+        await asyncio.sleep(0)
+        replies = [asyncio.create_task(send(scheduler, "reply", 200 + i, PRIORITY_INTERACTIVE)) for i in range(3)]
+        await asyncio.gather(*bulk, *replies)
+        return scheduler.get_metrics()
+    
+    metrics = asyncio.run(main())
+    assert order[20:] == ["reply"] * 3 + ["bulk"] * 3
+    assert metrics["priorities"]["interactive"]["requests"] == 3
+
+def test_unlimited_methods_skip_buckets():
+    async def make_request(bot, method):
+        return True
+    
+    async def main():
+        scheduler = RequestScheduler(rate=1)
+        scheduler.bucket.block_for(60)
+        return await asyncio.wait_for(scheduler(make_request, None, GetMe()), 1)
+    
+    assert asyncio.run(main()) is True
+
+class ContendedBucket(SharedTokenBucket):
+    """Shared bucket another worker drains right before the first takes of this one"""
+    
+    def __init__(self, rate: float, steals: int):
+        super().__init__(rate, capacity=1)
+        self.steals = steals
+    
+    def try_acquire(self, tokens: float = 1) -> bool:
+        if self.steals:
+            self.steals -= 1
+            other_worker = threading.Thread(target=super().try_acquire)
+            other_worker.start()
+            other_worker.join()
+        return super().try_acquire(tokens)
+
+def test_waiters_keep_place_when_other_worker_takes_token():
+    async def make_request(bot, method):
+        return True
+    
+    async def main():
+        scheduler = RequestScheduler(rate=50)
+        scheduler.use_bucket(ContendedBucket(rate=50, steals=6))
+        sends = [scheduler(make_request, None, SendMessage(chat_id=chat_id, text="hi")) for chat_id in range(5)]
+        # Lost waiters would never be resolved
+        await asyncio.wait_for(asyncio.gather(*sends), 2)
+        return scheduler
+    
+    scheduler = asyncio.run(main())
+    assert scheduler.waiters == [] and scheduler.bucket.steals == 0
+    assert scheduler.get_metrics()["priorities"]["interactive"]["requests"] == 5
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.data_manager import DataManager
+from utils.export import ExportManager, iter_export_users, read_export_header
+from utils.restore import RestoreManager
+from utils.snapshots import SnapshotManager
+
+def make_manager(workdir, name: str) -> DataManager:
+    # Stores and indexes are shared per users file, so every manager gets its own path
+    return DataManager(str(workdir / "data" / f"{name}_users.json"), str(workdir / "data" / f"{name}_achievements.json"))
+
+def plain(data_manager: DataManager):
+    return dict(data_manager.load_users_data().items())
+
+@pytest.fixture
+def source(workdir) -> DataManager:
+    data_manager = make_manager(workdir, "source")
+    for user_id in ("1", "2", "3"):
+        data_manager.get_user(user_id)
+    return data_manager
+
+def test_full_export_and_deltas_restore_to_same_users(workdir, source):
+    exports = ExportManager(source, str(workdir / "exports"))
+    full = exports.create_full_export()
+    
+    source.add_skill("1", "Python", "Программирование")
+    source.get_user("4")
+    source.write_users_batch({}, ["2"])
+    delta = exports.create_delta_export()
+    assert delta["removed"] == 1
+    
+    target = make_manager(workdir, "target")
+    restore = RestoreManager(target, batch_size=2)
+    restore.restore(full["path"])
+    assert set(plain(target)) == {"1", "2", "3"}
+    
+    report = restore.restore(delta["path"])
+    assert report["removed"] == 1
+    assert plain(target) == plain(source)
+    # JSON backend saved the restored users, not only the in-memory store
+    assert target.read_users_file() == plain(source)
+
+def test_rebuilt_full_export_matches_base_with_deltas(workdir, source):
+    exports = ExportManager(source, str(workdir / "exports"))
+    exports.create_full_export()
+    source.add_skill("2", "Бег", "Спорт")
+    exports.create_delta_export()
+    source.write_users_batch({}, ["3"])
+    exports.create_delta_export()
+    
+    rebuilt = exports.rebuild_full_export(str(workdir / "rebuilt.json.gz"))
+    assert rebuilt["deltas"] == 2
+    
+    target = make_manager(workdir, "target")
+    target.get_user("99")
+    RestoreManager(target).restore(rebuilt["path"], "replace")
+    assert plain(target) == plain(source)
+
+def test_delta_cannot_replace(workdir, source):
+    exports = ExportManager(source, str(workdir / "exports"))
+    exports.create_full_export()
+    delta = exports.create_delta_export()
+    
+    target = make_manager(workdir, "target")
+    target.get_user("1")
+    with pytest.raises(ValueError):
+        RestoreManager(target).restore(delta["path"], "replace")
+    assert set(plain(target)) == {"1"}
+
+def test_merge_keeps_newer_local_records(workdir, source):
+    exports = ExportManager(source, str(workdir / "exports"))
+    full = exports.create_full_export()
+    source.add_skill("1", "Python", "Программирование")
+    newer = plain(source)["1"]
+    
+    report = RestoreManager(source).restore(full["path"])
+    assert report["updated"] == 0 and report["added"] == 0
+    assert plain(source)["1"] == newer
+
+def test_dry_run_writes_nothing(workdir, source):
+    full = ExportManager(source, str(workdir / "exports")).create_full_export()
+    target = make_manager(workdir, "target")
+    
+    report = RestoreManager(target).restore(full["path"], dry_run=True)
+    assert report["added"] == 3
+    assert plain(target) == {}
+    assert target.read_users_file() == {}
+
+def test_snapshot_restore_requires_full_export_before_next_delta(workdir, source):
+    # Records last changed long before any export watermark
+    source.write_users_batch({
+        user_id: {**user, "updated_at": "2020-01-01T00:00:00"} for user_id, user in plain(source).items()
+    })
+    exports = ExportManager(source, str(workdir / "exports"))
+    exports.create_full_export()
+    snapshots = SnapshotManager(source, str(workdir / "snapshots"))
+    snapshot = snapshots.create_snapshot()
+    
+    source.add_skill("1", "Python", "Программирование")
+    exports.create_delta_export()
+    snapshots.restore_snapshot(SnapshotManager.get_stamp(snapshot["path"]))
+    assert plain(source)["1"]["skills"] == {}
+    
+    # Reverted user 1 is older than the watermark, a delta would leave it out
+    with pytest.raises(ValueError):
+        exports.create_delta_export()
+    
+    full = exports.create_full_export()
+    source.get_user("4")
+    delta = exports.create_delta_export()
+    rebuilt = exports.apply_deltas(full["path"], [delta["path"]], str(workdir / "rebuilt.json.gz"))
+    assert dict(iter_export_users(rebuilt["path"])) == plain(source)
+
+def test_dry_run_and_unchanged_restore_keep_delta_chain(workdir, source):
+    exports = ExportManager(source, str(workdir / "exports"))
+    full = exports.create_full_export()
+    RestoreManager(source).restore(full["path"], dry_run=True)
+    RestoreManager(source).restore(full["path"])
+    assert source.load_last_restore() is None
+    assert exports.create_delta_export()["since"] == read_export_header(full["path"])["watermark"]
+
+def test_export_streams_store_snapshot_in_worker_thread(workdir, source, monkeypatch):
+    exports = ExportManager(source, str(workdir / "exports"))
+    create_full_export = exports.create_full_export
+    seen = {}
+    
+    def spy(users_data):
+        seen["thread"] = threading.current_thread()
+        seen["shared"] = all(
+            shard is store_shard for shard, store_shard in zip(users_data.shards, source.store.shards)
+        )
+        return create_full_export(users_data)
+    
+    monkeypatch.setattr(exports, "create_full_export", spy)
+    result = asyncio.run(exports.run_export("full"))
+    # Snapshot shares the store's shards, no copy of the users is made
+    assert seen["shared"] and seen["thread"] is not threading.main_thread()
+    assert dict(iter_export_users(result["path"])) == plain(source)
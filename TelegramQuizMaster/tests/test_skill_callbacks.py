@@ -0,0 +1,68 @@
+import pytest
+
+from keyboards.callbacks import SkillAction, SkillCallback, CatalogSkillCallback
+from keyboards.inline import get_skill_actions
+from utils.callback_router import CallbackDispatcher, CallbackRoutes
+from utils.data_manager import DataManager, find_skill_key
+
+@pytest.mark.parametrize("action", list(SkillAction))
+def test_skill_callback_round_trip(action):
+    packed = SkillCallback(action=action, skill_id=1234).pack()
+    # Telegram allows 64 bytes of callback data
+    assert packed.isascii() and len(packed.encode()) <= 64
+    assert SkillCallback.unpack(packed) == SkillCallback(action=action, skill_id=1234)
+
+def test_catalog_skill_callback_round_trip():
+    packed = CatalogSkillCallback(category=2, skill=5).pack()
+    assert packed == "cs:2:5"
+    assert CatalogSkillCallback.unpack(packed) == CatalogSkillCallback(category=2, skill=5)
+
+def test_skill_action_buttons_carry_skill_id():
+    buttons = [button for row in get_skill_actions(7).inline_keyboard for button in row]
+    skill_buttons = [SkillCallback.unpack(button.callback_data) for button in buttons
+                     if button.callback_data.startswith(SkillCallback.__prefix__)]
+    assert {callback.skill_id for callback in skill_buttons} == {7}
+    assert {callback.action for callback in skill_buttons} >= {SkillAction.TIP, SkillAction.STATS, SkillAction.DELETE}
+
+def test_dispatcher_unpacks_routed_payload(updates):
+    async def show_tip(callback, callback_data):
+        pass
+    
+    routes = CallbackRoutes("skills")
+    routes.data(SkillCallback, action=SkillAction.TIP)(show_tip)
+    dispatcher = CallbackDispatcher(routes)
+    
+    matched = dispatcher.filter(updates.callback(1, "sk:tip:3").callback_query)
+    assert matched["callback_data"] == SkillCallback(action=SkillAction.TIP, skill_id=3)
+    # Malformed IDs and other actions are not handled by the tip route
+    assert dispatcher.filter(updates.callback(1, "sk:tip:python").callback_query) is False
+    assert dispatcher.filter(updates.callback(1, "sk:stats:3").callback_query) is False
+
+def test_skills_stored_before_ids_get_them_once(workdir):
+    users_file = workdir / "data" / "users.json"
+    data_manager = DataManager(str(users_file), str(workdir / "data" / "achievements.json"))
+    skill = {"name": "Python", "category": "💻 Программирование", "sessions": 0, "total_time_minutes": 0}
+    data_manager.write_users_batch({"1": {"skills": {"python": dict(skill), "go": {**skill, "name": "Go"}}}})
+    
+    skills = data_manager.get_user_skills("1")
+    assert sorted(skill["id"] for skill in skills.values()) == [1, 2]
+    # IDs are stored, the next read does not renumber
+    assert data_manager.get_user_skills("1") == skills
+    assert data_manager.read_users_file()["1"]["next_skill_id"] == 3
+    assert find_skill_key(skills, skills["go"]["id"]) == "go"
+
+def test_ids_of_deleted_skills_are_not_reused(workdir):
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    data_manager.add_skill("1", "Python", "💻 Программирование")
+    data_manager.add_skill("1", "Go", "💻 Программирование")
+    go_id = data_manager.get_user_skills("1")["go"]["id"]
+    
+    user = data_manager.get_user("1")
+    del user["skills"]["go"]
+    data_manager.update_user("1", user)
+    data_manager.add_skill("1", "Rust", "💻 Программирование")
+    
+    skills = data_manager.get_user_skills("1")
+    # A button of the deleted skill finds nothing instead of acting on the new one
+    assert find_skill_key(skills, go_id) is None
+    assert skills["rust"]["id"] == go_id + 1
@@ -0,0 +1,61 @@
+import asyncio
+import os
+
+import pytest
+
+from utils.data_manager import DataManager
+from utils.export import iter_export_users
+from utils.snapshots import SnapshotManager
+
+@pytest.fixture
+def data_manager(workdir) -> DataManager:
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    for user_id in ("1", "2"):
+        data_manager.get_user(user_id)
+    return data_manager
+
+def make_snapshots(directory, stamps):
+    os.makedirs(directory, exist_ok=True)
+    for stamp in stamps:
+        with open(os.path.join(directory, f"snapshot_{stamp}.json.gz"), "wb") as f:
+            f.write(b"{}")
+
+def kept_stamps(manager: SnapshotManager):
+    return [snapshot["stamp"] for snapshot in manager.list_snapshots()]
+
+def test_retention_keeps_recent_and_last_of_each_day(workdir, data_manager):
+    directory = str(workdir / "snapshots")
+    # Names before microseconds were added sit between newer ones of the same day
+    make_snapshots(directory, [
+        "20261014_090000", "20261014_210000",
+        "20261015_080000_000001", "20261015_180000",
+        "20261016_070000", "20261016_070000_500000", "20261016_230000_250000",
+        "20261017_100000", "20261017_100000_000001", "20261017_100000_000002"
+    ])
+    manager = SnapshotManager(data_manager, directory, keep_recent=2, keep_daily=3)
+    
+    manager.apply_retention()
+    assert kept_stamps(manager) == [
+        "20261017_100000_000002", "20261017_100000_000001",
+        "20261016_230000_250000", "20261015_180000"
+    ]
+    # Nothing more to drop
+    manager.apply_retention()
+    assert len(kept_stamps(manager)) == 4
+
+def test_stamps_of_both_name_formats_parse_in_order(workdir, data_manager):
+    manager = SnapshotManager(data_manager, str(workdir / "snapshots"))
+    old, new = manager.parse_stamp("20261016_070000"), manager.parse_stamp("20261016_070000_500000")
+    assert (new - old).total_seconds() == 0.5
+
+def test_scheduled_snapshot_streams_current_users(workdir, data_manager):
+    manager = SnapshotManager(data_manager, str(workdir / "snapshots"), keep_recent=1, keep_daily=0)
+    first = asyncio.run(manager.take_snapshot())
+    data_manager.get_user("3")
+    second = asyncio.run(manager.take_snapshot())
+    
+    assert second["users"] == 3
+    assert set(dict(iter_export_users(second["path"]))) == {"1", "2", "3"}
+    # Microsecond names keep snapshots of one second apart, retention drops the older one
+    assert kept_stamps(manager) == [SnapshotManager.get_stamp(second["path"])]
+    assert not os.path.exists(first["path"])
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from config import POINTS_LEDGER_FILE, POINTS_TOTALS_FILE
+from utils import stats_service as stats_module
+from utils.data_manager import DataManager
+from utils.points_ledger import get_points_ledger
+from utils.stats_service import StatsService, STATS_REPORTS
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """Run pool jobs in test process, count them and fail them on demand"""
+    class Jobs:
+        count = 0
+        error = None
+    
+    async def run_here(func, *args):
+        Jobs.count += 1
+        if Jobs.error:
+            raise Jobs.error
+        return func(*args)
+    monkeypatch.setattr(stats_module, "run_in_process", run_here)
+    return Jobs
+
+@pytest.fixture
+def service(workdir) -> StatsService:
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    for user_id in ("1", "2"):
+        data_manager.get_user(user_id)
+    return StatsService(data_manager, get_points_ledger(POINTS_LEDGER_FILE, POINTS_TOTALS_FILE), refresh_minutes=0)
+
+def test_report_is_served_from_cache_until_forced(jobs, service):
+    async def main():
+        report = await service.get("stats")
+        assert "Всего пользователей: 2" in report["text"]
+        
+        service.data_manager.get_user("3")
+        assert await service.get("stats") is report
+        assert jobs.count == 1
+        
+        fresh = await service.get("stats", force=True)
+        assert "Всего пользователей: 3" in fresh["text"]
+        assert fresh["computed_at"] >= report["computed_at"]
+        # Only the requested report is rebuilt
+        assert set(service.cache) == {"stats"}
+    
+    asyncio.run(main())
+
+def test_scheduled_refresh_builds_every_report_and_survives_errors(jobs, service):
+    async def main():
+        service.start()
+        await asyncio.sleep(0.05)
+        assert set(service.cache) == set(STATS_REPORTS)
+        cached = dict(service.cache)
+        
+        jobs.error = RuntimeError("pool is gone")
+        failed_from = jobs.count
+        await asyncio.sleep(0.05)
+        # Failed refreshes keep serving the last reports and keep retrying
+        assert jobs.count > failed_from + 1
+        assert not service.task.done()
+        assert service.cache == cached
+        
+        await service.shutdown()
+        assert service.task.done()
+    
+    asyncio.run(main())
+
+def test_unknown_report_is_an_error(service):
+    with pytest.raises(ValueError):
+        service.build_report("weather", {})
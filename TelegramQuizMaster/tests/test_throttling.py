@@ -0,0 +1,84 @@
+import asyncio
+
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+
+from middlewares.throttling import ThrottlingMiddleware
+
+def run_updates(throttling, updates, events, raw_state=None):
+    """Pass updates through middleware, return the ones that reached handler"""
+    handled = []
+    
+    async def handler(event, data):
+        handled.append(event)
+    
+    async def main():
+        for event in events:
+            await throttling(handler, event, updates.context(event, raw_state=raw_state))
+    
+    asyncio.run(main())
+    return handled
+
+def test_repeated_tap_is_answered_and_skipped(clock, bot, updates):
+    throttling = ThrottlingMiddleware(rate=10, burst=10, coalesce_seconds=1)
+    first, repeated = updates.callback(1, "progress"), updates.callback(1, "progress")
+    other_user, other_button = updates.callback(2, "progress"), updates.callback(1, "menu")
+    
+    handled = run_updates(throttling, updates, [first, repeated, other_user, other_button])
+    assert handled == [first, other_user, other_button]
+    answers = bot.session.sent(AnswerCallbackQuery)
+    assert [(answer.callback_query_id, answer.text) for answer in answers] == [(repeated.callback_query.id, None)]
+    
+    clock.now += 1.5
+    later = updates.callback(1, "progress")
+    assert run_updates(throttling, updates, [later]) == [later]
+    assert throttling.get_metrics()["coalesced"] == 1
+
+def test_updates_over_rate_are_dropped(clock, bot, updates):
+    throttling = ThrottlingMiddleware(rate=1, burst=2, coalesce_seconds=0)
+    messages = [updates.message(1) for _ in range(3)]
+    callback = updates.callback(1, "menu")
+    
+    handled = run_updates(throttling, updates, messages + [callback])
+    assert handled == messages[:2]
+    # Dropped message gets a notice, dropped callback a toast so it stops spinning
+    answers = bot.session.sent(AnswerCallbackQuery)
+    notices = bot.session.sent(SendMessage)
+    assert len(bot.session.calls) == 2 and len(answers) == len(notices) == 1
+    assert answers[0].text == "⏳ Слишком часто, подождите секунду"
+    assert notices[0].chat_id == 1
+    assert throttling.get_metrics()["throttled"] == 2
+    
+    clock.now += 1
+    message = updates.message(1)
+    assert run_updates(throttling, updates, [message]) == [message]
+
+def test_one_notice_until_user_is_let_through_again(clock, bot, updates):
+    throttling = ThrottlingMiddleware(rate=1, burst=1, coalesce_seconds=0)
+    run_updates(throttling, updates, [updates.message(1) for _ in range(4)])
+    assert len(bot.session.sent(SendMessage)) == 1
+    
+    clock.now += 1
+    run_updates(throttling, updates, [updates.message(1) for _ in range(3)])
+    assert len(bot.session.sent(SendMessage)) == 2
+
+def test_conversation_input_is_never_dropped(clock, bot, updates):
+    throttling = ThrottlingMiddleware(rate=1, burst=1, coalesce_seconds=0)
+    messages = [updates.message(1, "30") for _ in range(3)]
+    assert run_updates(throttling, updates, messages, raw_state="ProgressStates:waiting_for_time") == messages
+    
+    # Buttons in the same state are still limited
+    callbacks = [updates.callback(1, f"time_{minutes}") for minutes in (15, 30)]
+    assert len(run_updates(throttling, updates, callbacks, raw_state="ProgressStates:waiting_for_time")) == 1
+    assert bot.session.calls and not bot.session.sent(SendMessage)
+
+def test_other_update_types_are_not_limited(clock, updates):
+    throttling = ThrottlingMiddleware(rate=1, burst=1, coalesce_seconds=0)
+    edits = [
+        updates.make(1, edited_message={
+            "message_id": 1, "date": 0, "edit_date": 0, "text": "edited",
+            "chat": {"id": 1, "type": "private"}, "from": {"id": 1, "is_bot": False, "first_name": "User"}
+        })
+        for _ in range(3)
+    ]
+    assert run_updates(throttling, updates, edits) == edits
+    assert throttling.get_metrics()["users"] == 0
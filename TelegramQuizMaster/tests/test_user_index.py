@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.user_index import UserIndex, describe_segment
+
+def days_ago(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+def make_user(active_days_ago: int = 0, category: str = "Программирование", streak: int = 0,
+              last_session_days_ago: int = 0, sessions: int = 1, blocked: bool = False):
+    skill = {"category": category, "streak": streak}
+    if streak:
+        skill["last_session"] = days_ago(last_session_days_ago)
+    return {
+        "last_active": days_ago(active_days_ago),
+        "skills": {"skill": skill},
+        "statistics": {"total_sessions": sessions},
+        "blocked": blocked
+    }
+
+@pytest.fixture
+def index() -> UserIndex:
+    index = UserIndex()
+    index.rebuild({
+        "1": make_user(streak=5),
+        "2": make_user(active_days_ago=10, category="Спорт", streak=3),
+        # Five day streak, but no session yesterday or today, so it is broken
+        "3": make_user(streak=5, last_session_days_ago=3),
+        "4": make_user(sessions=0),
+        "5": make_user(streak=9, blocked=True),
+        "30": make_user(category="Спорт", streak=4, last_session_days_ago=1)
+    })
+    return index
+
+@pytest.mark.parametrize("segment, expected", [
+    (None, {"1", "2", "3", "4", "30"}),
+    ({"type": "active", "days": 7}, {"1", "3", "4", "30"}),
+    ({"type": "category", "category": "Спорт"}, {"2", "30"}),
+    ({"type": "streak", "above": 3}, {"1", "30"}),
+    ({"type": "streak", "above": 4}, {"1"}),
+    # Jobs saved before "above" existed
+    ({"type": "streak", "min": 4}, {"1", "30"}),
+    ({"type": "no_sessions"}, {"4"})
+])
+def test_resolve_and_iterate_agree(index, segment, expected):
+    assert index.resolve_segment(segment) == expected
+    assert list(index.iter_segment(segment)) == sorted(int(user_id) for user_id in expected)
+
+def test_unknown_segment_is_rejected(index):
+    with pytest.raises(ValueError):
+        index.resolve_segment({"type": "vip"})
+
+def test_iteration_resumes_from_cursor(index):
+    assert list(index.iter_segment(None, start_from=4)) == [4, 30]
+
+def test_iteration_is_lazy_and_sees_changes(index):
+    recipients = index.iter_segment(None)
+    assert next(recipients) == 1
+    # Users written while a broadcast waits between sends
+    index.update("2", make_user(blocked=True))
+    index.update("10", make_user())
+    index.remove("3")
+    assert list(recipients) == [4, 10, 30]
+
+def test_updates_move_users_between_buckets(index):
+    index.update("4", make_user(category="Спорт", streak=6))
+    assert "4" in index.resolve_segment({"type": "category", "category": "Спорт"})
+    assert "4" in index.resolve_segment({"type": "streak", "above": 5})
+    assert "4" not in index.resolve_segment({"type": "no_sessions"})
+    
+    index.remove("4")
+    assert "4" not in index.resolve_segment(None)
+    assert 4 not in index.ids
+
+def test_describe_segment():
+    assert describe_segment({"type": "streak", "above": 3}) == "серия больше 3 дн."
+    assert describe_segment(None) == "все пользователи"
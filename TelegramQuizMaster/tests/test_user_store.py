@@ -0,0 +1,75 @@
+import os
+import pickle
+import subprocess
+import sys
+
+from utils.data_manager import DataManager
+from utils.user_store import UserStore
+
+def make_store(count: int = 1000) -> UserStore:
+    store = UserStore()
+    store.load({str(user_id): {"points": user_id} for user_id in range(count)})
+    return store
+
+def test_snapshot_does_not_see_later_writes():
+    store = make_store()
+    snapshot = store.snapshot()
+    store.apply({"1": {"points": -1}, "new": {"points": 0}}, ["2"])
+    
+    assert snapshot["1"] == {"points": 1}
+    assert "new" not in snapshot and "2" in snapshot
+    assert len(snapshot) == 1000
+    assert store.get("1") == {"points": -1} and store.get("2") is None
+    assert len(store.snapshot()) == 1000
+
+def test_write_copies_only_shards_shared_with_snapshot():
+    store = make_store()
+    snapshot = store.snapshot()
+    store.apply({"1": {"points": -1}})
+    
+    changed = [index for index in range(store.SHARDS) if store.shards[index] is not snapshot.shards[index]]
+    assert changed == [hash("1") % store.SHARDS]
+    
+    # Shard already copied after the snapshot is written in place
+    copied = store.shards[changed[0]]
+    store.apply({"1": {"points": -2}})
+    assert store.shards[changed[0]] is copied
+
+def test_multi_user_write_is_atomic_for_snapshots():
+    store = make_store()
+    before = store.snapshot()
+    store.apply({str(user_id): {"points": 0} for user_id in range(1000)})
+    after = store.snapshot()
+    
+    assert all(user["points"] == int(user_id) for user_id, user in before.items())
+    assert all(user["points"] == 0 for user in after.values())
+
+def test_pickled_snapshot_works_with_other_hash_seed(workdir):
+    snapshot = make_store().snapshot()
+    path = workdir / "snapshot.pickle"
+    path.write_bytes(pickle.dumps(snapshot))
+    
+    # Job processes hash strings differently, lookups must still find users
+    code = (
+        "import pickle, sys; "
+        f"snapshot = pickle.load(open({str(path)!r}, 'rb')); "
+        "assert all(snapshot[str(i)] == {'points': i} for i in range(1000)); "
+        "print(len(snapshot), snapshot.taken_at)"
+    )
+    env = dict(os.environ, PYTHONHASHSEED="12345")
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["1000", snapshot.taken_at]
+
+def test_data_manager_hands_out_copies(workdir):
+    data_manager = DataManager(str(workdir / "data" / "users.json"), str(workdir / "data" / "achievements.json"))
+    user = data_manager.get_user("1")
+    snapshot = data_manager.load_users_data()
+    
+    user["total_points"] = 100
+    assert snapshot["1"]["total_points"] == 0
+    
+    data_manager.update_user("1", user)
+    assert snapshot["1"]["total_points"] == 0
+    assert data_manager.load_users_data()["1"]["total_points"] == 100
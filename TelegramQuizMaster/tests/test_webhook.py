@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+import main
+from config import HEALTH_PATH, METRICS_PATH, WEBHOOK_PATH
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def message_update(update_id: int, text: str):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "User"}
+        }
+    }
+
+@pytest.fixture
+def dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    dp["handled"] = []
+    
+    @dp.message()
+    async def remember(message: Message, handled: list):
+        handled.append(message.text)
+    
+    return dp
+
+def post_updates(dp, bot, requests):
+    """Post (update, secret) pairs to webhook app, return response statuses"""
+    async def run():
+        async with TestClient(TestServer(main.create_app(dp, bot))) as client:
+            statuses = []
+            for update, secret in requests:
+                headers = {SECRET_HEADER: secret} if secret else {}
+                response = await client.post(WEBHOOK_PATH, json=update, headers=headers)
+                statuses.append(response.status)
+            # Accepted updates are handled in background after the answer
+            await asyncio.sleep(0.05)
+            return statuses
+    
+    return asyncio.run(run())
+
+def test_webhook_accepts_only_updates_with_secret(monkeypatch, dispatcher, bot):
+    monkeypatch.setattr(main, "WEBHOOK_SECRET", "s3cret")
+    statuses = post_updates(dispatcher, bot, [
+        (message_update(1, "wrong"), "guess"),
+        (message_update(2, "missing"), None),
+        (message_update(3, "/start"), "s3cret")
+    ])
+    assert statuses == [401, 401, 200]
+    assert dispatcher["handled"] == ["/start"]
+
+def test_webhook_without_secret_accepts_everyone(monkeypatch, dispatcher, bot):
+    monkeypatch.setattr(main, "WEBHOOK_SECRET", "")
+    assert post_updates(dispatcher, bot, [(message_update(1, "/help"), None)]) == [200]
+    assert dispatcher["handled"] == ["/help"]
+
+def test_health_and_metrics_routes(dispatcher, bot):
+    async def run():
+        async with TestClient(TestServer(main.create_app(dispatcher, bot))) as client:
+            health = await client.get(HEALTH_PATH)
+            metrics = await client.get(METRICS_PATH)
+            return health.status, await health.json(), metrics.status, await metrics.text()
+    
+    health_status, health, metrics_status, metrics = asyncio.run(run())
+    assert health_status == 200 and health == {"status": "ok", "mode": main.BOT_MODE}
+    assert metrics_status == 200 and "bot_request_queue_depth" in metrics
@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import pytest
+
+from utils import workers
+from utils.workers import run_in_process, shutdown_process_pool
+
+def crash_once(marker: str) -> int:
+    """Kill worker on first call like the OOM killer would, succeed on retry"""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return os.getpid()
+
+def fail(message: str):
+    raise ValueError(message)
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(workers, "PROCESS_POOL_WORKERS", 1)
+    yield
+    shutdown_process_pool()
+
+def test_broken_pool_is_replaced_and_job_retried(pool, workdir):
+    marker = str(workdir / "crashed")
+    
+    async def main():
+        broken = workers.get_process_pool()
+        pid = await run_in_process(crash_once, marker)
+        return broken, pid
+    
+    broken, pid = asyncio.run(main())
+    assert os.path.exists(marker)
+    assert pid != os.getpid()
+    assert workers.get_process_pool() is not broken
+
+def test_jobs_broken_together_replace_pool_once(pool, workdir):
+    marker = str(workdir / "crashed")
+    
+    async def main():
+        broken = workers.get_process_pool()
+        # Crash takes the pool down under both jobs
+        results = await asyncio.gather(run_in_process(crash_once, marker), run_in_process(crash_once, marker))
+        replacement = workers.get_process_pool()
+        assert replacement is not broken
+        return results, replacement
+    
+    results, replacement = asyncio.run(main())
+    assert len(set(results)) == 1
+    assert workers.get_process_pool() is replacement
+
+def test_job_errors_propagate_without_restart(pool):
+    async def main():
+        before = workers.get_process_pool()
+        with pytest.raises(ValueError, match="bad report"):
+            await run_in_process(fail, "bad report")
+        return before
+    
+    assert asyncio.run(main()) is workers.get_process_pool()
@@ -1,10 +1,23 @@
+import logging
 from typing import List, Dict, Any
-from config import ACHIEVEMENTS_CONFIG
+from config import ACHIEVEMENTS_CONFIG, POINTS_LEDGER_FILE, POINTS_TOTALS_FILE
+from utils.points_ledger import get_points_ledger
+
+def backfill_points_ledger(data_manager) -> int:
+    """One-off migration: ledger entries for points earned before the ledger existed"""
+    points_ledger = get_points_ledger(POINTS_LEDGER_FILE, POINTS_TOTALS_FILE)
+    if points_ledger.load_totals().get("backfilled"):
+        return 0
+    
+    added = points_ledger.backfill_from_users(data_manager.load_users_data())
+    logging.info(f"Backfilled points ledger for {added} users")
+    return added
 
 class AchievementManager:
     def __init__(self, data_manager):
         self.data_manager = data_manager
         self.achievements_config = ACHIEVEMENTS_CONFIG
+        self.points_ledger = get_points_ledger(POINTS_LEDGER_FILE, POINTS_TOTALS_FILE)
     
     def check_achievements(self, user_id: str) -> List[Dict[str, Any]]:
         """Check and return new achievements for user"""
@@ -50,6 +63,12 @@ class AchievementManager:
             user["total_points"] += total_points
             
             self.data_manager.update_user(user_id, user)
+            
+            # Record points history
+            self.points_ledger.add_entries([
+                (user_id, f"achievement:{ach}", self.achievements_config[ach]["points"])
+                for ach in new_achievements
+            ])
         
         return [self.achievements_config[ach] for ach in new_achievements]
     
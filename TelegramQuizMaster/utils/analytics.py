@@ -0,0 +1,210 @@
+import asyncio
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from config import ANALYTICS_REFRESH_MINUTES
+from utils.workers import run_in_process
+
+logger = logging.getLogger(__name__)
+
+# Bucket edges for histograms, last bucket is open ended
+MINUTES_BINS = [0, 1, 30, 60, 180, 600, 1800, 6000]
+SESSIONS_BINS = [0, 1, 2, 5, 10, 25, 50, 100]
+STREAK_BINS = [0, 1, 2, 4, 8, 15, 31, 61]
+INACTIVE_DAYS_BINS = [0, 1, 7, 14, 30, 90, 180, 365]
+
+def parse_timestamps(values: List[Optional[str]]) -> np.ndarray:
+    """Parse ISO timestamps in one vectorized call, missing values become NaN"""
+    parsed = np.array([value or "NaT" for value in values], dtype="datetime64[us]")
+    seconds = parsed.astype("datetime64[s]").astype(np.float64)
+    seconds[np.isnat(parsed)] = np.nan
+    return seconds
+
+def format_histogram(rows: List[Tuple[str, int]], width: int = 10) -> str:
+    """Text bar chart of histogram rows"""
+    peak = max((count for _, count in rows), default=0)
+    lines = []
+    for label, count in rows:
+        bar = "▇" * round(width * count / peak) if peak else ""
+        lines.append(f"`{label:>9}` {bar} {count}")
+    return "\n".join(lines)
+
+class ColumnarSnapshot:
+    """Users and skills unpacked into flat NumPy columns"""
+    
+    def __init__(self, users_data: Dict[str, Any]):
+        started = time.monotonic()
+        self.built_at = datetime.now()
+        
+        created_at, last_active, user_skills = [], [], []
+        category_codes: Dict[str, int] = {}
+        skill_user, skill_category, skill_minutes, skill_sessions = [], [], [], []
+        skill_streak, skill_best_streak, skill_last_session = [], [], []
+        
+        # Single pass over nested dicts, everything after this is array math
+        for row, user in enumerate(users_data.values()):
+            created_at.append(user.get("created_at"))
+            last_active.append(user.get("last_active"))
+            skills = user.get("skills", {})
+            user_skills.append(len(skills))
+            
+            for skill in skills.values():
+                category = skill.get("category", "Другое")
+                skill_user.append(row)
+                skill_category.append(category_codes.setdefault(category, len(category_codes)))
+                skill_minutes.append(skill.get("total_time_minutes", 0))
+                skill_sessions.append(skill.get("sessions", 0))
+                skill_streak.append(skill.get("streak", 0))
+                skill_best_streak.append(skill.get("best_streak", 0))
+                skill_last_session.append(skill.get("last_session"))
+        
+        self.categories = list(category_codes)
+        self.user_count = len(created_at)
+        self.user_created_at = parse_timestamps(created_at)
+        self.user_last_active = parse_timestamps(last_active)
+        self.user_skills = np.array(user_skills, dtype=np.int32)
+        
+        self.skill_user = np.array(skill_user, dtype=np.int32)
+        self.skill_category = np.array(skill_category, dtype=np.int16)
+        self.skill_minutes = np.array(skill_minutes, dtype=np.int64)
+        self.skill_sessions = np.array(skill_sessions, dtype=np.int32)
+        self.skill_streak = np.array(skill_streak, dtype=np.int32)
+        self.skill_best_streak = np.array(skill_best_streak, dtype=np.int32)
+        self.skill_last_session = parse_timestamps(skill_last_session)
+        
+        # Per user totals are sums over skill rows grouped by owner
+        self.user_minutes = np.bincount(self.skill_user, weights=self.skill_minutes, minlength=self.user_count)
+        self.user_sessions = np.bincount(self.skill_user, weights=self.skill_sessions, minlength=self.user_count)
+        self.user_max_streak = np.zeros(self.user_count, dtype=np.int32)
+        np.maximum.at(self.user_max_streak, self.skill_user, self.skill_streak)
+        
+        self.build_seconds = time.monotonic() - started
+    
+    @property
+    def skill_count(self) -> int:
+        return len(self.skill_user)
+    
+    def distribution(self, values: np.ndarray) -> Dict[str, float]:
+        """Summary statistics of column"""
+        values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+        if len(values) == 0:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p75": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+        
+        p50, p75, p90, p99 = np.percentile(values, [50, 75, 90, 99])
+        return {
+            "count": int(len(values)),
+            "mean": float(values.mean()),
+            "p50": float(p50),
+            "p75": float(p75),
+            "p90": float(p90),
+            "p99": float(p99),
+            "max": float(values.max())
+        }
+    
+    def histogram(self, values: np.ndarray, bins: List[float]) -> List[Tuple[str, int]]:
+        """Count values per bucket, buckets labeled by their range"""
+        values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+        edges = np.array(bins + [np.inf], dtype=np.float64)
+        counts, _ = np.histogram(values, bins=edges)
+        
+        result = []
+        for i, count in enumerate(counts):
+            low, high = bins[i], edges[i + 1]
+            if high == np.inf:
+                label = f"{low}+"
+            elif high - low == 1:
+                label = f"{low}"
+            else:
+                label = f"{low}-{int(high) - 1}"
+            result.append((label, int(count)))
+        return result
+    
+    def group_by_category(self) -> List[Dict[str, Any]]:
+        """Skills, users, minutes and sessions per category, biggest first"""
+        codes = self.skill_category
+        size = len(self.categories)
+        skills = np.bincount(codes, minlength=size)
+        minutes = np.bincount(codes, weights=self.skill_minutes, minlength=size)
+        sessions = np.bincount(codes, weights=self.skill_sessions, minlength=size)
+        
+        # Distinct users per category, user x category matrix is cheaper than sorting pairs
+        has_category = np.zeros((self.user_count, size), dtype=bool)
+        has_category[self.skill_user, codes] = True
+        users = has_category.sum(axis=0)
+        
+        groups = [
+            {
+                "category": category,
+                "skills": int(skills[code]),
+                "users": int(users[code]),
+                "minutes": int(minutes[code]),
+                "sessions": int(sessions[code])
+            }
+            for code, category in enumerate(self.categories)
+        ]
+        return sorted(groups, key=lambda group: group["minutes"], reverse=True)
+    
+    def inactive_days(self) -> np.ndarray:
+        """Days since last activity per user"""
+        # Stored timestamps are naive local time, so "now" has to be too
+        now = np.datetime64(datetime.now(), "s").astype(np.float64)
+        last_active = np.where(np.isnan(self.user_last_active), self.user_created_at, self.user_last_active)
+        return (now - last_active) / 86400
+    
+    def active_users(self, days: int) -> int:
+        """Users active during last N days"""
+        return int(np.count_nonzero(self.inactive_days() < days))
+
+def build_snapshot_job(users_data: Mapping[str, Any]) -> "ColumnarSnapshot":
+    """Process pool entry point, arrays are pickled back to bot process"""
+    return ColumnarSnapshot(users_data)
+
+class AnalyticsManager:
+    """Keeps columnar snapshot of users fresh for admin reports"""
+    
+    def __init__(self, data_manager, refresh_minutes: int = ANALYTICS_REFRESH_MINUTES):
+        self.data_manager = data_manager
+        self.refresh_interval = refresh_minutes * 60
+        self.snapshot: Optional[ColumnarSnapshot] = None
+        self.task = None
+    
+    async def refresh(self) -> ColumnarSnapshot:
+        """Rebuild snapshot in process pool"""
+        self.snapshot = await run_in_process(build_snapshot_job, self.data_manager.load_users_data())
+        return self.snapshot
+    
+    async def get_snapshot(self) -> ColumnarSnapshot:
+        """Current snapshot, built on first use and when stale"""
+        if self.snapshot is None:
+            return await self.refresh()
+        
+        age = (datetime.now() - self.snapshot.built_at).total_seconds()
+        if age > self.refresh_interval and (self.task is None or self.task.done()):
+            return await self.refresh()
+        return self.snapshot
+    
+    async def run(self):
+        """Rebuild snapshot on schedule"""
+        while True:
+            try:
+                snapshot = await self.refresh()
+                logger.info(f"Analytics snapshot: {snapshot.user_count} users, {snapshot.skill_count} skills "
+                            f"in {snapshot.build_seconds:.2f}s")
+            except Exception as e:
+                logger.error(f"Error building analytics snapshot: {e}")
+            await asyncio.sleep(self.refresh_interval)
+    
+    def start(self):
+        """Start periodic rebuild in background task"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+    
+    async def shutdown(self):
+        """Stop periodic rebuild"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
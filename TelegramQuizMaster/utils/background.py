@@ -0,0 +1,31 @@
+import asyncio
+import logging
+from typing import Coroutine, Set
+
+logger = logging.getLogger(__name__)
+
+# Strong references, the event loop only keeps weak ones to running tasks
+_tasks: Set[asyncio.Task] = set()
+
+def run_in_background(coro: Coroutine, name: str) -> asyncio.Task:
+    """Run slow part of handler as separate task, handler returns right away
+    
+    Frees the user's update queue and the callback spinner; the task reports
+    its result by editing or sending messages itself.
+    """
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_finish)
+    return task
+
+def _finish(task: asyncio.Task):
+    """Forget finished task and log its error"""
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Background task {task.get_name()} failed", exc_info=task.exception())
+
+async def cancel_background_tasks():
+    """Stop background tasks on shutdown"""
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,403 @@
+import asyncio
+import json
+import os
+import time
+import logging
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Iterator, Optional
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest,
+    TelegramNetworkError, TelegramServerError
+)
+
+from config import (
+    BROADCAST_STATE_FILE, BROADCAST_RATE_PER_SECOND, BROADCAST_CONCURRENCY,
+    BROADCAST_MAX_RETRIES, BROADCAST_CHECKPOINT_SECONDS, BROADCAST_HISTORY_LIMIT,
+    BROADCAST_PROGRESS_SECONDS, BROADCAST_RATE_WINDOW
+)
+from utils.rate_limit import TokenBucket
+from middlewares.request_scheduler import set_request_priority, PRIORITY_BACKGROUND, PRIORITY_BULK
+from utils.user_index import describe_segment
+
+logger = logging.getLogger(__name__)
+
+STATUS_TITLES = {
+    "running": "📤 Рассылка идет",
+    "paused": "⏸️ Рассылка на паузе",
+    "cancelled": "🛑 Рассылка отменена",
+    "done": "✅ Рассылка завершена!"
+}
+
+def format_duration(seconds: float) -> str:
+    """Format duration as short human readable text"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    
+    if hours > 0:
+        return f"{hours}ч {minutes}м"
+    if minutes > 0:
+        return f"{minutes}м {seconds}с"
+    return f"{seconds}с"
+
+def get_broadcast_control_keyboard(job: "BroadcastJob") -> Optional[InlineKeyboardMarkup]:
+    """Pause/resume and cancel buttons for active broadcast"""
+    status = job.state["status"]
+    if status not in ("running", "paused"):
+        return None
+    
+    if status == "paused":
+        toggle = InlineKeyboardButton(text="▶️ Продолжить", callback_data=f"bc_resume_{job.job_id}")
+    else:
+        toggle = InlineKeyboardButton(text="⏸️ Пауза", callback_data=f"bc_pause_{job.job_id}")
+    
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            toggle,
+            InlineKeyboardButton(text="🛑 Отменить", callback_data=f"bc_cancel_{job.job_id}")
+        ]
+    ])
+
+class BroadcastJob:
+    """Single broadcast with persisted progress"""
+    
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+        self.in_flight = set()
+        self.last_dispatched = None
+        self.blocked_pending = []
+        self.task = None
+        self.resumed = asyncio.Event()
+        self.rate_samples = deque(maxlen=BROADCAST_RATE_WINDOW)
+        
+        if state["status"] != "paused":
+            self.resumed.set()
+    
+    @property
+    def job_id(self) -> str:
+        return self.state["id"]
+    
+    @property
+    def processed(self) -> int:
+        return self.state["sent"] + self.state["failed"] + self.state["blocked"]
+    
+    @property
+    def remaining(self) -> int:
+        return max(0, self.state["total"] - self.processed)
+    
+    def current_rate(self) -> float:
+        """Messages per second over recent progress samples"""
+        self.rate_samples.append((time.monotonic(), self.processed))
+        if len(self.rate_samples) < 2:
+            return 0.0
+        
+        (start_time, start_count), (end_time, end_count) = self.rate_samples[0], self.rate_samples[-1]
+        if end_time <= start_time:
+            return 0.0
+        return (end_count - start_count) / (end_time - start_time)
+    
+    def update_cursor(self):
+        """Move resume cursor past every finished recipient"""
+        if self.in_flight:
+            self.state["done_below"] = min(self.in_flight)
+        elif self.last_dispatched is not None:
+            self.state["done_below"] = self.last_dispatched + 1
+
+class BroadcastManager:
+    """Runs broadcasts in background with bounded concurrency and rate limit"""
+    
+    def __init__(self, data_manager, state_file: str = BROADCAST_STATE_FILE):
+        self.data_manager = data_manager
+        self.state_file = state_file
+        self.bucket = TokenBucket(BROADCAST_RATE_PER_SECOND)
+        self.jobs: Dict[str, BroadcastJob] = {}
+        
+        for job_state in self.load_state():
+            self.jobs[job_state["id"]] = BroadcastJob(job_state)
+    
+    def load_state(self) -> List[Dict[str, Any]]:
+        """Load broadcast jobs from JSON file"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError as e:
+            logger.error(f"Error loading broadcast state: {e}")
+            return []
+    
+    def save_state(self):
+        """Save broadcast jobs atomically"""
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump([job.state for job in self.jobs.values()], f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.error(f"Error saving broadcast state: {e}")
+    
+    def create_job(self, text: str, chat_id: int, segment: Optional[Dict[str, Any]] = None) -> BroadcastJob:
+        """Create and persist new broadcast job"""
+        job = BroadcastJob({
+            "id": uuid.uuid4().hex[:8],
+            "text": text,
+            "chat_id": chat_id,
+            "segment": segment,
+            "status_message_id": None,
+            "status": "running",
+            "total": self.count_recipients(segment),
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "done_below": 0,
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0
+        })
+        self.jobs[job.job_id] = job
+        self.prune_finished()
+        self.save_state()
+        return job
+    
+    def prune_finished(self):
+        """Keep only recent finished jobs in state file"""
+        finished = [job for job in self.jobs.values() if job.state["status"] in ("done", "cancelled")]
+        finished.sort(key=lambda job: job.state["created_at"])
+        for job in finished[:-BROADCAST_HISTORY_LIMIT]:
+            del self.jobs[job.job_id]
+    
+    def start(self, bot: Bot, job: BroadcastJob):
+        """Run job in background task"""
+        job.task = asyncio.create_task(self.run(bot, job))
+    
+    def resume(self, bot: Bot):
+        """Restart jobs interrupted by bot restart, paused jobs wait for admin"""
+        for job in self.jobs.values():
+            if job.state["status"] == "running" and job.task is None:
+                logger.info(f"Resuming broadcast {job.job_id} from user {job.state['done_below']}")
+                self.start(bot, job)
+    
+    def pause_job(self, job: BroadcastJob):
+        """Stop sending after in-flight messages"""
+        if job.state["status"] == "running":
+            job.state["status"] = "paused"
+            job.resumed.clear()
+            self.save_state()
+    
+    def resume_job(self, bot: Bot, job: BroadcastJob):
+        """Continue paused job"""
+        if job.state["status"] != "paused":
+            return
+        
+        job.state["status"] = "running"
+        job.rate_samples.clear()
+        job.resumed.set()
+        self.save_state()
+        
+        # Job paused before restart has no running task
+        if job.task is None or job.task.done():
+            self.start(bot, job)
+    
+    def cancel_job(self, job: BroadcastJob):
+        """Stop job for good"""
+        if job.state["status"] not in ("running", "paused"):
+            return
+        
+        job.state["status"] = "cancelled"
+        job.state["finished_at"] = datetime.now().isoformat()
+        job.resumed.set()
+        if job.task and not job.task.done():
+            job.task.cancel()
+        self.save_state()
+    
+    def format_status(self, job: BroadcastJob) -> str:
+        """Progress report text for status message"""
+        status = job.state["status"]
+        text = (
+            f"{STATUS_TITLES[status]}\n"
+            f"🎯 Получатели: {describe_segment(job.state.get('segment'))}\n\n"
+            f"📤 Отправлено: {job.state['sent']}\n"
+            f"❌ Не удалось отправить: {job.state['failed']}\n"
+            f"🚫 Заблокировали бота: {job.state['blocked']}\n"
+            f"⏳ Осталось: {job.remaining} из {job.state['total']}\n"
+        )
+        
+        if status == "running":
+            rate = job.current_rate()
+            eta = format_duration(job.remaining / rate) if rate > 0 else "—"
+            text += f"⚡ Скорость: {rate:.1f} сообщ./с\n"
+            text += f"🕒 Осталось времени: {eta}\n"
+        
+        return text
+    
+    async def update_status_message(self, bot: Bot, job: BroadcastJob, last_text: Optional[str] = None) -> Optional[str]:
+        """Edit status message if its text changed, return shown text"""
+        text = self.format_status(job)
+        if text == last_text:
+            return last_text
+        
+        try:
+            if job.state["status_message_id"]:
+                await bot.edit_message_text(
+                    text=text,
+                    chat_id=job.state["chat_id"],
+                    message_id=job.state["status_message_id"],
+                    reply_markup=get_broadcast_control_keyboard(job)
+                )
+            else:
+                sent = await bot.send_message(
+                    job.state["chat_id"], text,
+                    reply_markup=get_broadcast_control_keyboard(job)
+                )
+                job.state["status_message_id"] = sent.message_id
+            return text
+        except TelegramRetryAfter as e:
+            self.bucket.block_for(e.retry_after)
+        except TelegramBadRequest as e:
+            logger.info(f"Broadcast {job.job_id} status not updated: {e.message}")
+        except Exception as e:
+            logger.error(f"Failed to update broadcast {job.job_id} status: {e}")
+        return last_text
+    
+    async def report_progress(self, bot: Bot, job: BroadcastJob):
+        """Periodically edit status message while job runs"""
+        set_request_priority(PRIORITY_BACKGROUND)
+        last_text = None
+        while True:
+            # One edit per interval fits into headroom left below the API limit,
+            # so reports don't take tokens from sending
+            await asyncio.sleep(BROADCAST_PROGRESS_SECONDS)
+            last_text = await self.update_status_message(bot, job, last_text)
+    
+    async def shutdown(self):
+        """Stop running jobs and keep their progress for resume"""
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.save_state()
+    
+    def iter_recipients(self, job: BroadcastJob) -> Iterator[int]:
+        """Yield segment recipient IDs in ascending order, skipping finished and blocked users"""
+        index = self.data_manager.get_index()
+        return index.iter_segment(job.state.get("segment"), job.state["done_below"])
+    
+    def count_recipients(self, segment: Optional[Dict[str, Any]] = None) -> int:
+        """Count users in segment that can receive broadcast"""
+        return len(self.data_manager.get_index().resolve_segment(segment))
+    
+    @staticmethod
+    def format_message(text: str) -> str:
+        """Broadcast message as recipients get it"""
+        return f"📢 **Сообщение от администрации:**\n\n{text}"
+    
+    async def preview(self, bot: Bot, chat_id: int, text: str):
+        """Send broadcast message to admin before creating job
+        
+        Raises TelegramBadRequest if Telegram can't parse its Markdown, which
+        would otherwise fail the send to every recipient.
+        """
+        await bot.send_message(chat_id, self.format_message(text), parse_mode="Markdown")
+    
+    async def send(self, bot: Bot, job: BroadcastJob, chat_id: int) -> str:
+        """Send broadcast to single user, return result status"""
+        for attempt in range(BROADCAST_MAX_RETRIES):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=self.format_message(job.state['text']),
+                    parse_mode="Markdown"
+                )
+                return "sent"
+            except TelegramRetryAfter as e:
+                # Flood control applies to the whole bot, pause every worker
+                logger.warning(f"Broadcast {job.job_id} hit flood control, waiting {e.retry_after}s")
+                self.bucket.block_for(e.retry_after)
+            except TelegramForbiddenError:
+                return "blocked"
+            except TelegramBadRequest as e:
+                logger.info(f"Broadcast to {chat_id} rejected: {e.message}")
+                return "failed"
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Broadcast to {chat_id} failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(2 ** attempt)
+        return "failed"
+    
+    async def worker(self, bot: Bot, job: BroadcastJob, queue: asyncio.Queue):
+        """Take recipients from queue and send until sentinel"""
+        # Replies to users go out before broadcast messages
+        set_request_priority(PRIORITY_BULK)
+        while True:
+            chat_id = await queue.get()
+            if chat_id is None:
+                return
+            
+            await job.resumed.wait()
+            
+            try:
+                result = await self.send(bot, job, chat_id)
+            except Exception as e:
+                logger.exception(f"Unexpected broadcast error for {chat_id}: {e}")
+                result = "failed"
+            
+            if result == "blocked":
+                job.state["blocked"] += 1
+                job.blocked_pending.append(str(chat_id))
+            else:
+                job.state[result] += 1
+            
+            job.in_flight.discard(chat_id)
+            job.update_cursor()
+    
+    def checkpoint(self, job: BroadcastJob):
+        """Persist progress and flush blocked users"""
+        if job.blocked_pending:
+            self.data_manager.mark_users_blocked(job.blocked_pending)
+            job.blocked_pending = []
+        self.save_state()
+    
+    async def run(self, bot: Bot, job: BroadcastJob):
+        """Send job to all recipients"""
+        queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 2)
+        workers = [
+            asyncio.create_task(self.worker(bot, job, queue))
+            for _ in range(BROADCAST_CONCURRENCY)
+        ]
+        reporter = asyncio.create_task(self.report_progress(bot, job))
+        last_checkpoint = time.monotonic()
+        
+        try:
+            for chat_id in self.iter_recipients(job):
+                job.in_flight.add(chat_id)
+                job.last_dispatched = chat_id
+                await queue.put(chat_id)
+                
+                if time.monotonic() - last_checkpoint >= BROADCAST_CHECKPOINT_SECONDS:
+                    self.checkpoint(job)
+                    last_checkpoint = time.monotonic()
+            
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            for worker in workers:
+                worker.cancel()
+            reporter.cancel()
+            self.checkpoint(job)
+            raise
+        
+        reporter.cancel()
+        job.state["status"] = "done"
+        job.state["finished_at"] = datetime.now().isoformat()
+        self.checkpoint(job)
+        await self.update_status_message(bot, job)
+    
+    def get_job(self, job_id: str) -> Optional[BroadcastJob]:
+        """Get job by ID"""
+        return self.jobs.get(job_id)
@@ -0,0 +1,161 @@
+import logging
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+class CallbackRoutes:
+    """Callback handlers of one handlers module, by exact data or data prefix
+    
+    Used like router decorators; stacked decorators add more keys to the
+    same handler:
+        
+        @callbacks.exact("admin_browse")
+        @callbacks.prefix("ub_n_", "ub_p_")
+        async def browse_users(callback: CallbackQuery): ...
+    
+    Packed CallbackData is routed by its prefix and leading fields, the
+    handler gets it unpacked as callback_data argument.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.exact_routes: List[Tuple[str, Callable]] = []
+        self.prefix_routes: List[Tuple[str, Callable, Optional[Type[CallbackData]]]] = []
+    
+    def exact(self, *values: str):
+        """Handle callbacks whose data equals one of values"""
+        def decorator(handler: Callable) -> Callable:
+            self.exact_routes.extend((value, handler) for value in values)
+            return handler
+        return decorator
+    
+    def prefix(self, *prefixes: str):
+        """Handle callbacks whose data starts with one of prefixes"""
+        def decorator(handler: Callable) -> Callable:
+            for prefix in prefixes:
+                if not prefix:
+                    raise ValueError(f"Empty callback prefix for {handler.__name__} in {self.name}")
+                self.prefix_routes.append((prefix, handler, None))
+            return handler
+        return decorator
+    
+    def data(self, factory: Type[CallbackData], **fields: Any):
+        """Handle callback data packed by factory, fields fix its leading values"""
+        names = list(factory.model_fields)
+        if list(fields) != names[:len(fields)]:
+            raise ValueError(f"Routed fields of {factory.__name__} must be its first fields {names}, got {list(fields)}")
+        values = [str(value.value if isinstance(value, Enum) else value) for value in fields.values()]
+        prefix = factory.__separator__.join([factory.__prefix__, *values]) + factory.__separator__
+        
+        def decorator(handler: Callable) -> Callable:
+            self.prefix_routes.append((prefix, handler, factory))
+            return handler
+        return decorator
+
+class _TrieNode:
+    """Node of prefix trie, route is set where a registered prefix ends"""
+    __slots__ = ("children", "route")
+    
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.route: Optional["_Route"] = None
+
+class _Route:
+    """Compiled handler with where it was registered, for error messages"""
+    __slots__ = ("key", "handler", "source", "factory")
+    
+    def __init__(self, key: str, handler: Callable, source: str, factory: Optional[Type[CallbackData]] = None):
+        self.key = key
+        self.handler = HandlerObject(callback=handler)
+        self.source = source
+        self.factory = factory
+    
+    def __str__(self) -> str:
+        return f"{self.source}.{self.handler.callback.__name__}"
+
+class CallbackDispatcher:
+    """All callback routes compiled into one exact-match dict and a prefix trie
+    
+    Exact data wins over prefixes and the longest matching prefix wins over
+    shorter ones, whatever order modules registered them in, so "skill_tip_"
+    is never taken by "skill_". Routing costs one dict lookup plus a walk of
+    at most len(data) trie nodes. Registering the same data or prefix twice
+    is ambiguous and fails at startup.
+    """
+    
+    def __init__(self, *routes: CallbackRoutes):
+        self.exact: Dict[str, _Route] = {}
+        self.root = _TrieNode()
+        self.prefixes = 0
+        
+        for module_routes in routes:
+            for value, handler in module_routes.exact_routes:
+                self.add_exact(_Route(value, handler, module_routes.name))
+            for prefix, handler, factory in module_routes.prefix_routes:
+                self.add_prefix(_Route(prefix, handler, module_routes.name, factory))
+    
+    def add_exact(self, route: _Route):
+        """Register exact callback data"""
+        existing = self.exact.get(route.key)
+        if existing is not None:
+            raise ValueError(f"Callback data {route.key!r} is handled by both {existing} and {route}")
+        self.exact[route.key] = route
+    
+    def add_prefix(self, route: _Route):
+        """Insert prefix into trie"""
+        node = self.root
+        for char in route.key:
+            node = node.children.setdefault(char, _TrieNode())
+        if node.route is not None:
+            raise ValueError(f"Callback prefix {route.key!r} is handled by both {node.route} and {route}")
+        node.route = route
+        self.prefixes += 1
+    
+    def match(self, data: str) -> Optional[_Route]:
+        """Route for callback data, None if nothing handles it"""
+        route = self.exact.get(data)
+        if route is not None:
+            return route
+        
+        node = self.root
+        for char in data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.route is not None:
+                route = node.route
+        return route
+    
+    def filter(self, callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        """aiogram filter, passes matched route on to dispatch"""
+        if callback.data is None:
+            return False
+        route = self.match(callback.data)
+        if route is None:
+            return False
+        if route.factory is None:
+            return {"callback_route": route}
+        
+        try:
+            callback_data = route.factory.unpack(callback.data)
+        except (TypeError, ValueError):
+            # Button of an older bot version with different fields
+            return False
+        return {"callback_route": route, "callback_data": callback_data}
+    
+    async def dispatch(self, callback: CallbackQuery, callback_route: _Route, **data: Any) -> Any:
+        """Call matched handler with the arguments it asks for"""
+        return await callback_route.handler.call(callback, **data)
+    
+    def create_router(self) -> Router:
+        """Router with single callback handler routing by compiled table"""
+        router = Router(name="callbacks")
+        router.callback_query.register(self.dispatch, self.filter)
+        logger.info(f"Compiled {len(self.exact)} exact and {self.prefixes} prefix callback routes")
+        return router
@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import signal
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from config import ADMIN_IDS, STORAGE_BACKEND, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE, REQUEST_RATE_PER_SECOND
+from utils.rate_limit import SharedTokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Update types handled by routers, front process does not import handlers
+CLUSTER_UPDATE_TYPES = ["message", "callback_query"]
+WORKER_CHECK_SECONDS = 5
+WORKER_START_SECONDS = 60
+WORKER_METRICS_LOG_SECONDS = 60
+WORKER_STOP_SECONDS = 30
+
+def get_update_user_id(update: Update) -> int:
+    """User update belongs to, chat ID for updates without user"""
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user:
+        return user.id
+    chat = getattr(event, "chat", None)
+    return chat.id if chat else 0
+
+def get_worker_index(user_id: int, workers: int) -> int:
+    """Worker owning user, always the same one for the same user
+    
+    Admins go to primary worker, which also runs background jobs and keeps
+    their caches.
+    """
+    if user_id in ADMIN_IDS:
+        return 0
+    return user_id % workers
+
+async def process_in_order(dp: Dispatcher, bot: Bot, update: Update, previous: Optional[asyncio.Task]):
+    """Handle update once previous update of same user is done"""
+    if previous is not None:
+        await asyncio.wait([previous])
+    try:
+        await dp.feed_update(bot, update)
+    except Exception as e:
+        logger.exception(f"Error handling update {update.update_id}: {e}")
+
+async def log_metrics(scheduler, throttling, dp: Dispatcher):
+    """Workers have no web server, their request, update and FSM metrics go to log"""
+    while True:
+        await asyncio.sleep(WORKER_METRICS_LOG_SECONDS)
+        logger.info(f"Request metrics: {json.dumps(scheduler.get_metrics())}")
+        logger.info(f"Throttling metrics: {json.dumps(throttling.get_metrics())}")
+        logger.info(f"Update queue metrics: {json.dumps(dp['load_shedding'].get_metrics())}")
+        logger.info(f"FSM metrics: {json.dumps(dp.fsm.storage.get_metrics(), ensure_ascii=False)}")
+
+def forget_task(tails: Dict[int, asyncio.Task], user_id: int, task: asyncio.Task):
+    """Drop finished last task of user"""
+    if tails.get(user_id) is task:
+        del tails[user_id]
+
+async def serve_worker(index: int, updates: multiprocessing.Queue, ready, request_bucket: SharedTokenBucket):
+    """Handle updates routed to this worker until stop sentinel"""
+    # Imported here so front process never loads handlers and user data
+    from main import create_bot, create_dispatcher, request_scheduler, throttling
+    
+    # Replies of every worker and broadcasts of primary one draw from the whole bot limit
+    request_scheduler.use_bucket(request_bucket)
+    bot = create_bot()
+    dp = create_dispatcher()
+    primary = index == 0
+    await dp.emit_startup(bot=bot, dispatcher=dp, primary=primary)
+    ready.set()
+    logger.info(f"Worker {index} started{' (primary)' if primary else ''}")
+    
+    # Updates of different users run concurrently, of one user one by one
+    loop = asyncio.get_running_loop()
+    tails: Dict[int, asyncio.Task] = {}
+    metrics_task = asyncio.create_task(log_metrics(request_scheduler, throttling, dp))
+    try:
+        while True:
+            payload = await loop.run_in_executor(None, updates.get)
+            if payload is None:
+                break
+            user_id, data = payload
+            update = Update.model_validate(json.loads(data), context={"bot": bot})
+            task = asyncio.create_task(process_in_order(dp, bot, update, tails.get(user_id)))
+            tails[user_id] = task
+            task.add_done_callback(functools.partial(forget_task, tails, user_id))
+        
+        if tails:
+            await asyncio.gather(*tails.values(), return_exceptions=True)
+    finally:
+        metrics_task.cancel()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, primary=primary)
+        await bot.session.close()
+        logger.info(f"Worker {index} stopped")
+
+def run_worker(index: int, updates: multiprocessing.Queue, ready, request_bucket: SharedTokenBucket):
+    """Worker process entry point"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker {index} - %(name)s - %(levelname)s - %(message)s',
+        force=True
+    )
+    asyncio.run(serve_worker(index, updates, ready, request_bucket))
+
+class RoutingMiddleware(BaseMiddleware):
+    """Send every update to its worker instead of handling it"""
+    
+    def __init__(self, cluster: "Cluster"):
+        self.cluster = cluster
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.cluster.route(event)
+        return True
+
+class Cluster:
+    """Front process side: runs worker processes and routes updates to them"""
+    
+    def __init__(self, workers: int):
+        if STORAGE_BACKEND != "sqlite":
+            raise RuntimeError("Several bot workers need shared storage, set STORAGE_BACKEND=sqlite")
+        
+        self.workers = workers
+        # Spawned workers start clean, without front's event loop or sockets
+        self.context = multiprocessing.get_context("spawn")
+        self.queues = [self.context.Queue() for _ in range(workers)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        # Outgoing request limit of the bot, shared by workers instead of split
+        # into fixed shares, so broadcasts of primary worker are not capped by one
+        self.request_bucket = SharedTokenBucket(REQUEST_RATE_PER_SECOND, context=self.context)
+        self.monitor_task = None
+    
+    def create_dispatcher(self) -> Dispatcher:
+        """Dispatcher of front process, receives updates for workers"""
+        dp = Dispatcher(allowed_updates=CLUSTER_UPDATE_TYPES)
+        dp.update.outer_middleware(RoutingMiddleware(self))
+        dp.startup.register(self.start)
+        dp.shutdown.register(self.shutdown)
+        return dp
+    
+    def route(self, update: Update):
+        """Queue update to worker owning its user"""
+        user_id = get_update_user_id(update)
+        index = get_worker_index(user_id, self.workers)
+        self.queues[index].put((user_id, update.model_dump_json(exclude_unset=True)))
+    
+    def start_worker(self, index: int):
+        """Start or restart worker process, returns event set once it is ready"""
+        ready = self.context.Event()
+        process = self.context.Process(
+            target=run_worker, args=(index, self.queues[index], ready, self.request_bucket),
+            name=f"bot-worker-{index}"
+        )
+        
+        # Ctrl+C reaches the whole process group, workers inherit ignoring it
+        # and are stopped by front after queued updates are handled
+        previous_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            process.start()
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+        self.processes[index] = process
+        return ready
+    
+    async def start(self):
+        """Prepare shared storage and start workers"""
+        from utils.data_manager import DataManager
+        from utils.achievements import backfill_points_ledger
+        
+        # Storage is created (and migrated from users.json) once, before workers race for it
+        data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
+        data_manager.remove_misrouted_skills()
+        backfill_points_ledger(data_manager)
+        
+        events = [self.start_worker(index) for index in range(self.workers)]
+        self.monitor_task = asyncio.create_task(self.monitor())
+        
+        # Updates are only accepted once handlers are loaded everywhere
+        for index, ready in enumerate(events):
+            if not await asyncio.to_thread(ready.wait, WORKER_START_SECONDS):
+                logger.warning(f"Bot worker {index} is not ready after {WORKER_START_SECONDS}s")
+        logger.info(f"Started {self.workers} bot workers")
+    
+    async def monitor(self):
+        """Restart workers that died, their queued updates wait for them"""
+        while True:
+            await asyncio.sleep(WORKER_CHECK_SECONDS)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"Bot worker {index} exited with code {process.exitcode}, restarting it")
+                    self.start_worker(index)
+    
+    async def shutdown(self):
+        """Let workers finish queued updates and stop them"""
+        if self.monitor_task:
+            self.monitor_task.cancel()
+            await asyncio.gather(self.monitor_task, return_exceptions=True)
+        
+        for queue in self.queues:
+            queue.put(None)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, WORKER_STOP_SECONDS)
+            if process.is_alive():
+                logger.warning(f"Bot worker {index} did not stop in time, terminating it")
+                process.terminate()
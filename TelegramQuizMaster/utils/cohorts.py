@@ -0,0 +1,108 @@
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, Optional, Set
+
+from config import COHORT_WEEKS
+from utils.points_ledger import get_period_keys
+from utils.workers import run_in_process
+
+def get_week_key(timestamp: datetime) -> str:
+    """ISO week key like 2025-W21"""
+    return get_period_keys(timestamp)["week"]
+
+def get_week_start(week_key: str) -> date:
+    """Monday of ISO week key"""
+    year, week = week_key.split("-W")
+    return date.fromisocalendar(int(year), int(week), 1)
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse stored ISO timestamp, None for missing or broken values"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def get_activity_weeks(user: Dict[str, Any]) -> Set[str]:
+    """Weeks user was active in, recorded or recovered from session history"""
+    weeks = set(user.get("activity_weeks", []))
+    
+    # Users written before activity weeks were tracked only have timestamps
+    timestamps = [user.get("created_at"), user.get("last_active")]
+    for skill in user.get("skills", {}).values():
+        timestamps.append(skill.get("last_session"))
+        timestamps.extend(note.get("date") for note in skill.get("notes", []))
+    
+    for value in timestamps:
+        timestamp = parse_time(value)
+        if timestamp:
+            weeks.add(get_week_key(timestamp))
+    return weeks
+
+def build_cohorts(users_data: Dict[str, Any], weeks: int = COHORT_WEEKS,
+                  today: Optional[date] = None) -> Dict[str, Any]:
+    """Weekly signup cohorts with share of users active N weeks later"""
+    today = today or date.today()
+    current_start = today - timedelta(days=today.weekday())
+    first_start = current_start - timedelta(weeks=weeks - 1)
+    
+    sizes = [0] * weeks
+    active = [[0] * weeks for _ in range(weeks)]
+    
+    # One pass, each user adds to their cohort row only
+    for user in users_data.values():
+        created_at = parse_time(user.get("created_at"))
+        if not created_at:
+            continue
+        
+        cohort_start = created_at.date() - timedelta(days=created_at.weekday())
+        if cohort_start < first_start:
+            continue
+        row = (cohort_start - first_start).days // 7
+        sizes[row] += 1
+        
+        for week_key in get_activity_weeks(user):
+            offset = (get_week_start(week_key) - cohort_start).days // 7
+            if 0 <= offset < weeks - row:
+                active[row][offset] += 1
+    
+    cohorts = []
+    for row in range(weeks):
+        cohort_start = first_start + timedelta(weeks=row)
+        cohorts.append({
+            "week": get_week_key(cohort_start),
+            "start": cohort_start,
+            "size": sizes[row],
+            "active": active[row][:weeks - row],
+            "retention": [
+                count / sizes[row] * 100 if sizes[row] else 0.0
+                for count in active[row][:weeks - row]
+            ]
+        })
+    
+    return {"computed_at": datetime.now(), "day": today, "weeks": weeks, "cohorts": cohorts}
+
+def format_cohort_table(report: Dict[str, Any]) -> str:
+    """Render cohorts as monospace retention table"""
+    weeks = report["weeks"]
+    header = "Неделя  Кол." + "".join(f"{f'W{offset}':>5}" for offset in range(weeks))
+    lines = [header]
+    
+    for cohort in report["cohorts"]:
+        cells = "".join(f"{retention:>4.0f}%" for retention in cohort["retention"]) if cohort["size"] else ""
+        lines.append(f"{cohort['start'].strftime('%d.%m'):<6}{cohort['size']:>6}{cells}")
+    return "\n".join(lines)
+
+class CohortManager:
+    """Cohort report cached until next day rollover"""
+    
+    def __init__(self, data_manager, weeks: int = COHORT_WEEKS):
+        self.data_manager = data_manager
+        self.weeks = weeks
+        self.report: Optional[Dict[str, Any]] = None
+    
+    async def get_report(self, force: bool = False) -> Dict[str, Any]:
+        """Cached report, recomputed once a day or on demand"""
+        if force or self.report is None or self.report["day"] != date.today():
+            self.report = await run_in_process(build_cohorts, self.data_manager.load_users_data(), self.weeks)
+        return self.report
@@ -1,14 +1,68 @@
+import asyncio
 import json
 import os
+import threading
+from copy import deepcopy
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Iterable, Mapping
 import logging
 
+from utils.user_index import UserIndex, get_user_index
+from utils.user_search import UserSearchIndex, get_search_index
+from utils.user_store import UserStore, get_user_store
+from utils.user_db import UserDatabase, get_user_database
+from utils.points_ledger import get_period_keys
+from config import STORAGE_BACKEND
+
+# One write lock per users file, shared by every DataManager instance
+_write_locks: Dict[str, threading.RLock] = {}
+# Event loop whose handlers read the indexes of a users file
+_index_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+
+def new_skill_id(user: Dict[str, Any]) -> int:
+    """Next skill ID of user, IDs of deleted skills are never reused"""
+    skill_id = user.get("next_skill_id") or max(
+        (skill.get("id", 0) for skill in user["skills"].values()), default=0
+    ) + 1
+    user["next_skill_id"] = skill_id + 1
+    return skill_id
+
+def find_skill_key(skills: Dict[str, Any], skill_id: int) -> Optional[str]:
+    """Key of skill with ID, None if it was deleted"""
+    for skill_key, skill in skills.items():
+        if skill.get("id") == skill_id:
+            return skill_key
+    return None
+
+def is_misrouted_skill(skill_key: str, skill: Dict[str, Any]) -> bool:
+    """Skill added by a skill_tip_/skill_stats_ press that the skill_ handler took
+    
+    Those got the rest of the callback data as their name, the plain
+    "Другое" category, and were never practised.
+    """
+    return (
+        skill_key.startswith(("tip_", "stats_")) and skill.get("name") == skill_key
+        and skill.get("category") == "Другое"
+        and not skill.get("sessions") and not skill.get("total_time_minutes")
+    )
+
 class DataManager:
     def __init__(self, users_file: str, achievements_file: str):
         self.users_file = users_file
         self.achievements_file = achievements_file
+        # Tombstones of removed users, delta exports carry them
+        self.removed_file = f"{os.path.splitext(users_file)[0]}_removed.json"
+        # Time of last restore, its records keep old updated_at so deltas can't carry them
+        self.restored_file = f"{os.path.splitext(users_file)[0]}_restored.json"
+        self.index = get_user_index(users_file)
+        self.search_index = get_search_index(users_file)
+        self.store = get_user_store(users_file)
+        self.write_lock = _write_locks.setdefault(users_file, threading.RLock())
         self.ensure_data_directory()
+        self.database: Optional[UserDatabase] = None
+        if STORAGE_BACKEND == "sqlite":
+            # Shared by worker processes, users file is only a migration source
+            self.database = get_user_database(f"{os.path.splitext(users_file)[0]}.db")
         self.initialize_files()
     
     def ensure_data_directory(self):
@@ -20,10 +74,58 @@ class DataManager:
         if not os.path.exists(self.users_file):
             self.save_users_data({})
         
+        if self.database and self.database.is_empty():
+            users = self.read_users_file()
+            if users:
+                logging.info(f"Importing {len(users)} users from {self.users_file} into {self.database.path}")
+                self.database.write(users)
+        
         if not os.path.exists(self.achievements_file):
             self.save_achievements_data({})
     
-    def load_users_data(self) -> Dict[str, Any]:
+    def get_store(self) -> UserStore:
+        """Get in-memory user store, loaded from file on first use"""
+        if not self.store.loaded:
+            with self.write_lock:
+                self.store.ensure_loaded(self.read_users)
+        elif self.database:
+            self.sync_store()
+        return self.store
+    
+    def sync_store(self):
+        """Pull users written by other worker processes into store"""
+        with self.write_lock:
+            changes = self.database.pull_changes()
+            if changes is None:
+                return
+            records, remove_ids = changes
+            self.store.apply(records, remove_ids)
+            self.reindex_users(records, remove_ids)
+    
+    def read_users(self) -> Dict[str, Any]:
+        """Load all users from storage backend"""
+        if self.database:
+            return self.database.load_all()
+        return self.read_users_file()
+    
+    def load_users_data(self) -> Mapping[str, Any]:
+        """Consistent read-only snapshot of users data
+        
+        Taking it is cheap and never blocks writers; long scans see users
+        exactly as they were when it was taken.
+        """
+        return self.get_store().snapshot()
+    
+    def reload_users_data(self):
+        """Reload users data from JSON file, e.g. after editing it by hand"""
+        with self.write_lock:
+            self.store.load(self.read_users())
+            if self.index.built:
+                self.index.rebuild(self.store.snapshot())
+            if self.search_index.built:
+                self.search_index.rebuild(self.store.snapshot())
+    
+    def read_users_file(self) -> Dict[str, Any]:
         """Load users data from JSON file"""
         try:
             with open(self.users_file, 'r', encoding='utf-8') as f:
@@ -34,12 +136,63 @@ class DataManager:
     
     def save_users_data(self, data: Dict[str, Any]):
         """Save users data to JSON file"""
+        # Write to temp file first so readers in other threads never see a partial file
+        tmp_file = f"{self.users_file}.tmp"
         try:
-            with open(self.users_file, 'w', encoding='utf-8') as f:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.users_file)
         except Exception as e:
             logging.error(f"Error saving users data: {e}")
     
+    def load_removed_users(self) -> Dict[str, str]:
+        """IDs of removed users with time of removal"""
+        try:
+            with open(self.removed_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            logging.error(f"Error loading removed users: {e}")
+            return {}
+    
+    def record_removed_users(self, user_ids: List[str]):
+        """Remember removal time of users, caller holds write lock"""
+        if not user_ids:
+            return
+        removed = self.load_removed_users()
+        now = datetime.now().isoformat()
+        removed.update((user_id, now) for user_id in user_ids)
+        
+        tmp_file = f"{self.removed_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(removed, f, ensure_ascii=False)
+            os.replace(tmp_file, self.removed_file)
+        except Exception as e:
+            logging.error(f"Error saving removed users: {e}")
+    
+    def load_last_restore(self) -> Optional[str]:
+        """Time of last restore that changed users, None if there was none"""
+        try:
+            with open(self.restored_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("restored_at")
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            logging.error(f"Error loading restore time: {e}")
+            return None
+    
+    def record_restore(self):
+        """Remember that users were restored now"""
+        tmp_file = f"{self.restored_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"restored_at": datetime.now().isoformat()}, f)
+            os.replace(tmp_file, self.restored_file)
+        except Exception as e:
+            logging.error(f"Error saving restore time: {e}")
+    
     def load_achievements_data(self) -> Dict[str, Any]:
         """Load achievements data from JSON file"""
         try:
@@ -57,32 +210,204 @@ class DataManager:
         except Exception as e:
             logging.error(f"Error saving achievements data: {e}")
     
+    def remove_misrouted_skills(self) -> int:
+        """One-off migration: drop skills created by misrouted callbacks, no-op once done"""
+        with self.write_lock:
+            records = {}
+            removed = 0
+            for user_id, user in self.load_users_data().items():
+                skills = {
+                    skill_key: skill for skill_key, skill in user.get("skills", {}).items()
+                    if not is_misrouted_skill(skill_key, skill)
+                }
+                if len(skills) < len(user.get("skills", {})):
+                    removed += len(user["skills"]) - len(skills)
+                    records[user_id] = {**user, "skills": skills, "updated_at": datetime.now().isoformat()}
+            
+            if records:
+                self.write_users(records)
+                logging.info(f"Removed {removed} misrouted skills of {len(records)} users")
+            return removed
+    
     def get_user(self, user_id: str) -> Dict[str, Any]:
         """Get user data or create new user"""
-        users = self.load_users_data()
-        if user_id not in users:
-            users[user_id] = {
-                "skills": {},
-                "total_points": 0,
-                "achievements": [],
-                "created_at": datetime.now().isoformat(),
-                "last_active": datetime.now().isoformat(),
-                "statistics": {
-                    "total_sessions": 0,
-                    "total_time_minutes": 0,
-                    "tips_received": 0,
-                    "motivations_received": 0
+        with self.write_lock:
+            user = self.get_store().get(user_id)
+            if user is None:
+                user = {
+                    "skills": {},
+                    "total_points": 0,
+                    "achievements": [],
+                    "created_at": datetime.now().isoformat(),
+                    "last_active": datetime.now().isoformat(),
+                    "updated_at": datetime.now().isoformat(),
+                    "activity_weeks": [get_period_keys(datetime.now())["week"]],
+                    "statistics": {
+                        "total_sessions": 0,
+                        "total_time_minutes": 0,
+                        "tips_received": 0,
+                        "motivations_received": 0
+                    }
                 }
-            }
-            self.save_users_data(users)
-        return users[user_id]
+                self.write_users({user_id: user})
+            elif any("id" not in skill for skill in user["skills"].values()):
+                # Skills added before buttons referred to IDs get them on first access
+                user = deepcopy(user)
+                for skill in user["skills"].values():
+                    if "id" not in skill:
+                        skill["id"] = new_skill_id(user)
+                self.write_users({user_id: user})
+            # Stored records are shared with snapshots, callers get their own copy
+            return deepcopy(user)
     
     def update_user(self, user_id: str, user_data: Dict[str, Any]):
         """Update user data"""
-        users = self.load_users_data()
-        users[user_id] = user_data
-        users[user_id]["last_active"] = datetime.now().isoformat()
-        self.save_users_data(users)
+        with self.write_lock:
+            user = deepcopy(user_data)
+            user["last_active"] = datetime.now().isoformat()
+            user["updated_at"] = user["last_active"]
+            
+            # Week history feeds cohort retention reports
+            week = get_period_keys(datetime.now())["week"]
+            activity_weeks = user.setdefault("activity_weeks", [])
+            if not activity_weeks or activity_weeks[-1] != week:
+                activity_weeks.append(week)
+            self.write_users({user_id: user})
+    
+    def write_users(self, records: Dict[str, Any], remove_ids: Iterable[str] = (), save: bool = True):
+        """Apply new user records to store and file, caller holds write lock
+        
+        With save=False the JSON file is left for a later save_users call,
+        so bulk writers save once instead of once per batch.
+        """
+        remove_ids = list(remove_ids)
+        store = self.get_store()
+        if self.database:
+            self.database.write(records, remove_ids)
+            store.apply(records, remove_ids)
+        else:
+            store.apply(records, remove_ids)
+            if save:
+                self.save_users_data(store.to_dict())
+        self.record_removed_users(remove_ids)
+        self.reindex_users(records, remove_ids)
+    
+    def save_users(self):
+        """Save users written with save=False"""
+        with self.write_lock:
+            if not self.database:
+                self.save_users_data(self.get_store().to_dict())
+    
+    def reindex_users(self, records: Dict[str, Any], remove_ids: Iterable[str] = ()):
+        """Keep built indexes in sync with written and removed users
+        
+        Handlers read indexes without locks, so writes made in other threads
+        (restore jobs) hand the update over to the event loop.
+        """
+        loop = _index_loops.get(self.users_file)
+        if loop is not None and not self.is_loop_thread(loop):
+            try:
+                loop.call_soon_threadsafe(self.reindex_from_store, list(records) + list(remove_ids))
+                return
+            except RuntimeError:
+                # Loop is closed, nobody reads the indexes any more
+                pass
+        
+        for user_id, user in records.items():
+            self.reindex_user(user_id, user)
+        for user_id in remove_ids:
+            self.index.remove(user_id)
+            if self.search_index.built:
+                self.search_index.remove(user_id)
+    
+    @staticmethod
+    def is_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+        """True if called from code running on loop"""
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+    
+    def reindex_from_store(self, user_ids: List[str]):
+        """Reindex users from their current records, runs on event loop
+        
+        Reading the store instead of the handed over records keeps a later
+        write made on the loop meanwhile from being overwritten.
+        """
+        for user_id in user_ids:
+            user = self.store.get(user_id)
+            if user is not None:
+                self.reindex_user(user_id, user)
+            else:
+                self.index.remove(user_id)
+                if self.search_index.built:
+                    self.search_index.remove(user_id)
+    
+    def bind_index_loop(self):
+        """Remember event loop of handlers reading indexes"""
+        try:
+            _index_loops[self.users_file] = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+    
+    def get_index(self) -> UserIndex:
+        """Get user indexes, built with a single scan on first use"""
+        self.bind_index_loop()
+        self.index.ensure_built(self.load_users_data)
+        return self.index
+    
+    def get_search_index(self) -> UserSearchIndex:
+        """Get user search index, built with a single scan on first use"""
+        self.bind_index_loop()
+        self.search_index.ensure_built(self.load_users_data)
+        return self.search_index
+    
+    def reindex_user(self, user_id: str, user_data: Dict[str, Any]):
+        """Keep built indexes in sync with written user"""
+        if self.index.built:
+            self.index.update(user_id, user_data)
+        if self.search_index.built:
+            self.search_index.update(user_id, user_data)
+    
+    def update_profile(self, user_id: str, profile: Dict[str, Optional[str]]) -> bool:
+        """Store Telegram profile fields if they changed, False if user does not exist yet"""
+        with self.write_lock:
+            user = self.get_store().get(user_id)
+            if user is None:
+                return False
+            if all(user.get(field) == value for field, value in profile.items()):
+                return True
+            
+            user = {**user, **profile, "updated_at": datetime.now().isoformat()}
+            self.write_users({user_id: user})
+            return True
+    
+    def mark_users_blocked(self, user_ids: List[str]):
+        """Mark users who blocked the bot in a single write"""
+        if not user_ids:
+            return
+        
+        with self.write_lock:
+            store = self.get_store()
+            fields = {"blocked": True, "updated_at": datetime.now().isoformat()}
+            if self.database:
+                # Users belong to other workers too, their rows are merged in the
+                # database instead of overwritten with this worker's copies
+                records = self.database.update_fields(user_ids, fields)
+                store.apply(records)
+                self.reindex_users(records)
+                return
+            
+            records = {
+                user_id: {**store.get(user_id), **fields}
+                for user_id in user_ids if store.get(user_id) is not None
+            }
+            self.write_users(records)
+    
+    def write_users_batch(self, batch: Dict[str, Any], remove_ids: Iterable[str] = (), save: bool = True):
+        """Write many users and remove others in a single save"""
+        with self.write_lock:
+            self.write_users(batch, list(remove_ids), save)
     
     def add_skill(self, user_id: str, skill_name: str, category: str):
         """Add a new skill for user"""
@@ -91,6 +416,7 @@ class DataManager:
         
         if skill_key not in user["skills"]:
             user["skills"][skill_key] = {
+                "id": new_skill_id(user),
                 "name": skill_name,
                 "category": category,
                 "created_at": datetime.now().isoformat(),
@@ -0,0 +1,441 @@
+import argparse
+import asyncio
+import csv
+import glob
+import gzip
+import io
+import json
+import os
+import logging
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Iterator, Mapping, Tuple, List, Optional
+
+from config import (
+    EXPORTS_DIR, EXPORTS_KEEP, EXPORT_WATERMARK_OVERLAP_SECONDS, ACHIEVEMENTS_CONFIG,
+    USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE
+)
+from utils.data_manager import DataManager
+
+logger = logging.getLogger(__name__)
+
+def encode(value: Any) -> str:
+    """Compact JSON encoding used in exports"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def get_updated_at(user: Dict[str, Any]) -> str:
+    """Last modification time of user record"""
+    return user.get("updated_at") or user.get("last_active") or user.get("created_at") or ""
+
+def open_export(path: str, mode: str = 'rt'):
+    """Open plain or gzip compressed export"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def read_export_header(path: str) -> Dict[str, Any]:
+    """Read metadata written before users block"""
+    header = {}
+    with open_export(path) as f:
+        for line in f:
+            line = line.strip().lstrip("{").rstrip(",")
+            if not line or line.startswith('"users"'):
+                break
+            header.update(json.loads("{" + line + "}"))
+    return header
+
+def iter_export_users(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream users from export written by ExportManager"""
+    with open_export(path) as f:
+        in_users = False
+        for line in f:
+            line = line.strip()
+            if not in_users:
+                in_users = line.startswith('"users":{')
+                continue
+            if line.startswith("}"):
+                return
+            user_id, user = next(iter(json.loads("{" + line.rstrip(",") + "}").items()))
+            yield user_id, user
+
+def read_export_footer(path: str) -> Dict[str, Any]:
+    """Read metadata written after users block"""
+    footer = {}
+    with open_export(path) as f:
+        stage = "header"
+        for line in f:
+            line = line.strip()
+            if stage == "header":
+                if line.startswith('"users":{'):
+                    stage = "users"
+            elif stage == "users":
+                if line.startswith("}"):
+                    stage = "footer"
+            elif line and line != "}":
+                footer.update(json.loads("{" + line.rstrip(",") + "}"))
+    return footer
+
+def apply_delta_changes(changes: Dict[str, Optional[Dict[str, Any]]], delta_path: str):
+    """Put users and tombstones (None) of delta into changes, later deltas win
+    
+    A user written after its removal was re-created, so a record newer
+    than the tombstone in the same delta is kept.
+    """
+    records = dict(iter_export_users(delta_path))
+    changes.update(records)
+    for user_id, removed_at in read_export_footer(delta_path).get("removed", {}).items():
+        record = records.get(user_id)
+        if record is None or get_updated_at(record) <= removed_at:
+            changes[user_id] = None
+
+def user_rows(user_id: str, user: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Single row per user"""
+    statistics = user.get("statistics", {})
+    yield {
+        "user_id": user_id,
+        "created_at": user.get("created_at"),
+        "last_active": user.get("last_active"),
+        "updated_at": get_updated_at(user),
+        "total_points": user.get("total_points", 0),
+        "skills": len(user.get("skills", {})),
+        "achievements": len(user.get("achievements", [])),
+        "total_sessions": statistics.get("total_sessions", 0),
+        "total_time_minutes": statistics.get("total_time_minutes", 0),
+        "tips_received": statistics.get("tips_received", 0),
+        "motivations_received": statistics.get("motivations_received", 0),
+        "blocked": bool(user.get("blocked"))
+    }
+
+def skill_rows(user_id: str, user: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Row per user skill"""
+    for skill_key, skill in user.get("skills", {}).items():
+        yield {
+            "user_id": user_id,
+            "skill_key": skill_key,
+            "name": skill.get("name"),
+            "category": skill.get("category"),
+            "created_at": skill.get("created_at"),
+            "total_time_minutes": skill.get("total_time_minutes", 0),
+            "sessions": skill.get("sessions", 0),
+            "streak": skill.get("streak", 0),
+            "best_streak": skill.get("best_streak", 0),
+            "last_session": skill.get("last_session"),
+            "goal_minutes": skill.get("goal_minutes", 0)
+        }
+
+def note_rows(user_id: str, user: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Row per session note"""
+    for skill_key, skill in user.get("skills", {}).items():
+        for note in skill.get("notes", []):
+            yield {
+                "user_id": user_id,
+                "skill_key": skill_key,
+                "date": note.get("date"),
+                "minutes": note.get("minutes", 0),
+                "note": note.get("note", "")
+            }
+
+def achievement_rows(user_id: str, user: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Row per earned achievement"""
+    for achievement_id in user.get("achievements", []):
+        achievement = ACHIEVEMENTS_CONFIG.get(achievement_id, {})
+        yield {
+            "user_id": user_id,
+            "achievement_id": achievement_id,
+            "name": achievement.get("name", achievement_id),
+            "points": achievement.get("points", 0)
+        }
+
+# Table name -> (columns, row generator)
+EXPORT_TABLES = {
+    "users": (
+        ["user_id", "created_at", "last_active", "updated_at", "total_points", "skills", "achievements",
+         "total_sessions", "total_time_minutes", "tips_received", "motivations_received", "blocked"],
+        user_rows
+    ),
+    "skills": (
+        ["user_id", "skill_key", "name", "category", "created_at", "total_time_minutes", "sessions",
+         "streak", "best_streak", "last_session", "goal_minutes"],
+        skill_rows
+    ),
+    "notes": (["user_id", "skill_key", "date", "minutes", "note"], note_rows),
+    "achievements": (["user_id", "achievement_id", "name", "points"], achievement_rows)
+}
+
+def iter_table_rows(users: Iterable[Tuple[str, Dict[str, Any]]], row_generator) -> Iterator[Dict[str, Any]]:
+    """Flatten users into table rows lazily"""
+    for user_id, user in users:
+        yield from row_generator(user_id, user)
+
+def write_table(f, rows: Iterator[Dict[str, Any]], columns: List[str], table_format: str) -> int:
+    """Write rows as NDJSON or CSV into text stream"""
+    count = 0
+    if table_format == "csv":
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            f.write(encode(row) + "\n")
+            count += 1
+    return count
+
+class ExportManager:
+    """Writes compressed data exports user by user"""
+    
+    def __init__(self, data_manager, export_dir: str = EXPORTS_DIR, keep: int = EXPORTS_KEEP):
+        self.data_manager = data_manager
+        self.export_dir = export_dir
+        self.keep = keep
+    
+    def make_path(self, prefix: str, extension: str = "json.gz") -> str:
+        """Get timestamped export file path"""
+        os.makedirs(self.export_dir, exist_ok=True)
+        # Microseconds keep files taken within one second apart, e.g. pre-restore and scheduled snapshots
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        return os.path.join(self.export_dir, f"{prefix}_{timestamp}.{extension}")
+    
+    def write_document(self, path: str, header: Dict[str, Any], users: Iterable[Tuple[str, Dict[str, Any]]],
+                       footer: Dict[str, Any]) -> int:
+        """Stream export document into gzip file, one user per line"""
+        tmp_path = f"{path}.tmp"
+        count = 0
+        
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write("{")
+            for key, value in header.items():
+                f.write(f"{encode(key)}:{encode(value)},\n")
+            
+            f.write('"users":{')
+            for user_id, user in users:
+                f.write(",\n" if count else "\n")
+                f.write(f"{encode(user_id)}:{encode(user)}")
+                count += 1
+            f.write("\n}")
+            
+            for key, value in footer.items():
+                f.write(f",\n{encode(key)}:{encode(value)}")
+            f.write("\n}\n")
+        
+        # Rename so unfinished exports are never picked up
+        os.replace(tmp_path, path)
+        return count
+    
+    def create_full_export(self, users_data: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Write full export of store snapshot, taken now if not given, blocking"""
+        path = self.make_path("bot_export")
+        if users_data is None:
+            users_data = self.data_manager.load_users_data()
+        # Changes made after snapshot was taken go to next delta
+        watermark = users_data.taken_at
+        header = {
+            "export_date": watermark,
+            "mode": "full",
+            "watermark": watermark,
+            "total_users": len(users_data)
+        }
+        footer = {"achievements": self.data_manager.load_achievements_data()}
+        
+        count = self.write_document(path, header, users_data.items(), footer)
+        self.rotate()
+        
+        return {"path": path, "users": count, "size": os.path.getsize(path)}
+    
+    def create_delta_export(self, since: Optional[str] = None,
+                            users_data: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Write users changed after watermark of previous export, scans store snapshot"""
+        since = since or self.get_last_watermark()
+        if not since:
+            raise ValueError("Нет предыдущего экспорта, сначала сделайте полный экспорт")
+        restored_at = self.data_manager.load_last_restore()
+        if restored_at and restored_at > since:
+            # Restored users keep updated_at of their export, a delta would leave them out
+            raise ValueError("После восстановления данных сначала сделайте полный экспорт")
+        
+        path = self.make_path("bot_delta")
+        if users_data is None:
+            users_data = self.data_manager.load_users_data()
+        watermark = users_data.taken_at
+        
+        # Small overlap covers writes that raced with previous export, applying twice is harmless
+        threshold = (datetime.fromisoformat(since) - timedelta(seconds=EXPORT_WATERMARK_OVERLAP_SECONDS)).isoformat()
+        changed = [
+            (user_id, user) for user_id, user in users_data.items()
+            if get_updated_at(user) > threshold
+        ]
+        del users_data
+        removed = {
+            user_id: removed_at for user_id, removed_at in self.data_manager.load_removed_users().items()
+            if removed_at > threshold
+        }
+        
+        header = {
+            "export_date": watermark,
+            "mode": "delta",
+            "since": since,
+            "watermark": watermark,
+            "total_users": len(changed),
+            "removed_users": len(removed)
+        }
+        
+        count = self.write_document(path, header, changed, {"removed": removed})
+        self.rotate()
+        
+        return {"path": path, "users": count, "removed": len(removed), "size": os.path.getsize(path), "since": since}
+    
+    def create_table_export(self, table_format: str = "ndjson",
+                            users_data: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Write one NDJSON/CSV file per entity of store snapshot into zip archive"""
+        if table_format not in ("ndjson", "csv"):
+            raise ValueError(f"Unknown table format: {table_format}")
+        
+        path = self.make_path(f"bot_tables_{table_format}", "zip")
+        tmp_path = f"{path}.tmp"
+        if users_data is None:
+            users_data = self.data_manager.load_users_data()
+        row_counts = {}
+        
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for table, (columns, row_generator) in EXPORT_TABLES.items():
+                # Zip members are written one at a time, each from its own row pipeline
+                with archive.open(f"{table}.{table_format}", 'w', force_zip64=True) as member:
+                    # BOM lets spreadsheets detect UTF-8 in CSV
+                    encoding = 'utf-8-sig' if table_format == "csv" else 'utf-8'
+                    with io.TextIOWrapper(member, encoding=encoding, newline='') as f:
+                        rows = iter_table_rows(users_data.items(), row_generator)
+                        row_counts[table] = write_table(f, rows, columns, table_format)
+        
+        os.replace(tmp_path, path)
+        self.rotate_pattern(f"bot_tables_{table_format}_*.zip")
+        
+        return {"path": path, "rows": row_counts, "size": os.path.getsize(path)}
+    
+    async def run_export(self, kind: str, *args: Any) -> Dict[str, Any]:
+        """Run full, delta or tables export of current store snapshot in worker thread
+        
+        The copy-on-write snapshot costs O(shards) to take and is streamed
+        as is, so exports hold no second copy of the users. Compression
+        releases the GIL, handlers keep running meanwhile.
+        """
+        users_data = self.data_manager.load_users_data()
+        if kind == "full":
+            return await asyncio.to_thread(self.create_full_export, users_data)
+        if kind == "delta":
+            return await asyncio.to_thread(self.create_delta_export, *args, users_data=users_data)
+        if kind == "tables":
+            return await asyncio.to_thread(self.create_table_export, *args, users_data=users_data)
+        raise ValueError(f"Unknown export kind: {kind}")
+    
+    def list_exports(self) -> List[str]:
+        """Full and delta exports, oldest first"""
+        paths = glob.glob(os.path.join(self.export_dir, "bot_export_*.json.gz"))
+        paths += glob.glob(os.path.join(self.export_dir, "bot_delta_*.json.gz"))
+        return sorted(paths, key=lambda path: os.path.basename(path).split("_", 2)[2])
+    
+    def get_last_watermark(self) -> Optional[str]:
+        """Watermark of newest export"""
+        exports = self.list_exports()
+        if not exports:
+            return None
+        return read_export_header(exports[-1]).get("watermark")
+    
+    def apply_deltas(self, base_path: str, delta_paths: List[str], output_path: str) -> Dict[str, Any]:
+        """Rebuild full export from base export and deltas applied in order"""
+        base_header = read_export_header(base_path)
+        watermark = base_header.get("watermark")
+        # User ID -> newest record, None for removed users
+        changes: Dict[str, Optional[Dict[str, Any]]] = {}
+        
+        for delta_path in delta_paths:
+            delta_header = read_export_header(delta_path)
+            if delta_header.get("since") != watermark:
+                raise ValueError(f"Delta {os.path.basename(delta_path)} does not continue previous export")
+            
+            # Deltas are small enough to keep in memory
+            apply_delta_changes(changes, delta_path)
+            watermark = delta_header["watermark"]
+        
+        def merged_users():
+            for user_id, user in iter_export_users(base_path):
+                user = changes.pop(user_id, user)
+                if user is not None:
+                    yield user_id, user
+            for user_id, user in changes.items():
+                if user is not None:
+                    yield user_id, user
+        
+        header = {
+            "export_date": datetime.now().isoformat(),
+            "mode": "full",
+            "watermark": watermark
+        }
+        footer = read_export_footer(base_path)
+        
+        count = self.write_document(output_path, header, merged_users(), footer)
+        return {"path": output_path, "users": count, "watermark": watermark}
+    
+    def get_latest_chain(self) -> Tuple[str, List[str]]:
+        """Newest full export and deltas written after it, oldest first"""
+        exports = self.list_exports()
+        bases = [path for path in exports if os.path.basename(path).startswith("bot_export_")]
+        if not bases:
+            raise ValueError("Нет полного экспорта, к которому можно применить изменения")
+        base = bases[-1]
+        return base, exports[exports.index(base) + 1:]
+    
+    def rebuild_full_export(self, output_path: Optional[str] = None) -> Dict[str, Any]:
+        """Full export of newest base with all later deltas applied"""
+        base, deltas = self.get_latest_chain()
+        result = self.apply_deltas(base, deltas, output_path or self.make_path("bot_export"))
+        result["deltas"] = len(deltas)
+        return result
+    
+    def rotate(self):
+        """Keep newest full exports and deltas that still have a base"""
+        self.rotate_pattern("bot_export_*.json.gz")
+        full_exports = sorted(glob.glob(os.path.join(self.export_dir, "bot_export_*.json.gz")))
+        
+        if not full_exports:
+            return
+        
+        oldest_base = os.path.basename(full_exports[0]).replace("bot_export_", "")
+        for path in glob.glob(os.path.join(self.export_dir, "bot_delta_*.json.gz")):
+            if os.path.basename(path).replace("bot_delta_", "") < oldest_base:
+                self.remove_export(path)
+    
+    def rotate_pattern(self, pattern: str):
+        """Keep newest files matching pattern"""
+        paths = sorted(glob.glob(os.path.join(self.export_dir, pattern)))
+        for path in paths[:-self.keep]:
+            self.remove_export(path)
+    
+    def remove_export(self, path: str):
+        """Delete export file"""
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Error removing old export {path}: {e}")
+
+def main(argv: Optional[list] = None):
+    """Command line: python -m utils.export rebuild [-o OUT] | apply BASE DELTA... -o OUT"""
+    parser = argparse.ArgumentParser(description="Rebuild full export from base export and deltas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="apply deltas kept in exports dir to newest full export")
+    rebuild_parser.add_argument("-o", "--output", help="output path, new bot_export_* in exports dir by default")
+    apply_parser = subparsers.add_parser("apply", help="apply given deltas in order to given base export")
+    apply_parser.add_argument("base", help="bot_export_*.json.gz file")
+    apply_parser.add_argument("deltas", nargs="+", help="bot_delta_*.json.gz files, oldest first")
+    apply_parser.add_argument("-o", "--output", required=True, help="output path")
+    args = parser.parse_args(argv)
+    
+    manager = ExportManager(DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE))
+    if args.command == "rebuild":
+        result = manager.rebuild_full_export(args.output)
+    else:
+        result = manager.apply_deltas(args.base, args.deltas, args.output)
+    print(f"Wrote {result['users']} users to {result['path']} (watermark {result['watermark']})")
+
+if __name__ == "__main__":
+    main()
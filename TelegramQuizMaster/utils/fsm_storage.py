@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, Dict, Optional, Set, Tuple, Union
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+from config import (
+    FSM_STATE_TTL_SECONDS, FSM_MAX_KEYS, FSM_FLUSH_SECONDS, FSM_PERSIST, FSM_STATES_FILE,
+    STORAGE_BACKEND, USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE
+)
+from utils.user_db import UserDatabase
+
+logger = logging.getLogger(__name__)
+
+# Saved form of one key: state, data, time of last write
+SavedState = Tuple[Optional[str], Dict[str, Any], float]
+
+class JsonStatePersistence:
+    """FSM states in a JSON file, for the json users backend"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.saved: Dict[str, SavedState] = {}
+    
+    def load(self) -> Dict[str, SavedState]:
+        """Read saved states"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            raw = {}
+        except json.JSONDecodeError as e:
+            logger.error(f"Error loading FSM states: {e}")
+            raw = {}
+        self.saved = {key: (value["state"], value["data"], value["updated_at"]) for key, value in raw.items()}
+        return dict(self.saved)
+    
+    def write(self, records: Dict[str, SavedState], removed: Dict[str, float]):
+        """Rewrite file with changed states, one process owns it"""
+        for key in removed:
+            self.saved.pop(key, None)
+        self.saved.update(records)
+        
+        raw = {
+            key: {"state": state, "data": data, "updated_at": updated_at}
+            for key, (state, data, updated_at) in self.saved.items()
+        }
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+class SqliteStatePersistence:
+    """FSM states in the users database, shared by bot workers"""
+    
+    def __init__(self, database: UserDatabase):
+        self.database = database
+    
+    def load(self) -> Dict[str, SavedState]:
+        """Read saved states"""
+        return self.database.load_fsm_states()
+    
+    def write(self, records: Dict[str, SavedState], removed: Dict[str, float]):
+        """Upsert changed states and delete removed ones"""
+        self.database.write_fsm_states(records, removed)
+
+class _Record:
+    """State and data of one key"""
+    __slots__ = ("state", "data", "updated_at")
+    
+    def __init__(self, state: Optional[str], data: Dict[str, Any], updated_at: float):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+
+class ExpiringStorage(BaseStorage):
+    """In-memory FSM storage with TTL, size cap and batched persistence
+    
+    Keys live for ttl seconds after their last write, so abandoned flows go
+    away by themselves. Above max_keys the least recently written keys are
+    evicted. Keys are kept in write order, which makes both expiry and
+    eviction pop from the front. Changes are collected and written by one
+    background flush every flush_seconds, and on close.
+    """
+    
+    def __init__(self, ttl: float = FSM_STATE_TTL_SECONDS, max_keys: int = FSM_MAX_KEYS,
+                 persistence: Union[JsonStatePersistence, SqliteStatePersistence, None] = None,
+                 flush_seconds: float = FSM_FLUSH_SECONDS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.persistence = persistence
+        self.flush_seconds = flush_seconds
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.records: "OrderedDict[str, _Record]" = OrderedDict()
+        
+        # Keys to save and keys to delete (with write time they were removed at)
+        self.dirty: Set[str] = set()
+        self.removed: Dict[str, float] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+        
+        self.expired = 0
+        self.evicted = 0
+        self.flushes = 0
+        
+        if persistence is not None:
+            self.load()
+    
+    def load(self):
+        """Restore saved states that have not expired yet"""
+        now = time.time()
+        saved = sorted(self.persistence.load().items(), key=lambda item: item[1][2])
+        for key, (state, data, updated_at) in saved:
+            if now - updated_at > self.ttl:
+                self.removed[key] = updated_at
+            else:
+                self.records[key] = _Record(state, data, updated_at)
+        self.sweep(now)
+        logger.info(f"Restored {len(self.records)} FSM states, dropped {len(self.removed)} old ones")
+    
+    def get_record(self, key: StorageKey) -> Optional[_Record]:
+        """Live record of key, expired ones are dropped on access"""
+        storage_key = self.key_builder.build(key)
+        record = self.records.get(storage_key)
+        if record is not None and time.time() - record.updated_at > self.ttl:
+            self.drop(storage_key)
+            self.expired += 1
+            return None
+        return record
+    
+    def drop(self, storage_key: str):
+        """Forget key here and in persistence"""
+        record = self.records.pop(storage_key)
+        self.dirty.discard(storage_key)
+        self.removed[storage_key] = record.updated_at
+    
+    def write(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        """Store state and data, empty ones remove the key"""
+        storage_key = self.key_builder.build(key)
+        now = time.time()
+        if state is None and not data:
+            if storage_key in self.records:
+                self.drop(storage_key)
+                self.schedule_flush()
+            return
+        
+        self.records[storage_key] = _Record(state, data, now)
+        self.records.move_to_end(storage_key)
+        self.dirty.add(storage_key)
+        self.removed.pop(storage_key, None)
+        self.sweep(now)
+        self.schedule_flush()
+    
+    def sweep(self, now: float) -> int:
+        """Drop expired keys and evict oldest ones above cap, returns how many"""
+        dropped = 0
+        while self.records:
+            storage_key, record = next(iter(self.records.items()))
+            if now - record.updated_at > self.ttl:
+                self.expired += 1
+            elif len(self.records) > self.max_keys:
+                self.evicted += 1
+            else:
+                break
+            self.drop(storage_key)
+            dropped += 1
+        return dropped
+    
+    def schedule_flush(self):
+        """Save changes soon, together with others made meanwhile"""
+        if self.persistence is None or (self.flush_task and not self.flush_task.done()):
+            return
+        self.flush_task = asyncio.create_task(self.flush_later())
+    
+    async def flush_later(self):
+        """Wait for more changes, then save"""
+        await asyncio.sleep(self.flush_seconds)
+        # Close cancels the wait, not a write already running in a thread
+        await asyncio.shield(self.flush())
+    
+    async def flush(self):
+        """Save collected changes"""
+        async with self.flush_lock:
+            await self.write_changes()
+    
+    async def write_changes(self):
+        """Save changes collected since last flush"""
+        if not self.dirty and not self.removed:
+            return
+        records = {}
+        for storage_key in self.dirty:
+            record = self.records[storage_key]
+            records[storage_key] = (record.state, deepcopy(record.data), record.updated_at)
+        removed = self.removed
+        self.dirty = set()
+        self.removed = {}
+        
+        try:
+            await asyncio.to_thread(self.persistence.write, records, removed)
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"Error saving FSM states: {e}")
+            # Retried with next flush unless written again meanwhile
+            for storage_key in records:
+                if storage_key in self.records:
+                    self.dirty.add(storage_key)
+            for storage_key, updated_at in removed.items():
+                if storage_key not in self.records:
+                    self.removed.setdefault(storage_key, updated_at)
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self.get_record(key)
+        state = state.state if isinstance(state, State) else state
+        self.write(key, state, record.data if record else {})
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self.get_record(key)
+        return record.state if record else None
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self.get_record(key)
+        self.write(key, record.state if record else None, data.copy())
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self.get_record(key)
+        return record.data.copy() if record else {}
+    
+    async def close(self) -> None:
+        """Save pending changes on shutdown"""
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+        if self.persistence is not None:
+            await self.flush()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Live keys by state, expiry and eviction counters"""
+        # Keys nobody writes to are otherwise only dropped when read
+        if self.sweep(time.time()):
+            self.schedule_flush()
+        
+        states: Dict[str, int] = {}
+        for record in self.records.values():
+            name = record.state or "none"
+            states[name] = states.get(name, 0) + 1
+        return {
+            "keys": len(self.records),
+            "states": states,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "pending_writes": len(self.dirty) + len(self.removed),
+            "flushes": self.flushes
+        }
+    
+    def format_metrics(self) -> str:
+        """Metrics in Prometheus text format"""
+        metrics = self.get_metrics()
+        lines = [
+            "# TYPE bot_fsm_keys gauge",
+            f"bot_fsm_keys {metrics['keys']}",
+            "# TYPE bot_fsm_state_keys gauge"
+        ]
+        for state, count in sorted(metrics["states"].items()):
+            lines.append(f'bot_fsm_state_keys{{state="{state}"}} {count}')
+        lines += [
+            "# TYPE bot_fsm_expired_total counter",
+            f"bot_fsm_expired_total {metrics['expired']}",
+            "# TYPE bot_fsm_evicted_total counter",
+            f"bot_fsm_evicted_total {metrics['evicted']}",
+            "# TYPE bot_fsm_pending_writes gauge",
+            f"bot_fsm_pending_writes {metrics['pending_writes']}"
+        ]
+        return "\n".join(lines) + "\n"
+
+def create_fsm_storage() -> ExpiringStorage:
+    """FSM storage persisted to the same backend as users, if enabled"""
+    from utils.data_manager import DataManager
+    
+    persistence = None
+    if FSM_PERSIST:
+        if STORAGE_BACKEND == "sqlite":
+            persistence = SqliteStatePersistence(DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE).database)
+        else:
+            persistence = JsonStatePersistence(FSM_STATES_FILE)
+    return ExpiringStorage(persistence=persistence)
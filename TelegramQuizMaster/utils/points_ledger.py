@@ -0,0 +1,303 @@
+import json
+import os
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Optional, Iterator
+
+from config import POINTS_TOTALS_CHECKPOINT_ENTRIES
+
+try:
+    import fcntl
+except ImportError:  # Windows, only single-process runs are supported there
+    fcntl = None
+
+PERIOD_GRANULARITIES = ("day", "week", "month")
+
+# Points earned before the ledger existed, their real dates are unknown
+BACKFILL_SOURCE = "backfill"
+
+# One ledger per file and process, shared by all achievement managers
+_ledgers: Dict[str, "PointsLedger"] = {}
+
+def get_points_ledger(ledger_file: str, totals_file: str) -> "PointsLedger":
+    """Get shared ledger for ledger file"""
+    if ledger_file not in _ledgers:
+        _ledgers[ledger_file] = PointsLedger(ledger_file, totals_file)
+    return _ledgers[ledger_file]
+
+def get_period_keys(timestamp: datetime) -> Dict[str, str]:
+    """Get day/week/month period keys for timestamp"""
+    iso_year, iso_week, _ = timestamp.isocalendar()
+    return {
+        "day": timestamp.strftime("%Y-%m-%d"),
+        "week": f"{iso_year}-W{iso_week:02d}",
+        "month": timestamp.strftime("%Y-%m")
+    }
+
+class PointsLedger:
+    """Append-only points ledger with incrementally maintained totals
+    
+    Totals live in memory and follow the ledger: before every read and
+    append the lines written since last time (by this or another worker)
+    are applied. The totals file is only a checkpoint with the ledger
+    offset it covers, saved every checkpoint_entries entries; on start
+    the ledger tail after the checkpoint is replayed, so a crash between
+    append and checkpoint loses nothing.
+    """
+    
+    def __init__(self, ledger_file: str, totals_file: str,
+                 checkpoint_entries: int = POINTS_TOTALS_CHECKPOINT_ENTRIES):
+        self.ledger_file = ledger_file
+        self.totals_file = totals_file
+        self.checkpoint_entries = checkpoint_entries
+        self.totals = self.empty_totals()
+        # Bytes of ledger applied to totals, entries applied since last checkpoint
+        self.offset = 0
+        self.unsaved = 0
+        self.initialize_files()
+    
+    def initialize_files(self):
+        """Create ledger file and bring totals up to date with it"""
+        os.makedirs(os.path.dirname(self.ledger_file) or ".", exist_ok=True)
+        
+        if not os.path.exists(self.ledger_file):
+            open(self.ledger_file, 'a', encoding='utf-8').close()
+        
+        with self.locked():
+            self.load_checkpoint()
+            self.catch_up()
+            if self.unsaved:
+                logging.info(f"Replayed {self.unsaved} points ledger entries after checkpoint")
+                self.save_totals()
+    
+    @contextmanager
+    def locked(self):
+        """Exclusive access to ledger across bot worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.ledger_file}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def empty_totals(self) -> Dict[str, Any]:
+        """Get empty totals structure"""
+        return {
+            "entries": 0,
+            "backfilled": False,
+            "users": {},
+            "periods": {granularity: {} for granularity in PERIOD_GRANULARITIES}
+        }
+    
+    def load_checkpoint(self):
+        """Load totals and the ledger offset they cover, start over if missing"""
+        try:
+            with open(self.totals_file, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            self.offset = checkpoint.pop("offset")
+            self.totals = checkpoint
+        except FileNotFoundError:
+            self.reset_totals()
+        except (json.JSONDecodeError, KeyError) as e:
+            logging.error(f"Error loading points totals, rebuilding from ledger: {e}")
+            self.reset_totals()
+    
+    def reset_totals(self):
+        """Forget totals, next catch up rebuilds them from the whole ledger"""
+        self.totals = self.empty_totals()
+        self.offset = 0
+    
+    def save_totals(self):
+        """Save totals checkpoint atomically"""
+        tmp_file = f"{self.totals_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(dict(self.totals, offset=self.offset), f, ensure_ascii=False)
+            os.replace(tmp_file, self.totals_file)
+            self.unsaved = 0
+        except Exception as e:
+            logging.error(f"Error saving points totals: {e}")
+    
+    def catch_up(self):
+        """Apply ledger lines written since last call"""
+        try:
+            size = os.path.getsize(self.ledger_file)
+        except FileNotFoundError:
+            return
+        if size < self.offset:
+            logging.warning("Points ledger is shorter than its totals checkpoint, rebuilding totals")
+            self.reset_totals()
+        if size == self.offset:
+            return
+        
+        with open(self.ledger_file, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                # Line still being appended by another process
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.error(f"Skipping broken points ledger line: {e}")
+                    continue
+                self.apply_to_totals(self.totals, entry)
+                self.unsaved += 1
+    
+    def apply_to_totals(self, totals: Dict[str, Any], entry: Dict[str, Any]):
+        """Apply single ledger entry to totals in place"""
+        user_id = entry["user_id"]
+        amount = entry["amount"]
+        totals["entries"] = max(totals.get("entries", 0), entry["id"])
+        totals["users"][user_id] = totals["users"].get(user_id, 0) + amount
+        
+        # Backfilled points count for all time, but were not earned in any known period
+        if entry["source"] == BACKFILL_SOURCE:
+            totals["backfilled"] = True
+            return
+        
+        period_keys = get_period_keys(datetime.fromisoformat(entry["timestamp"]))
+        for granularity, period_key in period_keys.items():
+            period = totals["periods"][granularity].setdefault(period_key, {})
+            period[user_id] = period.get(user_id, 0) + amount
+    
+    def add_entry(self, user_id: str, source: str, amount: int,
+                  timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+        """Append entry to the ledger and update totals"""
+        return self.add_entries([(user_id, source, amount)], timestamp)[0]
+    
+    def add_entries(self, items: List[Tuple[str, str, int]],
+                    timestamp: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Append several entries with a single ledger write"""
+        if not items:
+            return []
+        
+        timestamp = timestamp or datetime.now()
+        with self.locked():
+            return self.append_locked([
+                (user_id, source, amount, timestamp) for user_id, source, amount in items
+            ])
+    
+    def append_locked(self, items: List[Tuple[str, str, int, datetime]]) -> List[Dict[str, Any]]:
+        """Append entries with their own timestamps, caller holds the lock"""
+        # Entry IDs continue after entries other workers appended meanwhile
+        self.catch_up()
+        next_id = self.totals.get("entries", 0) + 1
+        entries = [
+            {
+                "id": next_id + i,
+                "user_id": str(user_id),
+                "source": source,
+                "amount": amount,
+                "timestamp": timestamp.isoformat()
+            }
+            for i, (user_id, source, amount, timestamp) in enumerate(items)
+        ]
+        
+        try:
+            with open(self.ledger_file, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        except Exception as e:
+            logging.error(f"Error writing points ledger: {e}")
+            return []
+        
+        self.catch_up()
+        if self.unsaved >= self.checkpoint_entries:
+            self.save_totals()
+        return entries
+    
+    def iter_entries(self, user_id: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """Stream ledger entries, optionally filtered by user and time range"""
+        since_text = since.isoformat() if since else None
+        until_text = until.isoformat() if until else None
+        
+        try:
+            with open(self.ledger_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        logging.error(f"Skipping broken points ledger line: {e}")
+                        continue
+                    
+                    if user_id is not None and entry["user_id"] != str(user_id):
+                        continue
+                    if since_text and entry["timestamp"] < since_text:
+                        continue
+                    if until_text and entry["timestamp"] >= until_text:
+                        continue
+                    yield entry
+        except FileNotFoundError:
+            return
+    
+    def load_totals(self) -> Dict[str, Any]:
+        """Get current totals, read-only"""
+        self.catch_up()
+        return self.totals
+    
+    def get_user_total(self, user_id: str) -> int:
+        """Get total points of user"""
+        return self.load_totals()["users"].get(str(user_id), 0)
+    
+    def get_period_totals(self, granularity: str, period_key: str) -> Dict[str, int]:
+        """Get per-user totals for a single period"""
+        return self.load_totals()["periods"].get(granularity, {}).get(period_key, {})
+    
+    def get_points_over_time(self, user_id: str, granularity: str = "day") -> List[Tuple[str, int]]:
+        """Get user points per period, oldest first"""
+        periods = self.load_totals()["periods"].get(granularity, {})
+        user_id = str(user_id)
+        return [
+            (period_key, period[user_id])
+            for period_key, period in sorted(periods.items())
+            if user_id in period
+        ]
+    
+    def get_leaderboard(self, limit: int = 10, granularity: Optional[str] = None,
+                        period_key: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Get top users by points, for all time or for a period"""
+        if granularity:
+            if period_key is None:
+                period_key = get_period_keys(datetime.now())[granularity]
+            scores = self.get_period_totals(granularity, period_key)
+        else:
+            scores = self.load_totals()["users"]
+        
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+    
+    def backfill_from_users(self, users_data: Dict[str, Any]) -> int:
+        """Record points earned before the ledger existed, once
+        
+        Run before workers handle updates. Missing points are computed
+        under the ledger lock, so a concurrent run adds nothing twice.
+        Entries are dated at user registration and kept out of period totals.
+        """
+        with self.locked():
+            self.catch_up()
+            if self.totals.get("backfilled"):
+                return 0
+            
+            items = []
+            for user_id, user in users_data.items():
+                missing = user.get("total_points", 0) - self.totals["users"].get(user_id, 0)
+                if missing > 0:
+                    created_at = user.get("created_at")
+                    timestamp = datetime.fromisoformat(created_at) if created_at else datetime.now()
+                    items.append((user_id, BACKFILL_SOURCE, missing, timestamp))
+            
+            if items:
+                self.append_locked(items)
+            # Also marks ledgers that had nothing to backfill
+            self.totals["backfilled"] = True
+            self.save_totals()
+        return len(items)
@@ -0,0 +1,117 @@
+import asyncio
+import multiprocessing
+import time
+from typing import Optional
+
+class TokenBucket:
+    """Asyncio token bucket rate limiter"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        """Add tokens earned since last refill"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+    
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for given time (e.g. after flood control)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.updated_at = self.blocked_until
+        self.tokens = 0
+    
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until tokens are available, 0 if they are now"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        return max(0.0, (tokens - self.tokens) / self.rate)
+    
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens without waiting, return False if not enough"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return False
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+    
+    async def acquire(self, tokens: float = 1):
+        """Wait until tokens are available and take them"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket kept in shared memory, one limit for several processes
+    
+    Create before starting worker processes and pass it to them; the
+    monotonic clock is system-wide, so every process refills alike.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None, context=multiprocessing):
+        # Tokens, last refill and end of block, guarded by the array's lock
+        self.state = context.Array('d', 3)
+        super().__init__(rate, capacity)
+    
+    @property
+    def tokens(self) -> float:
+        return self.state[0]
+    
+    @tokens.setter
+    def tokens(self, value: float):
+        self.state[0] = value
+    
+    @property
+    def updated_at(self) -> float:
+        return self.state[1]
+    
+    @updated_at.setter
+    def updated_at(self, value: float):
+        self.state[1] = value
+    
+    @property
+    def blocked_until(self) -> float:
+        return self.state[2]
+    
+    @blocked_until.setter
+    def blocked_until(self, value: float):
+        self.state[2] = value
+    
+    def block_for(self, seconds: float):
+        with self.state.get_lock():
+            super().block_for(seconds)
+    
+    def wait_time(self, tokens: float = 1) -> float:
+        with self.state.get_lock():
+            return super().wait_time(tokens)
+    
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self.state.get_lock():
+            return super().try_acquire(tokens)
+    
+    async def acquire(self, tokens: float = 1):
+        """Wait until tokens are available and take them, other processes may take them first"""
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.wait_time(tokens))
@@ -0,0 +1,195 @@
+import os
+import sys
+import platform
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from config import ACHIEVEMENTS_CONFIG
+
+def get_file_size_kb(path: str) -> float:
+    """File size in KB, 0 for missing file"""
+    try:
+        return os.path.getsize(path) / 1024
+    except OSError:
+        return 0.0
+
+def build_bot_stats(users_data: Dict[str, Any]) -> str:
+    """Bot statistics report"""
+    total_users = len(users_data)
+    total_skills = sum(len(user["skills"]) for user in users_data.values())
+    total_sessions = sum(user["statistics"]["total_sessions"] for user in users_data.values())
+    total_minutes = sum(user["statistics"]["total_time_minutes"] for user in users_data.values())
+    total_hours = total_minutes // 60
+    
+    # Active users (with activity in last 7 days)
+    week_ago = datetime.now() - timedelta(days=7)
+    active_users = 0
+    
+    for user in users_data.values():
+        if user.get("last_active"):
+            last_active = datetime.fromisoformat(user["last_active"])
+            if last_active > week_ago:
+                active_users += 1
+    
+    # Popular skills
+    skill_counts = {}
+    for user in users_data.values():
+        for skill_key, skill_data in user["skills"].items():
+            category = skill_data.get("category", "Другое")
+            skill_counts[category] = skill_counts.get(category, 0) + 1
+    
+    popular_categories = sorted(skill_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    
+    text = (
+        f"📊 **Статистика бота**\n\n"
+        f"👥 Всего пользователей: {total_users}\n"
+        f"🟢 Активных за неделю: {active_users}\n"
+        f"🎯 Всего навыков: {total_skills}\n"
+        f"📈 Всего сессий: {total_sessions}\n"
+        f"⏰ Общее время: {total_hours}ч {total_minutes % 60}м\n\n"
+        f"🏆 **Популярные категории:**\n"
+    )
+    
+    for category, count in popular_categories:
+        text += f"• {category}: {count}\n"
+    
+    if total_users > 0:
+        avg_skills = total_skills / total_users
+        avg_sessions = total_sessions / total_users
+        text += "\n📊 **Среднее на пользователя:**\n"
+        text += f"• Навыков: {avg_skills:.1f}\n"
+        text += f"• Сессий: {avg_sessions:.1f}"
+    
+    return text
+
+def build_top_users(users_data: Dict[str, Any]) -> str:
+    """Top users by practice time report"""
+    # Sort users by total time
+    sorted_users = sorted(
+        users_data.items(),
+        key=lambda x: x[1]["statistics"]["total_time_minutes"],
+        reverse=True
+    )[:10]
+    
+    text = "🏆 **Топ-10 пользователей по времени:**\n\n"
+    
+    for i, (user_id_str, user_data) in enumerate(sorted_users, 1):
+        total_minutes = user_data["statistics"]["total_time_minutes"]
+        hours = total_minutes // 60
+        mins = total_minutes % 60
+        skills_count = len(user_data["skills"])
+        
+        time_text = f"{hours}ч {mins}м" if hours > 0 else f"{mins}м"
+        text += f"{i}. ID {user_id_str}\n"
+        text += f"   ⏰ {time_text} • 🎯 {skills_count} навыков\n"
+        text += f"   📊 {user_data['statistics']['total_sessions']} сессий\n\n"
+    
+    if not sorted_users:
+        text += "Пока нет активных пользователей."
+    
+    return text
+
+def build_activity_stats(users_data: Dict[str, Any]) -> str:
+    """Activity and retention report"""
+    # Activity by periods
+    now = datetime.now()
+    day_ago = now - timedelta(days=1)
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+    
+    active_today = 0
+    active_week = 0
+    active_month = 0
+    
+    for user in users_data.values():
+        if user.get("last_active"):
+            last_active = datetime.fromisoformat(user["last_active"])
+            
+            if last_active > day_ago:
+                active_today += 1
+            if last_active > week_ago:
+                active_week += 1
+            if last_active > month_ago:
+                active_month += 1
+    
+    # Sessions by period
+    sessions_today = 0
+    sessions_week = 0
+    
+    for user in users_data.values():
+        for skill in user["skills"].values():
+            if skill.get("last_session"):
+                last_session = datetime.fromisoformat(skill["last_session"])
+                
+                if last_session > day_ago:
+                    sessions_today += 1
+                if last_session > week_ago:
+                    sessions_week += 1
+    
+    text = (
+        f"📈 **Активность пользователей**\n\n"
+        f"🟢 **Активные пользователи:**\n"
+        f"• Сегодня: {active_today}\n"
+        f"• За неделю: {active_week}\n"
+        f"• За месяц: {active_month}\n\n"
+        f"📊 **Сессии практики:**\n"
+        f"• Сегодня: {sessions_today}\n"
+        f"• За неделю: {sessions_week}\n"
+    )
+    
+    total_users = len(users_data)
+    if total_users > 0:
+        retention_week = (active_week / total_users) * 100
+        retention_month = (active_month / total_users) * 100
+        
+        text += "\n📊 **Удержание:**\n"
+        text += f"• Неделя: {retention_week:.1f}%\n"
+        text += f"• Месяц: {retention_month:.1f}%"
+    
+    return text
+
+def build_achievement_stats(users_data: Dict[str, Any], total_points: int) -> str:
+    """Achievement statistics report"""
+    # Count achievements
+    achievement_counts = {}
+    
+    for user in users_data.values():
+        user_achievements = user.get("achievements", [])
+        
+        for ach_id in user_achievements:
+            achievement_counts[ach_id] = achievement_counts.get(ach_id, 0) + 1
+    
+    text = "🏆 **Статистика достижений**\n\n"
+    text += f"💎 Всего очков: {total_points}\n\n"
+    
+    # Sort achievements by popularity
+    sorted_achievements = sorted(achievement_counts.items(), key=lambda x: x[1], reverse=True)
+    
+    for ach_id, count in sorted_achievements:
+        if ach_id in ACHIEVEMENTS_CONFIG:
+            ach = ACHIEVEMENTS_CONFIG[ach_id]
+            percentage = (count / len(users_data)) * 100 if users_data else 0
+            text += f"🏆 {ach['name']}: {count} ({percentage:.1f}%)\n"
+    
+    if not achievement_counts:
+        text += "Пока никто не получил достижения."
+    
+    return text
+
+def build_system_info(users_data: Dict[str, Any], users_file: str, achievements_file: str) -> str:
+    """System information report"""
+    text = (
+        f"📊 **Системная информация**\n\n"
+        f"🤖 **Бот:**\n"
+        f"• Версия Python: {sys.version.split()[0]}\n"
+        f"• Платформа: {platform.system()} {platform.release()}\n"
+        f"• Время работы: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n\n"
+        f"📈 **Данные:**\n"
+        f"• Пользователей: {len(users_data)}\n"
+        f"• Размер данных: {get_file_size_kb(users_file):.1f} КБ\n\n"
+        f"💾 **Файлы:**\n"
+        f"• users.json: {'✅ Существует' if os.path.exists(users_file) else '❌ Отсутствует'}\n"
+        f"• achievements.json: {'✅ Существует' if os.path.exists(achievements_file) else '❌ Отсутствует'}"
+    )
+    
+    return text
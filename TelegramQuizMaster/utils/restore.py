@@ -0,0 +1,209 @@
+import argparse
+import json
+import time
+from typing import Dict, Any, Iterator, Tuple, Optional
+
+from config import USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE, RESTORE_BATCH_SIZE
+from utils.export import open_export, get_updated_at, read_export_header, read_export_footer
+
+class StreamingJSONReader:
+    """Incremental JSON reader that parses one value at a time from a text stream"""
+    
+    def __init__(self, f, chunk_size: int = 64 * 1024):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+    
+    def fill(self) -> bool:
+        """Read next chunk, dropping consumed part of buffer"""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+    
+    def expect(self, char: str):
+        """Consume expected structural character"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in export, got '{found or 'EOF'}'")
+        self.pos += 1
+    
+    def value(self) -> Any:
+        """Decode next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            
+            # Number at the very end of buffer may continue in next chunk
+            if end == len(self.buffer) and not self.eof and self.fill():
+                continue
+            
+            self.pos = end
+            return value
+    
+    def iter_object(self) -> Iterator[str]:
+        """Yield object keys, caller must consume each value"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            
+            separator = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' in export, got '{separator or 'EOF'}'")
+
+def iter_users_from_export(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream users from any export file, plain or gzip, pretty printed or compact"""
+    with open_export(path) as f:
+        reader = StreamingJSONReader(f)
+        for key in reader.iter_object():
+            if key == "users":
+                for user_id in reader.iter_object():
+                    yield user_id, reader.value()
+            else:
+                reader.value()
+
+class RestoreManager:
+    """Loads users from export files into storage in batches"""
+    
+    def __init__(self, data_manager, batch_size: int = RESTORE_BATCH_SIZE):
+        self.data_manager = data_manager
+        self.batch_size = batch_size
+    
+    def restore(self, path: str, mode: str = "merge", dry_run: bool = False) -> Dict[str, Any]:
+        """Restore users from export
+        
+        merge   - add missing users, overwrite existing ones only with newer records
+        replace - storage ends up with exactly the users from export
+        
+        Restored records keep their updated_at, so the next export after a
+        restore that changed users has to be a full one.
+        
+        A delta export holds only changed users, so it can only be merged;
+        users it lists as removed are removed unless changed since.
+        """
+        if mode not in ("merge", "replace"):
+            raise ValueError(f"Unknown restore mode: {mode}")
+        
+        # Header check is cheap, gzip exports of any mode start with it
+        is_delta = read_export_header(path).get("mode") == "delta"
+        if is_delta and mode == "replace":
+            raise ValueError(
+                "Это файл изменений (delta): замена удалила бы всех, кого в нем нет. "
+                "Используйте объединение или соберите полный экспорт: python -m utils.export rebuild"
+            )
+        tombstones = read_export_footer(path).get("removed", {}) if is_delta else {}
+        
+        started = time.monotonic()
+        existing = {
+            user_id: get_updated_at(user)
+            for user_id, user in self.data_manager.load_users_data().items()
+        }
+        report = {"mode": mode, "dry_run": dry_run, "read": 0, "added": 0, "updated": 0,
+                  "skipped": 0, "removed": 0, "batches": 0}
+        seen = set()
+        batch = {}
+        
+        for user_id, user in iter_users_from_export(path):
+            report["read"] += 1
+            seen.add(user_id)
+            
+            if user_id in tombstones and get_updated_at(user) <= tombstones[user_id]:
+                # Removed later in the same delta
+                seen.discard(user_id)
+                report["skipped"] += 1
+                continue
+            if user_id not in existing:
+                report["added"] += 1
+            elif mode == "replace" or get_updated_at(user) > existing[user_id]:
+                report["updated"] += 1
+            else:
+                report["skipped"] += 1
+                continue
+            
+            batch[user_id] = user
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch, report, dry_run)
+                batch = {}
+        
+        if mode == "replace":
+            removed = [user_id for user_id in existing if user_id not in seen]
+        else:
+            removed = [
+                user_id for user_id, removed_at in tombstones.items()
+                if user_id in existing and user_id not in seen and existing[user_id] <= removed_at
+            ]
+        report["removed"] = len(removed)
+        if batch or removed:
+            self.write_batch(batch, report, dry_run, removed)
+        # JSON file is written once for the whole restore, not per batch
+        if not dry_run:
+            self.data_manager.save_users()
+            if report["added"] or report["updated"] or report["removed"]:
+                self.data_manager.record_restore()
+        
+        report["seconds"] = time.monotonic() - started
+        report["rate"] = report["read"] / report["seconds"] if report["seconds"] > 0 else 0.0
+        return report
+    
+    def write_batch(self, batch: Dict[str, Any], report: Dict[str, Any], dry_run: bool, remove_ids=()):
+        """Write single batch unless dry run"""
+        report["batches"] += 1
+        if not dry_run:
+            self.data_manager.write_users_batch(batch, remove_ids, save=False)
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Plain text restore report"""
+    return (
+        f"{'Dry run' if report['dry_run'] else 'Restore'} ({report['mode']}): "
+        f"read {report['read']}, added {report['added']}, updated {report['updated']}, "
+        f"skipped {report['skipped']}, removed {report['removed']} "
+        f"in {report['batches']} batches, {report['seconds']:.2f}s ({report['rate']:.0f} users/s)"
+    )
+
+def main(argv: Optional[list] = None):
+    """Command line restore: python -m utils.restore EXPORT [--mode merge|replace] [--dry-run]"""
+    from utils.data_manager import DataManager
+    
+    parser = argparse.ArgumentParser(description="Restore users from bot export file")
+    parser.add_argument("path", help="bot_export_*.json or *.json.gz file")
+    parser.add_argument("--mode", choices=["merge", "replace"], default="merge")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    parser.add_argument("--batch-size", type=int, default=RESTORE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    
+    data_manager = DataManager(USERS_DATA_FILE, ACHIEVEMENTS_DATA_FILE)
+    restore_manager = RestoreManager(data_manager, args.batch_size)
+    print(format_report(restore_manager.restore(args.path, args.mode, args.dry_run)))
+
+if __name__ == "__main__":
+    main()
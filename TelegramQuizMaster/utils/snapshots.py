@@ -0,0 +1,161 @@
+import asyncio
+import glob
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Mapping, Optional
+
+from config import SNAPSHOTS_DIR, SNAPSHOT_INTERVAL_MINUTES, SNAPSHOTS_KEEP_RECENT, SNAPSHOTS_KEEP_DAILY
+from utils.export import ExportManager
+from utils.restore import RestoreManager
+
+logger = logging.getLogger(__name__)
+
+class SnapshotManager:
+    """Takes compressed point-in-time snapshots of users on schedule"""
+    
+    def __init__(self, data_manager, snapshot_dir: str = SNAPSHOTS_DIR,
+                 interval_minutes: int = SNAPSHOT_INTERVAL_MINUTES,
+                 keep_recent: int = SNAPSHOTS_KEEP_RECENT, keep_daily: int = SNAPSHOTS_KEEP_DAILY):
+        self.data_manager = data_manager
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval_minutes * 60
+        self.keep_recent = keep_recent
+        self.keep_daily = keep_daily
+        self.writer = ExportManager(data_manager, snapshot_dir)
+        self.task = None
+    
+    def create_snapshot(self, apply_retention: bool = True,
+                        users_data: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Write store snapshot, taken now if not given, blocking, meant to run in worker thread
+        
+        Streams the copy-on-write store snapshot, so no second copy of the
+        users is made however many there are.
+        """
+        started = time.monotonic()
+        path = self.writer.make_path("snapshot")
+        
+        # Consistent view of users, handlers keep writing meanwhile
+        if users_data is None:
+            users_data = self.data_manager.load_users_data()
+        taken_at = users_data.taken_at
+        
+        header = {
+            "export_date": taken_at,
+            "mode": "snapshot",
+            "watermark": taken_at,
+            "total_users": len(users_data)
+        }
+        footer = {"achievements": self.data_manager.load_achievements_data()}
+        count = self.writer.write_document(path, header, users_data.items(), footer)
+        del users_data
+        
+        if apply_retention:
+            self.apply_retention()
+        return {
+            "path": path,
+            "users": count,
+            "size": os.path.getsize(path),
+            "seconds": time.monotonic() - started
+        }
+    
+    async def take_snapshot(self) -> Dict[str, Any]:
+        """Write snapshot of current store in worker thread, compression never touches event loop"""
+        return await asyncio.to_thread(self.create_snapshot, users_data=self.data_manager.load_users_data())
+    
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshots, newest first"""
+        snapshots = []
+        for path in sorted(glob.glob(os.path.join(self.snapshot_dir, "snapshot_*.json.gz")), reverse=True):
+            stamp = self.get_stamp(path)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            snapshots.append({
+                "stamp": stamp,
+                "path": path,
+                "size": size,
+                "created_at": self.parse_stamp(stamp)
+            })
+        return snapshots
+    
+    def get_snapshot(self, stamp: str) -> Optional[Dict[str, Any]]:
+        """Find snapshot by timestamp"""
+        for snapshot in self.list_snapshots():
+            if snapshot["stamp"] == stamp:
+                return snapshot
+        return None
+    
+    @staticmethod
+    def get_stamp(path: str) -> str:
+        """Timestamp part of snapshot file name"""
+        return os.path.basename(path)[len("snapshot_"):-len(".json.gz")]
+    
+    @staticmethod
+    def parse_stamp(stamp: str) -> datetime:
+        """Time of snapshot, older snapshots have no microseconds in name"""
+        if stamp.count("_") == 2:
+            return datetime.strptime(stamp, "%Y%m%d_%H%M%S_%f")
+        return datetime.strptime(stamp, "%Y%m%d_%H%M%S")
+    
+    def apply_retention(self):
+        """Keep newest snapshots and the last snapshot of each recent day"""
+        snapshots = self.list_snapshots()
+        keep = {snapshot["path"] for snapshot in snapshots[:self.keep_recent]}
+        
+        days = set()
+        for snapshot in snapshots:
+            day = snapshot["stamp"][:8]
+            if day not in days and len(days) < self.keep_daily:
+                days.add(day)
+                keep.add(snapshot["path"])
+        
+        for snapshot in snapshots:
+            if snapshot["path"] not in keep:
+                self.writer.remove_export(snapshot["path"])
+    
+    def restore_snapshot(self, stamp: str) -> Dict[str, Any]:
+        """Replace users with snapshot contents, current state is snapshotted first"""
+        snapshot = self.get_snapshot(stamp)
+        if not snapshot:
+            raise ValueError("Снимок не найден")
+        
+        # Same streaming path as scheduled snapshots; retention runs after
+        # restore so it can't remove the snapshot being restored
+        self.create_snapshot(apply_retention=False)
+        report = RestoreManager(self.data_manager).restore(snapshot["path"], "replace")
+        self.apply_retention()
+        return report
+    
+    def seconds_until_due(self) -> float:
+        """Time left until next scheduled snapshot"""
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return 0
+        age = (datetime.now() - snapshots[0]["created_at"]).total_seconds()
+        return max(0, self.interval - age)
+    
+    async def run(self):
+        """Take snapshots on schedule"""
+        while True:
+            await asyncio.sleep(self.seconds_until_due())
+            try:
+                result = await self.take_snapshot()
+                logger.info(f"Snapshot {os.path.basename(result['path'])}: {result['users']} users "
+                            f"in {result['seconds']:.2f}s")
+            except Exception as e:
+                logger.error(f"Error creating snapshot: {e}")
+                await asyncio.sleep(self.interval)
+    
+    def start(self):
+        """Start scheduler in background task"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+    
+    async def shutdown(self):
+        """Stop scheduler"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
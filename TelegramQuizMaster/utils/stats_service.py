@@ -0,0 +1,101 @@
+import asyncio
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Mapping, Optional
+
+from config import STATS_REFRESH_MINUTES, POINTS_LEDGER_FILE, POINTS_TOTALS_FILE
+from utils.data_manager import DataManager
+from utils.points_ledger import get_points_ledger
+from utils.workers import run_in_process
+from utils.reports import (
+    build_bot_stats, build_top_users, build_activity_stats, build_achievement_stats, build_system_info
+)
+
+logger = logging.getLogger(__name__)
+
+STATS_REPORTS = ("stats", "top_users", "activity", "achievements", "system_info")
+
+def compute_reports_job(users_file: str, achievements_file: str, users_data: Mapping[str, Any],
+                        names) -> Dict[str, Dict[str, Any]]:
+    """Process pool entry point, rebuilds service from file paths and scans given snapshot"""
+    service = StatsService(DataManager(users_file, achievements_file), get_points_ledger(POINTS_LEDGER_FILE, POINTS_TOTALS_FILE))
+    return service.compute(names, users_data)
+
+class StatsService:
+    """Admin reports computed in background and served from cache"""
+    
+    def __init__(self, data_manager, points_ledger, refresh_minutes: int = STATS_REFRESH_MINUTES):
+        self.data_manager = data_manager
+        self.points_ledger = points_ledger
+        self.refresh_interval = refresh_minutes * 60
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.task = None
+        self._lock = asyncio.Lock()
+    
+    def build_report(self, name: str, users_data: Dict[str, Any]) -> str:
+        """Build text of single report"""
+        if name == "stats":
+            return build_bot_stats(users_data)
+        if name == "top_users":
+            return build_top_users(users_data)
+        if name == "activity":
+            return build_activity_stats(users_data)
+        if name == "achievements":
+            total_points = sum(self.points_ledger.load_totals()["users"].values())
+            return build_achievement_stats(users_data, total_points)
+        if name == "system_info":
+            return build_system_info(users_data, self.data_manager.users_file, self.data_manager.achievements_file)
+        raise ValueError(f"Unknown stats report: {name}")
+    
+    def compute(self, names=STATS_REPORTS, users_data: Optional[Mapping[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Build reports from one store snapshot, taken now if not given, blocking"""
+        if users_data is None:
+            users_data = self.data_manager.load_users_data()
+        for name in names:
+            started = time.monotonic()
+            self.cache[name] = {
+                "text": self.build_report(name, users_data),
+                "computed_at": datetime.now(),
+                "seconds": time.monotonic() - started
+            }
+        return self.cache
+    
+    async def refresh(self, *names: str):
+        """Recompute reports in process pool, all of them by default"""
+        async with self._lock:
+            reports = await run_in_process(
+                compute_reports_job, self.data_manager.users_file, self.data_manager.achievements_file,
+                self.data_manager.load_users_data(), names or STATS_REPORTS
+            )
+            self.cache.update(reports)
+    
+    async def get(self, name: str, force: bool = False) -> Dict[str, Any]:
+        """Cached report, computed on first request or when forced"""
+        if force or name not in self.cache:
+            await self.refresh(name)
+        return self.cache[name]
+    
+    async def run(self):
+        """Recompute all reports on schedule"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error computing admin stats: {e}")
+            await asyncio.sleep(self.refresh_interval)
+    
+    def start(self):
+        """Start scheduled refresh in background task"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+    
+    async def shutdown(self):
+        """Stop scheduled refresh"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+def format_computed_at(report: Dict[str, Any]) -> str:
+    """Footer with time report was computed"""
+    return f"🕒 Рассчитано: {report['computed_at'].strftime('%d.%m.%Y %H:%M:%S')}"
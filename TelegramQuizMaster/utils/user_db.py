@@ -0,0 +1,170 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# One connection per database file and process
+_databases: Dict[str, "UserDatabase"] = {}
+
+def get_user_database(path: str) -> "UserDatabase":
+    """Get shared database for path"""
+    if path not in _databases:
+        _databases[path] = UserDatabase(path)
+    return _databases[path]
+
+def reset_user_databases():
+    """Forget connections inherited through fork, they must not be reused"""
+    _databases.clear()
+
+class UserDatabase:
+    """SQLite users table shared by bot worker processes
+    
+    Every write bumps a revision number, so a process only pulls users
+    changed by other processes since its last sync.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.rev = 0
+        self.data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        
+        # Autocommit mode, transactions are opened explicitly
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # WAL lets readers in other processes run while one process writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, rev INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS users_rev ON users (rev);
+            CREATE TABLE IF NOT EXISTS removed_users (user_id TEXT PRIMARY KEY, rev INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('rev', 0);
+            CREATE TABLE IF NOT EXISTS fsm_states (key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL);
+        """)
+    
+    def _current_rev(self) -> int:
+        """Revision of last committed write"""
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'rev'").fetchone()[0]
+    
+    def _data_version(self) -> int:
+        """Counter that changes only when another connection commits"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def is_empty(self) -> bool:
+        """True if no user was ever written"""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+    
+    def load_all(self) -> Dict[str, Any]:
+        """Read all users and mark them as synced"""
+        with self._lock:
+            self.data_version = self._data_version()
+            self.conn.execute("BEGIN")
+            try:
+                self.rev = self._current_rev()
+                rows = self.conn.execute("SELECT user_id, data FROM users").fetchall()
+            finally:
+                self.conn.execute("COMMIT")
+        return {user_id: json.loads(data) for user_id, data in rows}
+    
+    def write(self, records: Dict[str, Any], remove_ids: Iterable[str] = ()):
+        """Store and remove users in one transaction"""
+        remove_ids = list(remove_ids)
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rev = self._current_rev() + 1
+                self.conn.executemany(
+                    "INSERT INTO users (user_id, data, rev) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, rev = excluded.rev",
+                    [(user_id, json.dumps(user, ensure_ascii=False), rev) for user_id, user in records.items()]
+                )
+                self.conn.executemany("DELETE FROM removed_users WHERE user_id = ?", [(user_id,) for user_id in records])
+                self.conn.executemany("DELETE FROM users WHERE user_id = ?", [(user_id,) for user_id in remove_ids])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO removed_users (user_id, rev) VALUES (?, ?)",
+                    [(user_id, rev) for user_id in remove_ids]
+                )
+                self.conn.execute("UPDATE meta SET value = ? WHERE key = 'rev'", (rev,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            
+            # Nobody else wrote since last sync, so there is nothing to pull back
+            if rev == self.rev + 1:
+                self.rev = rev
+    
+    def update_fields(self, user_ids: Iterable[str], fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Set fields of stored users in one transaction, return updated records
+        
+        Rows are read inside the write transaction, so changes other
+        processes made to the same users meanwhile are kept.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rev = self._current_rev() + 1
+                records = {}
+                for user_id in user_ids:
+                    row = self.conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                    if row is not None:
+                        records[user_id] = {**json.loads(row[0]), **fields}
+                self.conn.executemany(
+                    "UPDATE users SET data = ?, rev = ? WHERE user_id = ?",
+                    [(json.dumps(user, ensure_ascii=False), rev, user_id) for user_id, user in records.items()]
+                )
+                self.conn.execute("UPDATE meta SET value = ? WHERE key = 'rev'", (rev,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            
+            if rev == self.rev + 1:
+                self.rev = rev
+        return records
+    
+    def pull_changes(self) -> Optional[Tuple[Dict[str, Any], List[str]]]:
+        """Users written and removed by other processes since last sync, None if nothing changed"""
+        with self._lock:
+            data_version = self._data_version()
+            if data_version == self.data_version:
+                return None
+            self.data_version = data_version
+            
+            self.conn.execute("BEGIN")
+            try:
+                rev = self._current_rev()
+                rows = self.conn.execute("SELECT user_id, data FROM users WHERE rev > ?", (self.rev,)).fetchall()
+                removed = self.conn.execute("SELECT user_id FROM removed_users WHERE rev > ?", (self.rev,)).fetchall()
+            finally:
+                self.conn.execute("COMMIT")
+            self.rev = rev
+        return {user_id: json.loads(data) for user_id, data in rows}, [user_id for user_id, in removed]
+    
+    def load_fsm_states(self) -> Dict[str, Tuple[Optional[str], Dict[str, Any], float]]:
+        """All saved FSM states by storage key"""
+        with self._lock:
+            rows = self.conn.execute("SELECT key, state, data, updated_at FROM fsm_states").fetchall()
+        return {key: (state, json.loads(data), updated_at) for key, state, data, updated_at in rows}
+    
+    def write_fsm_states(self, records: Dict[str, Tuple[Optional[str], Dict[str, Any], float]],
+                         removed: Dict[str, float]):
+        """Save FSM states and delete removed ones, unless rewritten after removal"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                    [(key, state, json.dumps(data, ensure_ascii=False), updated_at)
+                     for key, (state, data, updated_at) in records.items()]
+                )
+                # Another worker may own the key now and have written it later
+                self.conn.executemany(
+                    "DELETE FROM fsm_states WHERE key = ? AND updated_at <= ?", list(removed.items())
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
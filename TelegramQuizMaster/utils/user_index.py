@@ -0,0 +1,222 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, date
+from typing import Dict, Any, List, Set, Iterator, Optional, Callable, Tuple
+
+# One index per users file, shared by every DataManager instance
+_indexes: Dict[str, "UserIndex"] = {}
+
+def get_user_index(users_file: str) -> "UserIndex":
+    """Get shared index for users file"""
+    if users_file not in _indexes:
+        _indexes[users_file] = UserIndex()
+    return _indexes[users_file]
+
+class UserIndex:
+    """In-memory secondary indexes over users, maintained on every write"""
+    
+    def __init__(self):
+        self.built = False
+        self.entries: Dict[str, Tuple] = {}
+        # Numeric IDs in ascending order, recipient streams walk it
+        self.ids: List[int] = []
+        self.activity_days: Dict[int, Set[str]] = {}
+        self.categories: Dict[str, Set[str]] = {}
+        self.streaks: Dict[int, Set[str]] = {}
+        self.no_sessions: Set[str] = set()
+        self.blocked: Set[str] = set()
+    
+    def ensure_built(self, load_users: Callable[[], Dict[str, Any]]):
+        """Build indexes with one full scan on first use"""
+        if not self.built:
+            self.rebuild(load_users())
+    
+    def rebuild(self, users_data: Dict[str, Any]):
+        """Drop and rebuild all indexes"""
+        self.__init__()
+        for user_id, user in users_data.items():
+            self.update(user_id, user)
+        self.built = True
+    
+    def make_entry(self, user: Dict[str, Any]) -> Tuple:
+        """Extract indexed values from user record"""
+        last_active = user.get("last_active") or user.get("created_at")
+        active_day = datetime.fromisoformat(last_active).date().toordinal() if last_active else 0
+        categories = frozenset(skill.get("category", "Другое") for skill in user.get("skills", {}).values())
+        streaks = frozenset(
+            (skill["streak"], datetime.fromisoformat(skill["last_session"]).date().toordinal() + 1)
+            for skill in user.get("skills", {}).values()
+            if skill.get("streak", 0) > 0 and skill.get("last_session")
+        )
+        max_streak = max([streak for streak, _ in streaks], default=0)
+        no_sessions = user.get("statistics", {}).get("total_sessions", 0) == 0
+        return active_day, categories, max_streak, streaks, no_sessions, bool(user.get("blocked"))
+    
+    def update(self, user_id: str, user: Dict[str, Any]):
+        """Reindex single user"""
+        entry = self.make_entry(user)
+        old_entry = self.entries.get(user_id)
+        if old_entry == entry:
+            return
+        if old_entry:
+            self._remove_entry(user_id, old_entry)
+        else:
+            self._add_id(int(user_id))
+        
+        active_day, categories, max_streak, _, no_sessions, blocked = entry
+        self.activity_days.setdefault(active_day, set()).add(user_id)
+        for category in categories:
+            self.categories.setdefault(category, set()).add(user_id)
+        self.streaks.setdefault(max_streak, set()).add(user_id)
+        if no_sessions:
+            self.no_sessions.add(user_id)
+        if blocked:
+            self.blocked.add(user_id)
+        self.entries[user_id] = entry
+    
+    def remove(self, user_id: str):
+        """Drop user from indexes"""
+        old_entry = self.entries.pop(user_id, None)
+        if old_entry:
+            self._remove_entry(user_id, old_entry)
+            self._remove_id(int(user_id))
+    
+    def _add_id(self, user_id: int):
+        """Insert ID into sorted ID list"""
+        position = bisect_left(self.ids, user_id)
+        if position == len(self.ids) or self.ids[position] != user_id:
+            self.ids.insert(position, user_id)
+    
+    def _remove_id(self, user_id: int):
+        """Delete ID from sorted ID list"""
+        position = bisect_left(self.ids, user_id)
+        if position < len(self.ids) and self.ids[position] == user_id:
+            del self.ids[position]
+    
+    def _remove_entry(self, user_id: str, entry: Tuple):
+        """Remove user from buckets of old entry"""
+        active_day, categories, max_streak, _, _, _ = entry
+        self._discard(self.activity_days, active_day, user_id)
+        for category in categories:
+            self._discard(self.categories, category, user_id)
+        self._discard(self.streaks, max_streak, user_id)
+        self.no_sessions.discard(user_id)
+        self.blocked.discard(user_id)
+    
+    @staticmethod
+    def _discard(buckets: Dict, key, user_id: str):
+        """Remove user from bucket, dropping empty buckets"""
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.discard(user_id)
+            if not bucket:
+                del buckets[key]
+    
+    def active_since(self, days: int) -> Set[str]:
+        """Users active during last N days"""
+        first_day = date.today().toordinal() - days
+        result = set()
+        for active_day, user_ids in self.activity_days.items():
+            if active_day > first_day:
+                result |= user_ids
+        return result
+    
+    @staticmethod
+    def live_streak(entry: Tuple, today: int) -> int:
+        """Longest streak of user still running today, stored streaks are not reset by idle days"""
+        return max([streak for streak, alive_until in entry[3] if alive_until >= today], default=0)
+    
+    def streak_above(self, streak: int) -> Set[str]:
+        """Users with a running streak longer than N days"""
+        today = date.today().toordinal()
+        result = set()
+        # Stored maximum bounds the running one, shorter buckets can't match
+        for max_streak, user_ids in self.streaks.items():
+            if max_streak > streak:
+                result.update(
+                    user_id for user_id in user_ids
+                    if self.live_streak(self.entries[user_id], today) > streak
+                )
+        return result
+    
+    def segment_filter(self, segment: Optional[Dict[str, Any]]) -> Callable[[Tuple], bool]:
+        """Check of index entry for membership in segment, blocked users excluded"""
+        segment = segment or {"type": "all"}
+        segment_type = segment["type"]
+        
+        if segment_type == "all":
+            check = lambda entry: True
+        elif segment_type == "active":
+            first_day = date.today().toordinal() - segment["days"]
+            check = lambda entry: entry[0] > first_day
+        elif segment_type == "category":
+            check = lambda entry: segment["category"] in entry[1]
+        elif segment_type == "streak":
+            above = get_streak_above(segment)
+            today = date.today().toordinal()
+            check = lambda entry: entry[2] > above and self.live_streak(entry, today) > above
+        elif segment_type == "no_sessions":
+            check = lambda entry: entry[4]
+        else:
+            raise ValueError(f"Unknown segment type: {segment_type}")
+        
+        return lambda entry: not entry[5] and check(entry)
+    
+    def resolve_segment(self, segment: Optional[Dict[str, Any]]) -> Set[str]:
+        """Get IDs of users in segment, blocked users excluded"""
+        segment = segment or {"type": "all"}
+        segment_type = segment["type"]
+        
+        if segment_type == "all":
+            user_ids = set(self.entries)
+        elif segment_type == "active":
+            user_ids = self.active_since(segment["days"])
+        elif segment_type == "category":
+            user_ids = set(self.categories.get(segment["category"], set()))
+        elif segment_type == "streak":
+            user_ids = self.streak_above(get_streak_above(segment))
+        elif segment_type == "no_sessions":
+            user_ids = set(self.no_sessions)
+        else:
+            raise ValueError(f"Unknown segment type: {segment_type}")
+        
+        return user_ids - self.blocked
+    
+    def iter_segment(self, segment: Optional[Dict[str, Any]], start_from: int = 0) -> Iterator[int]:
+        """Lazily yield segment user IDs in ascending order starting from given ID
+        
+        Walks the sorted ID list and checks each user's index entry, nothing
+        is collected up front. Position is looked up again after every
+        yield, so users added or removed while a broadcast sleeps don't
+        shift the stream.
+        """
+        in_segment = self.segment_filter(segment)
+        position = bisect_left(self.ids, start_from)
+        while position < len(self.ids):
+            user_id = self.ids[position]
+            entry = self.entries.get(str(user_id))
+            if entry is not None and in_segment(entry):
+                yield user_id
+                position = bisect_right(self.ids, user_id)
+            else:
+                position += 1
+
+def get_streak_above(segment: Dict[str, Any]) -> int:
+    """Streak length segment users must exceed, jobs saved earlier store a minimum"""
+    if "above" in segment:
+        return segment["above"]
+    return segment["min"] - 1
+
+def describe_segment(segment: Optional[Dict[str, Any]]) -> str:
+    """Human readable segment name"""
+    segment = segment or {"type": "all"}
+    segment_type = segment["type"]
+    
+    if segment_type == "active":
+        return f"активные за {segment['days']} дн."
+    if segment_type == "category":
+        return f"категория {segment['category']}"
+    if segment_type == "streak":
+        return f"серия больше {get_streak_above(segment)} дн."
+    if segment_type == "no_sessions":
+        return "без сессий"
+    return "все пользователи"
@@ -0,0 +1,159 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Any, List, Set, Tuple, Optional, Callable
+
+# One search index per users file, shared by every DataManager instance
+_search_indexes: Dict[str, "UserSearchIndex"] = {}
+
+def get_search_index(users_file: str) -> "UserSearchIndex":
+    """Get shared search index for users file"""
+    if users_file not in _search_indexes:
+        _search_indexes[users_file] = UserSearchIndex()
+    return _search_indexes[users_file]
+
+def get_display_name(user_id: str, user: Dict[str, Any]) -> str:
+    """Short user label for lists"""
+    name = " ".join(part for part in (user.get("first_name"), user.get("last_name")) if part)
+    if user.get("username"):
+        name = f"{name} @{user['username']}".strip()
+    return name or f"ID {user_id}"
+
+def get_name_tokens(user: Dict[str, Any]) -> Set[str]:
+    """Lowercase searchable words of user profile"""
+    tokens = set()
+    for field in ("username", "first_name", "last_name"):
+        value = (user.get(field) or "").lower().lstrip("@")
+        tokens.update(value.split())
+    return tokens
+
+def get_trigrams(token: str) -> Set[str]:
+    """Character trigrams of token"""
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class UserSearchIndex:
+    """In-memory index for ID prefix, name prefix and substring search"""
+    
+    def __init__(self):
+        self.built = False
+        self.ids: List[str] = []
+        self.names: Dict[str, str] = {}
+        self.tokens: Dict[str, Set[str]] = {}
+        self.sorted_tokens: List[Tuple[str, str]] = []
+        self.trigrams: Dict[str, Set[str]] = {}
+    
+    def ensure_built(self, load_users: Callable[[], Dict[str, Any]]):
+        """Build index with one full scan on first use"""
+        if not self.built:
+            self.rebuild(load_users())
+    
+    def rebuild(self, users_data: Dict[str, Any]):
+        """Drop and rebuild index"""
+        self.__init__()
+        self.ids = sorted(users_data)
+        for user_id, user in users_data.items():
+            self._add_profile(user_id, user)
+        self.sorted_tokens.sort()
+        self.built = True
+    
+    def update(self, user_id: str, user: Dict[str, Any]):
+        """Reindex single user"""
+        position = bisect_left(self.ids, user_id)
+        if position == len(self.ids) or self.ids[position] != user_id:
+            self.ids.insert(position, user_id)
+        
+        if self.tokens.get(user_id) == get_name_tokens(user):
+            self.names[user_id] = get_display_name(user_id, user)
+            return
+        self._remove_profile(user_id)
+        self._add_profile(user_id, user, keep_sorted=True)
+    
+    def remove(self, user_id: str):
+        """Drop user from index"""
+        position = bisect_left(self.ids, user_id)
+        if position < len(self.ids) and self.ids[position] == user_id:
+            del self.ids[position]
+        self._remove_profile(user_id)
+        self.names.pop(user_id, None)
+    
+    def _add_profile(self, user_id: str, user: Dict[str, Any], keep_sorted: bool = False):
+        """Index name tokens of user"""
+        tokens = get_name_tokens(user)
+        self.names[user_id] = get_display_name(user_id, user)
+        self.tokens[user_id] = tokens
+        for token in tokens:
+            if keep_sorted:
+                insort(self.sorted_tokens, (token, user_id))
+            else:
+                self.sorted_tokens.append((token, user_id))
+            for trigram in get_trigrams(token):
+                self.trigrams.setdefault(trigram, set()).add(user_id)
+    
+    def _remove_profile(self, user_id: str):
+        """Remove name tokens of user"""
+        for token in self.tokens.pop(user_id, set()):
+            position = bisect_left(self.sorted_tokens, (token, user_id))
+            if position < len(self.sorted_tokens) and self.sorted_tokens[position] == (token, user_id):
+                del self.sorted_tokens[position]
+            for trigram in get_trigrams(token):
+                bucket = self.trigrams.get(trigram)
+                if bucket is not None:
+                    bucket.discard(user_id)
+                    if not bucket:
+                        del self.trigrams[trigram]
+    
+    def search_id_prefix(self, prefix: str) -> Tuple[int, int]:
+        """Range of sorted IDs starting with prefix"""
+        start = bisect_left(self.ids, prefix)
+        end = bisect_left(self.ids, prefix + "\uffff")
+        return start, end
+    
+    def search_word(self, word: str) -> Set[str]:
+        """Users with name word starting with or containing word"""
+        found = set()
+        position = bisect_left(self.sorted_tokens, (word, ""))
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position][0].startswith(word):
+            found.add(self.sorted_tokens[position][1])
+            position += 1
+        
+        # Substring match: candidates share every trigram, then verified on tokens
+        if len(word) >= 3:
+            buckets = sorted((self.trigrams.get(trigram, set()) for trigram in get_trigrams(word)), key=len)
+            candidates = set.intersection(*buckets) - found if buckets[0] else set()
+            found.update(
+                user_id for user_id in candidates
+                if any(word in token for token in self.tokens.get(user_id, ()))
+            )
+        return found
+    
+    def search_names(self, query: str) -> List[str]:
+        """Users matching every word of query, sorted by ID"""
+        words = query.lower().replace("@", " ").split()
+        if not words:
+            return []
+        
+        found = self.search_word(words[0])
+        for word in words[1:]:
+            found &= self.search_word(word)
+        return sorted(found)
+    
+    def search(self, query: str) -> Tuple[List[str], int, int]:
+        """Sorted ID list and range holding matches
+        
+        Digits search ID prefix directly in the main ID list, without copying it.
+        """
+        query = query.strip()
+        if query.isdigit():
+            start, end = self.search_id_prefix(query)
+            return self.ids, start, end
+        results = self.search_names(query)
+        return results, 0, len(results)
+
+def get_page(ids: List[str], start: int, end: int, limit: int,
+             after: Optional[str] = None, before: Optional[str] = None) -> Tuple[List[str], bool, bool]:
+    """Page of sorted IDs within [start, end) around cursor, with has-previous and has-next flags"""
+    if before is not None:
+        page_end = max(start, min(end, bisect_left(ids, before, start, end)))
+        page_start = max(start, page_end - limit)
+    else:
+        page_start = bisect_right(ids, after, start, end) if after is not None else start
+        page_end = min(end, page_start + limit)
+    return ids[page_start:page_end], page_start > start, page_end < end
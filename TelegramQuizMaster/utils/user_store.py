@@ -0,0 +1,125 @@
+import threading
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, Optional, Callable, Tuple
+
+# One store per users file, shared by every DataManager instance
+_stores: Dict[str, "UserStore"] = {}
+_shared = True
+
+def get_user_store(users_file: str) -> "UserStore":
+    """Get shared in-memory store for users file"""
+    if not _shared:
+        return UserStore()
+    if users_file not in _stores:
+        _stores[users_file] = UserStore()
+    return _stores[users_file]
+
+def use_private_stores():
+    """Read storage from disk for every job, used in worker processes
+    
+    Forked workers inherit the bot's store as of fork time, which goes stale.
+    """
+    global _shared
+    _shared = False
+    _stores.clear()
+
+class StoreSnapshot(Mapping):
+    """Read-only consistent view of users at one store version
+    
+    Picklable, so process pool jobs scan the snapshot handed to them
+    instead of reading storage again.
+    """
+    
+    def __init__(self, shards: Tuple[Dict[str, Any], ...], version: int):
+        self.shards = shards
+        self.version = version
+        # Export watermark, records updated later are not in the snapshot
+        self.taken_at = datetime.now().isoformat()
+    
+    def __setstate__(self, state: Dict[str, Any]):
+        # String hashes differ between processes, so users are sharded again
+        shards = tuple({} for _ in state["shards"])
+        for shard in state["shards"]:
+            for user_id, user in shard.items():
+                shards[hash(user_id) % len(shards)][user_id] = user
+        self.__dict__.update(state, shards=shards)
+    
+    def __getitem__(self, user_id: str) -> Dict[str, Any]:
+        return self.shards[hash(user_id) % len(self.shards)][user_id]
+    
+    def __iter__(self) -> Iterator[str]:
+        for shard in self.shards:
+            yield from shard
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+class UserStore:
+    """Sharded copy-on-write map of user records
+    
+    Records are never changed in place: writers put new records. A snapshot
+    shares the current shards; the first write to a shared shard copies that
+    shard only, so snapshots cost O(shards) and never block writers.
+    """
+    
+    SHARDS = 256
+    
+    def __init__(self):
+        self.loaded = False
+        self.version = 0
+        self.snapshot_version = -1
+        self.shards = [{} for _ in range(self.SHARDS)]
+        self.shard_versions = [0] * self.SHARDS
+        self._lock = threading.Lock()
+    
+    def ensure_loaded(self, read_users: Callable[[], Dict[str, Any]]):
+        """Load users from storage on first use"""
+        if not self.loaded:
+            self.load(read_users())
+    
+    def load(self, users_data: Dict[str, Any]):
+        """Replace store contents"""
+        shards = [{} for _ in range(self.SHARDS)]
+        for user_id, user in users_data.items():
+            shards[hash(user_id) % self.SHARDS][user_id] = user
+        
+        with self._lock:
+            self.version += 1
+            self.shards = shards
+            self.shard_versions = [self.version] * self.SHARDS
+            self.loaded = True
+    
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Current record, must not be modified"""
+        return self.shards[hash(user_id) % self.SHARDS].get(user_id)
+    
+    def snapshot(self) -> StoreSnapshot:
+        """Consistent view of all users, later writes are not visible in it"""
+        with self._lock:
+            self.snapshot_version = self.version
+            return StoreSnapshot(tuple(self.shards), self.version)
+    
+    def apply(self, records: Dict[str, Dict[str, Any]], remove_ids: Iterable[str] = ()):
+        """Put and remove users as one change, snapshots see all of it or none"""
+        with self._lock:
+            self.version += 1
+            for user_id, record in records.items():
+                self._writable_shard(user_id)[user_id] = record
+            for user_id in remove_ids:
+                self._writable_shard(user_id).pop(user_id, None)
+    
+    def _writable_shard(self, user_id: str) -> Dict[str, Any]:
+        """Shard of user, copied first if a snapshot may still read it"""
+        index = hash(user_id) % self.SHARDS
+        if self.shard_versions[index] <= self.snapshot_version:
+            self.shards[index] = dict(self.shards[index])
+            self.shard_versions[index] = self.version
+        return self.shards[index]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict of current users for persisting"""
+        users = {}
+        for shard in self.shards:
+            users.update(shard)
+        return users
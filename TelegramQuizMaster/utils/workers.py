@@ -0,0 +1,75 @@
+import asyncio
+import functools
+import multiprocessing
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from config import PROCESS_POOL_WORKERS
+from utils.user_store import use_private_stores
+from utils.user_db import reset_user_databases
+
+logger = logging.getLogger(__name__)
+
+# One pool per bot process, shared by every manager
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get shared process pool, created on first use"""
+    global _pool
+    if _pool is None:
+        # Forking a process that already runs threads (to_thread jobs, SQLite,
+        # aiohttp resolver) can copy held locks into the child. Forkserver
+        # forks from a clean single-threaded server instead
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context(method),
+            initializer=_init_worker
+        )
+    return _pool
+
+def _init_worker():
+    """Make every job read storage itself instead of caching it between jobs"""
+    use_private_stores()
+    reset_user_databases()
+
+def _ping() -> bool:
+    """No-op job used to start workers"""
+    return True
+
+def start_process_pool():
+    """Start workers up front so first admin job does not pay for it"""
+    pool = get_process_pool()
+    for _ in range(PROCESS_POOL_WORKERS):
+        pool.submit(_ping)
+
+async def run_in_process(func: Callable, *args: Any) -> Any:
+    """Run CPU-bound job in process pool and await its result
+    
+    Job and its arguments are pickled, so pass store snapshots, file paths
+    and plain values, not managers. Pickling happens in the executor's
+    feeder thread, not on the event loop.
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    job = functools.partial(func, *args)
+    pool = get_process_pool()
+    try:
+        return await loop.run_in_executor(pool, job)
+    except BrokenProcessPool:
+        # Worker was killed (e.g. out of memory), replace pool and retry once;
+        # jobs failing together replace it only once
+        logger.error(f"Process pool broken while running {func.__name__}, restarting it")
+        if _pool is pool:
+            _pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        return await loop.run_in_executor(get_process_pool(), job)
+
+def shutdown_process_pool():
+    """Stop workers"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None